@@ -0,0 +1,146 @@
+import logging
+import threading
+from typing import Optional
+
+from sqlalchemy import func, select
+
+from database import engine
+from models import ACCOUNT_NUMBER_BLOCK_SIZE, Account, account_number_block_seq
+from redis_client import r
+
+logger = logging.getLogger("vaulta.accounts")
+
+# Account numbers are 10 digits: a 9-digit serial followed by a Luhn check
+# digit. Serials come from a shared counter in blocks of
+# ACCOUNT_NUMBER_BLOCK_SIZE, so each worker hands out numbers from memory
+# and only goes back to the counter once per block. Numbers are never reused
+# (a restart just skips the rest of its block), so no lookup is needed.
+#
+# The counter is the account_number_block_seq sequence on Postgres and a
+# Redis INCRBY elsewhere (SQLite has no sequences). Redis isn't durable, so
+# there each new block is checked against the stored accounts first; if a
+# flush or failover reset the counter, it is moved past the numbers already
+# issued (they are dense, from counter 1 up) before anything is handed out.
+SERIAL_BASE = 100_000_000
+SERIAL_MAX = 999_999_999
+REDIS_COUNTER_KEY = "account_number:next_serial"
+# How far past the last stored number recovery looks for more; gaps come
+# from blocks a restarted worker never used
+RECOVERY_WINDOW = 10 * ACCOUNT_NUMBER_BLOCK_SIZE
+
+# raise the counter to at least ARGV[2], then reserve a block
+_RESERVE_LUA = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if current < tonumber(ARGV[2]) then
+    redis.call('SET', KEYS[1], ARGV[2])
+end
+return redis.call('INCRBY', KEYS[1], ARGV[1])
+"""
+
+_reserve_script = None
+
+
+def luhn_check_digit(digits: str) -> str:
+    total = 0
+    # double every second digit counting from the right, starting with the
+    # rightmost (the check digit goes after it)
+    for i, ch in enumerate(reversed(digits)):
+        d = int(ch)
+        if i % 2 == 0:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_account_number(account_number: str) -> bool:
+    return (
+        len(account_number) == 10
+        and account_number.isdigit()
+        and luhn_check_digit(account_number[:-1]) == account_number[-1]
+    )
+
+
+def _highest_stored(first: int, last: int) -> Optional[int]:
+    """Highest counter value in [first, last] already used by a stored account."""
+    with engine.connect() as conn:
+        highest = conn.execute(
+            select(func.max(Account.account_number)).where(
+                func.length(Account.account_number) == 10,
+                Account.account_number >= f"{SERIAL_BASE + first}0",
+                Account.account_number <= f"{SERIAL_BASE + last}9",
+            )
+        ).scalar()
+    return int(highest[:-1]) - SERIAL_BASE if highest else None
+
+
+def _redis_reserve(floor: int = 0) -> int:
+    global _reserve_script
+    if _reserve_script is None:
+        _reserve_script = r.register_script(_RESERVE_LUA)
+    end = _reserve_script(keys=[REDIS_COUNTER_KEY], args=[ACCOUNT_NUMBER_BLOCK_SIZE, floor])
+    return end - ACCOUNT_NUMBER_BLOCK_SIZE + 1
+
+
+def _reserve_block() -> int:
+    """First counter value of a newly reserved block."""
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            return conn.execute(select(account_number_block_seq.next_value())).scalar_one()
+
+    start = _redis_reserve()
+    highest = _highest_stored(start, start + ACCOUNT_NUMBER_BLOCK_SIZE - 1)
+    if highest is None:
+        return start
+    # the counter is behind the stored accounts: walk to the end of the
+    # issued range and restart the counter past it
+    while True:
+        further = _highest_stored(highest + 1, highest + RECOVERY_WINDOW)
+        if further is None:
+            break
+        highest = further
+    logger.warning(f"[account_numbers] Counter was behind stored accounts, moving it past {highest}")
+    return _redis_reserve(floor=highest)
+
+
+class AccountNumberAllocator:
+    def __init__(self, reserve_block=_reserve_block, block_size: int = ACCOUNT_NUMBER_BLOCK_SIZE):
+        self._reserve_block = reserve_block
+        self._block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def next(self) -> str:
+        with self._lock:
+            if self._next >= self._end:
+                self._next = self._reserve_block()
+                self._end = self._next + self._block_size
+                logger.info(f"[account_numbers] Reserved block {self._next}-{self._end - 1}")
+            counter = self._next
+            self._next += 1
+
+        serial = SERIAL_BASE + counter
+        if serial > SERIAL_MAX:
+            raise RuntimeError("Account number space exhausted")
+        body = str(serial)
+        return body + luhn_check_digit(body)
+
+    def discard_block(self) -> None:
+        """Drop the rest of the current block; the next call reserves a new one."""
+        with self._lock:
+            self._end = self._next
+
+
+_allocator = AccountNumberAllocator()
+
+
+def next_account_number() -> str:
+    """Allocate a new, never-before-issued account number (thread-safe)."""
+    return _allocator.next()
+
+
+def discard_block() -> None:
+    """Called after a stored account already had an issued number."""
+    _allocator.discard_block()
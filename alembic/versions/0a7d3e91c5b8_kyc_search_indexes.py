@@ -0,0 +1,129 @@
+"""kyc search indexes
+
+Revision ID: 0a7d3e91c5b8
+Revises: f6a3c0d8b4e2
+Create Date: 2026-10-18 13:00:00.000000
+
+Postgres: pg_trgm and GIN trigram indexes. SQLite: the kyc_search_fts
+FTS5 table and the triggers that keep it in sync (the app's
+kyc_search.install() creates the same on databases built by create_all).
+The DDL is written out here rather than taken from kyc_search, so this
+revision keeps doing what it did when it was written.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a7d3e91c5b8'
+down_revision: Union[str, Sequence[str], None] = 'f6a3c0d8b4e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# GIN trigram indexes backing kyc_search's ILIKE '%q%' lookups on Postgres.
+TRGM_INDEXES = [
+    ('ix_user_kyc_reference_id_trgm', 'user_kyc', 'reference_id'),
+    ('ix_user_kyc_email_trgm', 'user_kyc', 'email'),
+    ('ix_user_kyc_full_name_trgm', 'user_kyc', 'full_name'),
+    ('ix_user_kyc_company_name_trgm', 'user_kyc', 'company_name'),
+    ('ix_user_kyc_ubos_full_name_trgm', 'user_kyc_ubos', 'full_name'),
+    ('ix_user_kyc_ubos_email_trgm', 'user_kyc_ubos', 'email'),
+]
+
+
+FTS_TABLE = 'kyc_search_fts'
+
+# the UBO names / emails of one KYC entry, space separated
+_UBO_TEXT = (
+    "(SELECT group_concat(coalesce(full_name, '') || ' ' || coalesce(email, ''), ' ') "
+    "FROM user_kyc_ubos WHERE kyc_id = {kyc_id})"
+)
+
+SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}
+        USING fts5(reference_id, email, full_name, company_name, ubo_text, tokenize='trigram')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_kyc_ai AFTER INSERT ON user_kyc BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, reference_id, email, full_name, company_name, ubo_text)
+        VALUES (new.id, new.reference_id, new.email, new.full_name, new.company_name, {_UBO_TEXT.format(kyc_id="new.id")});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_kyc_au
+        AFTER UPDATE OF reference_id, email, full_name, company_name ON user_kyc BEGIN
+        UPDATE {FTS_TABLE} SET reference_id = new.reference_id, email = new.email,
+            full_name = new.full_name, company_name = new.company_name
+        WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_kyc_ad AFTER DELETE ON user_kyc BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ubo_ai AFTER INSERT ON user_kyc_ubos BEGIN
+        UPDATE {FTS_TABLE} SET ubo_text = {_UBO_TEXT.format(kyc_id="new.kyc_id")} WHERE rowid = new.kyc_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ubo_au
+        AFTER UPDATE OF kyc_id, full_name, email ON user_kyc_ubos BEGIN
+        UPDATE {FTS_TABLE} SET ubo_text = {_UBO_TEXT.format(kyc_id="old.kyc_id")} WHERE rowid = old.kyc_id;
+        UPDATE {FTS_TABLE} SET ubo_text = {_UBO_TEXT.format(kyc_id="new.kyc_id")} WHERE rowid = new.kyc_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ubo_ad AFTER DELETE ON user_kyc_ubos BEGIN
+        UPDATE {FTS_TABLE} SET ubo_text = {_UBO_TEXT.format(kyc_id="old.kyc_id")} WHERE rowid = old.kyc_id;
+    END""",
+]
+SQLITE_TRIGGERS = ['kyc_ai', 'kyc_au', 'kyc_ad', 'ubo_ai', 'ubo_au', 'ubo_ad']
+
+
+def _install_sqlite(bind) -> None:
+    exists = bind.execute(
+        sa.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}
+    ).first()
+    for statement in SQLITE_DDL:
+        bind.execute(sa.text(statement))
+    if not exists:
+        bind.execute(sa.text(
+            f"INSERT INTO {FTS_TABLE}(rowid, reference_id, email, full_name, company_name, ubo_text) "
+            f"SELECT id, reference_id, email, full_name, company_name, {_UBO_TEXT.format(kyc_id='user_kyc.id')} "
+            f"FROM user_kyc"
+        ))
+
+
+def _uninstall_sqlite(bind) -> None:
+    for suffix in SQLITE_TRIGGERS:
+        bind.execute(sa.text(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}'))
+    bind.execute(sa.text(f'DROP TABLE IF EXISTS {FTS_TABLE}'))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        _install_sqlite(bind)
+        return
+    if bind.dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.get_context().autocommit_block():
+        for name, table, column in TRGM_INDEXES:
+            op.create_index(
+                name,
+                table,
+                [column],
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'},
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        _uninstall_sqlite(bind)
+        return
+    if bind.dialect.name != 'postgresql':
+        return
+
+    with op.get_context().autocommit_block():
+        for name, table, _column in reversed(TRGM_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
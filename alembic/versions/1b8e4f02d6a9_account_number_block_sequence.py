@@ -0,0 +1,37 @@
+"""account number block sequence
+
+Revision ID: 1b8e4f02d6a9
+Revises: 0a7d3e91c5b8
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1b8e4f02d6a9'
+down_revision: Union[str, Sequence[str], None] = '0a7d3e91c5b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match models.ACCOUNT_NUMBER_BLOCK_SIZE: each nextval() reserves a block.
+BLOCK_SIZE = 100
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute(sa.schema.CreateSequence(
+        sa.Sequence('account_number_block_seq', start=1, increment=BLOCK_SIZE)
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute(sa.schema.DropSequence(sa.Sequence('account_number_block_seq')))
@@ -0,0 +1,59 @@
+"""ledger tables
+
+Revision ID: 2c9f5a17e3b0
+Revises: 1b8e4f02d6a9
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c9f5a17e3b0'
+down_revision: Union[str, Sequence[str], None] = '1b8e4f02d6a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'ledger_postings',
+        sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+        sa.Column('entry_id', sa.String(), nullable=False),
+        sa.Column('account_id', sa.String(), nullable=False),
+        sa.Column('currency', sa.String(), nullable=False),
+        sa.Column('amount', sa.BigInteger(), nullable=False),
+        sa.Column('transaction_id', sa.Integer(), nullable=True),
+        sa.Column('payment_id', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['transaction_id'], ['transactions.id']),
+        sa.ForeignKeyConstraint(['payment_id'], ['payments.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_ledger_postings_entry_id', 'ledger_postings', ['entry_id'], unique=False)
+    op.create_index(
+        'ix_ledger_postings_account_id_currency_id',
+        'ledger_postings',
+        ['account_id', 'currency', 'id'],
+        unique=False,
+    )
+    op.create_table(
+        'account_balances',
+        sa.Column('account_id', sa.String(), nullable=False),
+        sa.Column('currency', sa.String(), nullable=False),
+        sa.Column('balance', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('account_id', 'currency'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('account_balances')
+    op.drop_index('ix_ledger_postings_account_id_currency_id', table_name='ledger_postings')
+    op.drop_index('ix_ledger_postings_entry_id', table_name='ledger_postings')
+    op.drop_table('ledger_postings')
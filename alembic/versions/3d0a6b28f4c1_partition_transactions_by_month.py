@@ -0,0 +1,227 @@
+"""partition transactions by month
+
+Revision ID: 3d0a6b28f4c1
+Revises: 2c9f5a17e3b0
+Create Date: 2026-10-18 17:00:00.000000
+
+Creates transactions_archive everywhere. On Postgres it also rebuilds
+`transactions` as a table range-partitioned on created_at, one partition
+per month (see transaction_partitions.py):
+
+- the table is copied, so it is locked for the duration; run it in a
+  maintenance window
+- the primary key becomes (id, created_at), and created_at NOT NULL
+- a partitioned table can't be the target of a foreign key on id alone, so
+  payments.transaction_id and ledger_postings.transaction_id lose theirs
+- a unique index on reference alone isn't possible either; uniqueness is
+  kept by a trigger claiming each reference in transaction_references
+  (released when a row is deleted; archiving keeps the claims)
+
+Elsewhere (SQLite) the app creates transaction_references and its
+triggers at startup (transaction_partitions.install()).
+
+Self-contained: the partition layout below is what transaction_partitions.py
+expects as of this revision, so later changes to the module don't change
+what this migration does.
+"""
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d0a6b28f4c1'
+down_revision: Union[str, Sequence[str], None] = '2c9f5a17e3b0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DEFAULT_PARTITION = 'transactions_default'
+# monthly partitions are created through this many months from now
+PARTITIONS_AHEAD = 2
+
+_CLAIM_REFERENCE_FUNCTION = """
+CREATE FUNCTION transactions_claim_reference() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        IF OLD.reference IS NOT NULL THEN
+            DELETE FROM transaction_references
+            WHERE reference = OLD.reference AND transaction_id = OLD.id;
+        END IF;
+        RETURN OLD;
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        IF NEW.reference IS NOT DISTINCT FROM OLD.reference THEN
+            RETURN NEW;
+        END IF;
+        DELETE FROM transaction_references
+        WHERE reference = OLD.reference AND transaction_id = OLD.id;
+    END IF;
+    IF NEW.reference IS NOT NULL THEN
+        INSERT INTO transaction_references (reference, transaction_id, created_at)
+        VALUES (NEW.reference, NEW.id, NEW.created_at);
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _months(first, ahead: int):
+    """Month starts from `first` (default: the current month) through `ahead` months from now."""
+    now = datetime.now(timezone.utc)
+    current = datetime(now.year, now.month, 1)
+    month = datetime(first.year, first.month, 1) if first else current
+    while month <= _add_months(current, ahead):
+        yield month
+        month = _add_months(month, 1)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'transactions_archive',
+        sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('month', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('first_id', sa.Integer(), nullable=False),
+        sa.Column('last_id', sa.Integer(), nullable=False),
+        sa.Column('first_created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('last_created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('row_count', sa.Integer(), nullable=False),
+        sa.Column('payload', sa.LargeBinary(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_transactions_archive_user_id_last_created_at',
+        'transactions_archive',
+        ['user_id', 'last_created_at'],
+        unique=False,
+    )
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    op.execute("ALTER TABLE payments DROP CONSTRAINT IF EXISTS payments_transaction_id_fkey")
+    op.execute("ALTER TABLE ledger_postings DROP CONSTRAINT IF EXISTS ledger_postings_transaction_id_fkey")
+
+    op.execute("UPDATE transactions SET created_at = now() WHERE created_at IS NULL")
+    op.execute("ALTER TABLE transactions RENAME TO transactions_unpartitioned")
+    # keep the id sequence when the old table is dropped
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY NONE")
+    op.execute(
+        "CREATE TABLE transactions (LIKE transactions_unpartitioned INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (created_at)"
+    )
+    op.execute("ALTER TABLE transactions ALTER COLUMN created_at SET NOT NULL")
+    op.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF transactions DEFAULT")
+    oldest = bind.execute(sa.text(
+        "SELECT date_trunc('month', min(created_at) AT TIME ZONE 'UTC') FROM transactions_unpartitioned"
+    )).scalar()
+    for month in _months(oldest, PARTITIONS_AHEAD):
+        upper = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE transactions_p{month:%Y%m} PARTITION OF transactions "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+        )
+    op.execute("INSERT INTO transactions SELECT * FROM transactions_unpartitioned")
+
+    op.create_table(
+        'transaction_references',
+        sa.Column('reference', sa.String(), nullable=False),
+        sa.Column('transaction_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('reference'),
+    )
+    op.execute(
+        "INSERT INTO transaction_references (reference, transaction_id, created_at) "
+        "SELECT reference, id, created_at FROM transactions_unpartitioned WHERE reference IS NOT NULL"
+    )
+    op.execute("DROP TABLE transactions_unpartitioned")
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id")
+
+    # built after the copy, once per partition
+    op.create_primary_key('transactions_pkey', 'transactions', ['id', 'created_at'])
+    op.create_index('ix_transactions_id', 'transactions', ['id'], unique=False)
+    op.create_index('ix_transactions_reference', 'transactions', ['reference'], unique=False)
+    op.create_index(
+        'ix_transactions_user_id_created_at_id',
+        'transactions',
+        ['user_id', 'created_at', 'id'],
+        unique=False,
+    )
+    op.execute(_CLAIM_REFERENCE_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER transactions_claim_reference BEFORE INSERT OR UPDATE OF reference OR DELETE ON transactions "
+        "FOR EACH ROW EXECUTE FUNCTION transactions_claim_reference()"
+    )
+
+
+def _restore_archive(bind) -> None:
+    """Put archived rows back into transactions before the archive goes."""
+    transactions = sa.table(
+        'transactions',
+        *(sa.column(name) for name in (
+            'id', 'amount', 'currency', 'user_id', 'transaction_type', 'provider', 'status',
+            'reference', 'description', 'created_at', 'updated_at',
+        )),
+    )
+    # SQLite keeps transaction_references (the app's); archived rows still
+    # hold their claims there, which the insert trigger takes again
+    claims = sa.inspect(bind).has_table('transaction_references')
+    for (payload,) in bind.execute(sa.text("SELECT payload FROM transactions_archive")).all():
+        rows = json.loads(zlib.decompress(payload))
+        for row in rows:
+            row['created_at'] = datetime.fromisoformat(row['created_at'])
+            if row.get('updated_at'):
+                row['updated_at'] = datetime.fromisoformat(row['updated_at'])
+        references = [{'reference': row['reference']} for row in rows if row.get('reference')]
+        if claims and references:
+            bind.execute(sa.text("DELETE FROM transaction_references WHERE reference = :reference"), references)
+        bind.execute(sa.insert(transactions), rows)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute("DROP TRIGGER transactions_claim_reference ON transactions")
+        op.execute("DROP FUNCTION transactions_claim_reference()")
+        op.execute("ALTER TABLE transactions RENAME TO transactions_partitioned")
+        op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY NONE")
+        op.execute("CREATE TABLE transactions (LIKE transactions_partitioned INCLUDING DEFAULTS)")
+        op.execute("ALTER TABLE transactions ALTER COLUMN created_at DROP NOT NULL")
+        op.execute("INSERT INTO transactions SELECT * FROM transactions_partitioned")
+        op.execute("DROP TABLE transactions_partitioned")
+        op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id")
+        op.drop_table('transaction_references')
+
+    _restore_archive(bind)
+
+    if bind.dialect.name == 'postgresql':
+        op.create_primary_key('transactions_pkey', 'transactions', ['id'])
+        op.create_index('ix_transactions_id', 'transactions', ['id'], unique=False)
+        op.create_index('ix_transactions_reference', 'transactions', ['reference'], unique=True)
+        op.create_index(
+            'ix_transactions_user_id_created_at_id',
+            'transactions',
+            ['user_id', 'created_at', 'id'],
+            unique=False,
+        )
+        op.create_foreign_key('payments_transaction_id_fkey', 'payments', 'transactions', ['transaction_id'], ['id'])
+        op.create_foreign_key(
+            'ledger_postings_transaction_id_fkey', 'ledger_postings', 'transactions', ['transaction_id'], ['id']
+        )
+
+    op.drop_index('ix_transactions_archive_user_id_last_created_at', table_name='transactions_archive')
+    op.drop_table('transactions_archive')
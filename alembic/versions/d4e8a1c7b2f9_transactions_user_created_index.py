@@ -0,0 +1,40 @@
+"""transactions user created_at index
+
+Revision ID: d4e8a1c7b2f9
+Revises: 7a80c49e5b86
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e8a1c7b2f9'
+down_revision: Union[str, Sequence[str], None] = '7a80c49e5b86'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_transactions_user_id_created_at_id',
+        'transactions',
+        ['user_id', 'created_at', 'id'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_payments_user_id_status_created_at_id',
+        'payments',
+        ['user_id', 'status', 'created_at', 'id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_payments_user_id_status_created_at_id', table_name='payments')
+    op.drop_index('ix_transactions_user_id_created_at_id', table_name='transactions')
@@ -0,0 +1,43 @@
+"""hot query indexes
+
+Revision ID: e5f2b9c3a1d7
+Revises: d4e8a1c7b2f9
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f2b9c3a1d7'
+down_revision: Union[str, Sequence[str], None] = 'd4e8a1c7b2f9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# transactions(user_id) and payments(user_id) are already covered by the
+# composite indexes from d4e8a1c7b2f9, and user_kyc.user_id by its unique
+# constraint.
+INDEXES = [
+    ('ix_accounts_user_id_status', 'accounts', ['user_id', 'status']),
+    ('ix_payments_status_created_at_id', 'payments', ['status', 'created_at', 'id']),
+    ('ix_user_kyc_hidden_created_at', 'user_kyc', ['hidden', 'created_at']),
+    ('ix_user_kyc_ubos_kyc_id_email', 'user_kyc_ubos', ['kyc_id', 'email']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY can't run inside a transaction; it only applies on Postgres.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
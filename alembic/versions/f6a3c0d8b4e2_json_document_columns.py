@@ -0,0 +1,82 @@
+"""json document columns
+
+Revision ID: f6a3c0d8b4e2
+Revises: e5f2b9c3a1d7
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6a3c0d8b4e2'
+down_revision: Union[str, Sequence[str], None] = 'e5f2b9c3a1d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (table, column, previous type)
+COLUMNS = [
+    ('accounts', 'balances', sa.String()),
+    ('accounts', 'account_metadata', sa.String()),
+    ('payments', 'fx_data', sa.String()),
+    ('payments', 'fees_data', sa.String()),
+    ('user_kyc', 'basic_info_payload', sa.Text()),
+]
+
+
+# Converts one text value, for rows written before the columns held JSON:
+# '' becomes NULL and text that isn't JSON a JSON string, rather than failing
+# the ALTER. Lives in pg_temp, so it goes away with the migration's session.
+_TRY_JSONB_FUNCTION = """
+CREATE FUNCTION pg_temp.legacy_to_jsonb(value text) RETURNS jsonb AS $$
+BEGIN
+    IF value IS NULL OR btrim(value) = '' THEN
+        RETURN NULL;
+    END IF;
+    RETURN value::jsonb;
+EXCEPTION WHEN invalid_text_representation THEN
+    RETURN to_jsonb(value);
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        # JSON is text here, so the column type stays; the same legacy
+        # values are rewritten in place so they parse
+        for table, column, _ in COLUMNS:
+            op.execute(f"UPDATE {table} SET {column} = NULL WHERE trim({column}) = ''")
+            op.execute(f"UPDATE {table} SET {column} = json_quote({column}) "
+                       f"WHERE {column} IS NOT NULL AND json_valid({column}) = 0")
+        return
+    if bind.dialect.name != 'postgresql':
+        return
+    op.execute(_TRY_JSONB_FUNCTION)
+    for table, column, _ in COLUMNS:
+        op.alter_column(
+            table,
+            column,
+            type_=postgresql.JSONB(),
+            postgresql_using=f"pg_temp.legacy_to_jsonb({column})",
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, column, previous_type in reversed(COLUMNS):
+        op.alter_column(
+            table,
+            column,
+            type_=previous_type,
+            postgresql_using=f"{column}::text",
+        )
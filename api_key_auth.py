@@ -0,0 +1,152 @@
+import hashlib
+import logging
+from typing import Optional
+
+import redis
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from redis_client import get_async_redis
+from ttl_cache import TTLCache
+
+logger = logging.getLogger("vaulta.auth")
+
+# Lookups go local cache -> Redis -> database, keyed by the sha256 of the key
+# so raw keys never land in Redis. Unknown keys are cached too (for a shorter
+# time) so a client retrying a bad key doesn't reach the database each time.
+# Local entries are kept short because other workers only learn about a
+# toggle/delete when their copy expires.
+LOCAL_TTL = 5
+LOCAL_MAXSIZE = 10_000
+REDIS_TTL = 60 * 5
+NEGATIVE_TTL = 60
+
+_INVALID = "-"
+
+UNPROTECTED_PATHS = {
+    "/",                # health/root
+    "/login",
+    "/register",
+    "/verify-otp",
+    "/account",
+    # API key management endpoints should not require an API key themselves
+    "/api/v1/create_api_key",
+    "/api/v1/api_keys",
+    "/api/v1/toggle_api_key",
+    "/api/v1/delete_api_key",  # wildcard path excluded via startswith check below
+    # onboarding runs before the customer has an account (and so a key)
+    "/api/v1/onboarding",
+}
+
+_local = TTLCache(maxsize=LOCAL_MAXSIZE, ttl_seconds=LOCAL_TTL)
+
+
+class ApiKeyInfo(BaseModel):
+    user_id: str
+    is_active: bool = True
+
+
+def hash_api_key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+def _redis_key(key_hash: str) -> str:
+    return f"api_key:{key_hash}"
+
+
+def _load_from_db(api_key: str) -> Optional[ApiKeyInfo]:
+    import models
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        key_obj = db.query(models.ApiKey).filter(models.ApiKey.key == api_key).first()
+        if not key_obj:
+            return None
+        return ApiKeyInfo(user_id=key_obj.user_id, is_active=bool(key_obj.is_active))
+    finally:
+        db.close()
+
+
+async def lookup_api_key(api_key: str) -> Optional[ApiKeyInfo]:
+    key_hash = hash_api_key(api_key)
+
+    cached = _local.get(key_hash)
+    if cached is not None:
+        return None if cached == _INVALID else cached
+
+    ar = get_async_redis()
+    try:
+        raw = await ar.get(_redis_key(key_hash))
+    except redis.RedisError as e:
+        logger.warning(f"[api-key] Redis read failed: {e}")
+        raw = None
+    if raw is not None:
+        info = None if raw == _INVALID else ApiKeyInfo.model_validate_json(raw)
+        _local.set(key_hash, info or _INVALID)
+        return info
+
+    info = await run_in_threadpool(_load_from_db, api_key)
+    _local.set(key_hash, info or _INVALID)
+    try:
+        if info is None:
+            await ar.setex(_redis_key(key_hash), NEGATIVE_TTL, _INVALID)
+        else:
+            await ar.setex(_redis_key(key_hash), REDIS_TTL, info.model_dump_json())
+    except redis.RedisError as e:
+        logger.warning(f"[api-key] Redis write failed: {e}")
+    return info
+
+
+async def invalidate_api_key(api_key: str) -> None:
+    key_hash = hash_api_key(api_key)
+    _local.pop(key_hash)
+    try:
+        await get_async_redis().delete(_redis_key(key_hash))
+    except redis.RedisError as e:
+        logger.warning(f"[api-key] Redis invalidation failed: {e}")
+
+
+class ApiKeyMiddleware:
+    """Require a valid x-api-key on /api/v1/* routes outside UNPROTECTED_PATHS."""
+
+    def __init__(self, app: ASGIApp, unprotected_paths: set[str] = UNPROTECTED_PATHS):
+        self.app = app
+        self.unprotected_paths = unprotected_paths
+
+    def _needs_key(self, path: str) -> bool:
+        return path.startswith("/api/v1/") and not any(
+            path == p or path.startswith(p + "/") for p in self.unprotected_paths
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._needs_key(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        api_key = Headers(scope=scope).get("x-api-key")
+        if not api_key:
+            response = JSONResponse(status_code=401, content={"detail": "Missing x-api-key header"})
+            await response(scope, receive, send)
+            return
+
+        info = await lookup_api_key(api_key)
+        if info is None:
+            response = JSONResponse(status_code=403, content={"detail": "Invalid API key"})
+            await response(scope, receive, send)
+            return
+
+        # Expiry check is not enforced yet (see create_api_key).
+        if not info.is_active:
+            response = JSONResponse(status_code=403, content={"detail": "API key disabled"})
+            await response(scope, receive, send)
+            return
+
+        # Exposed to handlers as request.state.api_key / api_user_id
+        state = scope.setdefault("state", {})
+        state["api_key"] = api_key
+        state["api_user_id"] = info.user_id
+        await self.app(scope, receive, send)
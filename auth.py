@@ -0,0 +1,179 @@
+import logging
+
+import jwt
+import redis
+from fastapi import Depends, HTTPException
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+import revocation
+from core.config import settings
+from redis_client import r, get_async_redis, running_loop, spawn
+from ttl_cache import TTLCache
+
+logger = logging.getLogger("vaulta.auth")
+
+# Loaded once at import instead of on every request.
+JWT_SECRET = settings.JWT_SECRET or "your_jwt_secret"
+JWT_ALGORITHM = "HS256"
+
+# Decoded claims keyed by the raw token. Entries never outlive the token's own
+# `exp`, and are re-verified at least every CLAIMS_CACHE_TTL seconds.
+CLAIMS_CACHE_SIZE = 10_000
+CLAIMS_CACHE_TTL = 300
+
+# Per-user token version. Tokens carry the version they were minted with in
+# the `ver` claim; bumping it in Redis revokes every outstanding token for
+# that user. Workers keep the current value for a few seconds, which bounds
+# how long a revoked token can still be accepted.
+TOKEN_VERSION_CACHE_TTL = 5
+TOKEN_VERSION_CACHE_SIZE = 10_000
+
+_BUMP_USERS_KEY = "vaulta_token_bump_user_ids"
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+
+_claims_cache = TTLCache(maxsize=CLAIMS_CACHE_SIZE, ttl_seconds=CLAIMS_CACHE_TTL)
+_version_cache = TTLCache(maxsize=TOKEN_VERSION_CACHE_SIZE, ttl_seconds=TOKEN_VERSION_CACHE_TTL)
+
+
+def token_version_key(user_id: str) -> str:
+    return f"user_token_version:{user_id}"
+
+
+def get_token_version(user_id: str) -> int:
+    return int(r.get(token_version_key(user_id)) or 0)
+
+
+async def get_token_version_async(user_id: str) -> int:
+    version = _version_cache.get(user_id)
+    if version is None:
+        version = int(await get_async_redis().get(token_version_key(user_id)) or 0)
+        _version_cache.set(user_id, version)
+    return version
+
+
+def revoke_user_tokens(user_id: str) -> int:
+    """Invalidate every token issued to a user so far; returns the new version."""
+    version = r.incr(token_version_key(user_id))
+    _version_cache.pop(user_id)
+    logger.info(f"[auth] Token version for user {user_id} bumped to {version}")
+    return version
+
+
+async def revoke_user_tokens_async(user_id: str) -> int:
+    version = await get_async_redis().incr(token_version_key(user_id))
+    _version_cache.pop(user_id)
+    logger.info(f"[auth] Token version for user {user_id} bumped to {version}")
+    return version
+
+
+def decode_access_token(token: str) -> dict:
+    """Return the verified claims for a JWT, raising jwt.PyJWTError if invalid."""
+    claims = _claims_cache.get(token)
+    if claims is not None:
+        return claims
+
+    claims = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    exp = claims.get("exp")
+    _claims_cache.set(token, claims, expires_at=float(exp) if exp is not None else None)
+    return claims
+
+
+def forget_access_token(token: str) -> None:
+    _claims_cache.pop(token)
+
+
+async def revoke_access_token(token: str, claims: dict) -> None:
+    """Revoke a single JWT by its jti until it would have expired anyway."""
+    forget_access_token(token)
+    if claims.get("jti"):
+        await revocation.revoke_jti(claims["jti"], float(claims["exp"]))
+
+
+async def get_current_claims(token: str = Depends(oauth2_scheme)) -> dict:
+    try:
+        claims = decode_access_token(token)
+    except jwt.PyJWTError as e:
+        logger.warning(f"[auth] JWT decode error: {e}")
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    if not claims.get("sub"):
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    try:
+        current_version = await get_token_version_async(claims["sub"])
+    except redis.RedisError as e:
+        logger.error(f"[auth] Token version lookup failed for user {claims['sub']}: {e}")
+        raise HTTPException(status_code=503, detail="Authentication temporarily unavailable")
+    if claims.get("ver", 0) != current_version:
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+
+    jti = claims.get("jti")
+    if jti:
+        try:
+            revoked = await revocation.is_revoked(jti)
+        except redis.RedisError as e:
+            logger.error(f"[auth] Revocation lookup failed for jti {jti}: {e}")
+            raise HTTPException(status_code=503, detail="Authentication temporarily unavailable")
+        if revoked:
+            raise HTTPException(status_code=401, detail="Token has been revoked")
+    return claims
+
+
+async def get_authenticated_user_id(claims: dict = Depends(get_current_claims)) -> str:
+    return claims["sub"]
+
+
+async def require_admin(claims: dict = Depends(get_current_claims)) -> str:
+    """Authorize from the token's role claim; returns the admin's user id."""
+    if (claims.get("role") or "").lower() != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return claims["sub"]
+
+
+# A committed change to a user's role or verified flag (or deleting the user)
+# bumps their token version, so tokens carrying the old claims stop working.
+@event.listens_for(Session, "before_flush")
+def _collect_claim_changes(session, flush_context, instances):
+    from models import User
+
+    changed = session.info.setdefault(_BUMP_USERS_KEY, set())
+    for obj in session.dirty:
+        if isinstance(obj, User) and obj.id:
+            state = inspect(obj)
+            if state.attrs.role.history.has_changes() or state.attrs.verified.history.has_changes():
+                changed.add(str(obj.id))
+    for obj in session.deleted:
+        if isinstance(obj, User) and obj.id:
+            changed.add(str(obj.id))
+
+
+async def _bump_users_async(user_ids) -> None:
+    for user_id in user_ids:
+        try:
+            await revoke_user_tokens_async(user_id)
+        except redis.RedisError as e:
+            logger.error(f"[auth] Token version bump failed for user {user_id}: {e}")
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_changed_users(session):
+    user_ids = list(session.info.pop(_BUMP_USERS_KEY, ()))
+    if not user_ids:
+        return
+    if running_loop() is not None:
+        # committed from async code; don't block the loop on Redis
+        spawn(_bump_users_async(user_ids))
+        return
+    for user_id in user_ids:
+        try:
+            revoke_user_tokens(user_id)
+        except redis.RedisError as e:
+            logger.error(f"[auth] Token version bump failed for user {user_id}: {e}")
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_claim_changes(session, previous_transaction):
+    session.info.pop(_BUMP_USERS_KEY, None)
@@ -1,12 +1,16 @@
 # auth_store.py
 from datetime import timedelta
+import hashlib
 import os
 
 import jwt
-from redis_client import r
+from redis_client import r, get_async_redis
+import user_cache
+from user_cache import CachedUser
 
 ACCESS_TTL = 60 * 15        # 15 minutes (adjust as needed)
 OTP_TTL     = 60 * 10        # 10 minutes
+MAX_OTP_ATTEMPTS = 5
 
 def save_access_token(token: str, user_id: str) -> None:
     r.setex(f"access:{token}", ACCESS_TTL, user_id)
@@ -25,29 +29,72 @@ def get_user_otp(user_id: str) -> str | None:
 
 def clear_user_otp(user_id: str) -> None:
     r.delete(f"user_otp:{user_id}")
-    
-def get_user_by_id(user_id: str) -> None:
-    from models import User
-    from database import SessionLocal
 
-    db = SessionLocal()
-    user = db.query(User).filter(User.id == user_id).first()
-    db.close()
-    return user
+def get_user_by_id(user_id: str) -> CachedUser | None:
+    return user_cache.get_user(user_id)
 
-def get_user_by_jwt(token):
-    from models import User
-    from database import SessionLocal
+def get_user_by_jwt(token) -> CachedUser | None:
+    from auth import decode_access_token
 
     try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
+        payload = decode_access_token(token)
         user_id = payload.get("sub")
         if not user_id:
             return None
     except jwt.PyJWTError:
         return None
 
-    db = SessionLocal()
-    user = db.query(User).filter(User.id == user_id).first()
-    db.close()
-    return user
+    return user_cache.get_user(user_id)
+
+# Pending logins live in one hash per login token: login:<token> ->
+# {user_id, otp (sha256), attempts}. Starting a login is a single MULTI
+# round trip; verifying is a single atomic script call that checks the OTP,
+# counts failed attempts and consumes the state on success or lock-out.
+_VERIFY_LOGIN_LUA = """
+local state = redis.call('HMGET', KEYS[1], 'user_id', 'otp')
+if not state[1] then
+  return {'missing'}
+end
+if state[2] == ARGV[1] then
+  redis.call('DEL', KEYS[1])
+  return {'ok', state[1]}
+end
+local attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+if attempts >= tonumber(ARGV[2]) then
+  redis.call('DEL', KEYS[1])
+  return {'locked', state[1]}
+end
+return {'invalid', state[1]}
+"""
+
+_verify_login_script = None
+
+def _login_key(token: str) -> str:
+    return f"login:{token}"
+
+def _hash_otp(otp: str) -> str:
+    return hashlib.sha256(otp.encode()).hexdigest()
+
+async def start_login_async(token: str, user_id: str, otp: str) -> None:
+    key = _login_key(token)
+    async with get_async_redis().pipeline(transaction=True) as pipe:
+        await (
+            pipe.hset(key, mapping={"user_id": user_id, "otp": _hash_otp(otp), "attempts": 0})
+            .expire(key, OTP_TTL)
+            .execute()
+        )
+
+async def verify_login_otp_async(token: str, otp: str) -> tuple[str, str | None]:
+    """Return (status, user_id); status is one of ok, invalid, locked, missing."""
+    global _verify_login_script
+    ar = get_async_redis()
+    if _verify_login_script is None or _verify_login_script.registered_client is not ar:
+        _verify_login_script = ar.register_script(_VERIFY_LOGIN_LUA)
+
+    result = await _verify_login_script(keys=[_login_key(token)], args=[_hash_otp(otp), MAX_OTP_ATTEMPTS])
+    status = result[0]
+    user_id = result[1] if len(result) > 1 else None
+    return status, user_id
+
+async def get_user_by_id_async(user_id: str) -> CachedUser | None:
+    return await user_cache.get_user_async(user_id)
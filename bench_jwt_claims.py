@@ -0,0 +1,61 @@
+"""
+Microbenchmark for the cached JWT claims in auth.decode_access_token.
+
+Compares what every /api/v1 handler used to do per request (read the
+secret with os.getenv, then jwt.decode) with the cached decoder, on the
+same HS256 token:
+
+    python bench_jwt_claims.py
+    python bench_jwt_claims.py --iterations 200000
+
+Run it from the app environment (auth.py needs the usual settings to
+import). No Redis or database is touched.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import jwt
+
+import auth
+
+
+def _per_call_us(fn, iterations: int) -> float:
+    fn()  # warm up (and, for the cached path, fill the cache)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50_000)
+    args = parser.parse_args()
+
+    token = jwt.encode(
+        {"sub": "user_bench", "exp": datetime.now(timezone.utc) + timedelta(hours=1), "ver": 0},
+        auth.JWT_SECRET,
+        algorithm=auth.JWT_ALGORITHM,
+    )
+
+    def uncached():
+        secret = os.getenv("JWT_SECRET", auth.JWT_SECRET)
+        return jwt.decode(token, secret, algorithms=[auth.JWT_ALGORITHM])
+
+    def cached():
+        return auth.decode_access_token(token)
+
+    assert uncached() == cached()
+    before = _per_call_us(uncached, args.iterations)
+    after = _per_call_us(cached, args.iterations)
+    print(f"HS256, {args.iterations} iterations")
+    print(f"  getenv + jwt.decode per request: {before:8.2f} us")
+    print(f"  cached decode_access_token:      {after:8.2f} us  ({before / after:.0f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Load check for the Redis calls on the login path: sync client vs the
+asyncio pool (redis_client.get_async_redis).
+
+Runs N concurrent simulated logins on one event loop. Each stores the
+pending login / OTP and reads the user through the user cache's Redis
+tier, first with the sync authstore calls, then with the async ones. A
+ticker coroutine records how long the loop goes without getting a turn;
+blocking calls show up there as stalls.
+
+    python bench_redis_auth.py
+    python bench_redis_auth.py --logins 5000
+
+Uses REDIS_URL (bench:* keys, deleted afterwards); the database is not
+touched, the cached user is written straight into Redis.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import authstore
+import redis_client
+import user_cache
+from redis_client import r
+
+USER_ID = "bench:user"
+
+
+async def _ticker(stop: asyncio.Event, stalls: list) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0)
+        stalls.append(time.perf_counter() - start)
+
+
+async def login_sync(i: int) -> None:
+    authstore.save_access_token(f"bench:{i}", USER_ID)
+    authstore.save_user_otp(USER_ID, "123456")
+    user_cache._local.pop(USER_ID)
+    assert authstore.get_user_by_id(USER_ID) is not None
+
+
+async def login_async(i: int) -> None:
+    await authstore.start_login_async(f"bench:{i}", USER_ID, "123456")
+    user_cache._local.pop(USER_ID)
+    assert await authstore.get_user_by_id_async(USER_ID) is not None
+
+
+async def run(login, logins: int) -> None:
+    stop, stalls = asyncio.Event(), []
+    ticker = asyncio.create_task(_ticker(stop, stalls))
+    start = time.perf_counter()
+    await asyncio.gather(*(login(i) for i in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    print(f"{login.__name__:12} {logins / elapsed:8.0f} logins/s   max loop stall {max(stalls) * 1000:7.1f} ms")
+
+
+async def main_async(logins: int) -> None:
+    redis_client.init_async_redis()
+    cached = user_cache.CachedUser(id=USER_ID, first_name="Bench", verified=True)
+    r.hset(user_cache.user_key(USER_ID), mapping=user_cache._to_hash(cached))
+    try:
+        await run(login_sync, logins)
+        await run(login_async, logins)
+    finally:
+        keys = list(r.scan_iter("bench:*")) + list(r.scan_iter("*:bench:*")) + [user_cache.user_key(USER_ID)]
+        for start in range(0, len(keys), 500):
+            r.delete(*keys[start:start + 500])
+        await redis_client.close_async_redis()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.logins))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,13 @@
 import os
-import requests
+
+from http_clients import get_sync_http_client
+
 baseUrl = "https://api.bridge.xyz/v0"
 
 def get_all_transactions():
     apiUrl = f"{baseUrl}/transfers"
     headers = {"Api-Key":os.getenv('BRIDGE_LIVE_API_KEY')}
-    response = requests.get(apiUrl, headers=headers)
+    response = get_sync_http_client("bridge").get(apiUrl, headers=headers)
     if response.status_code == 200:
         transactions = response.json()
         return transactions
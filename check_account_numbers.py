@@ -0,0 +1,136 @@
+"""
+Check that account numbers stay unique: under concurrent allocation from
+several workers, and after the Redis counter is lost.
+
+Seeds a throwaway SQLite database, so blocks come from the Redis counter
+(REDIS_COUNTER_KEY) rather than the Postgres sequence:
+
+  1. four allocators (stand-ins for four worker processes) hand out
+     numbers from many threads at once; every number must be unique,
+     10 digits and Luhn-valid;
+  2. the numbers are stored as accounts, the counter is deleted (as a
+     Redis flush or failover would) and fresh allocators must not hand
+     out any stored number again;
+  3. POST /api/v1/create_account is called concurrently through the app
+     and the stored accounts must all have distinct numbers.
+
+    python check_account_numbers.py
+    python check_account_numbers.py --numbers 50000 --threads 64
+
+Fails (exit code 1) on any duplicate or invalid number. The Redis
+counter key is overwritten, so point REDIS_URL at a scratch instance.
+Run it from the app environment (the usual settings must be set).
+"""
+import argparse
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "account_numbers.db")
+os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+for name in (
+    "SQLALCHEMY_ASYNC_DATABASE_URL",
+    "SQLALCHEMY_REPLICA_DATABASE_URL",
+    "SQLALCHEMY_ASYNC_REPLICA_DATABASE_URL",
+):
+    os.environ.pop(name, None)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import account_numbers  # noqa: E402
+import database  # noqa: E402
+import main  # noqa: E402
+import models  # noqa: E402
+import services  # noqa: E402
+from redis_client import r  # noqa: E402
+
+USER_ID = "account_numbers_check"
+API_KEY = "account_numbers_key"
+WORKERS = 4
+
+
+def seed() -> None:
+    db = database.SessionLocal()
+    try:
+        db.add(models.User(id=USER_ID, first_name="A", last_name="N", email=f"{USER_ID}@example.com", verified=True))
+        db.add(models.ApiKey(key=API_KEY, user_id=USER_ID, is_active=True))
+        db.commit()
+    finally:
+        db.close()
+
+
+def store(numbers: list) -> None:
+    db = database.SessionLocal()
+    try:
+        db.add_all(
+            models.Account(user_id=USER_ID, account_name=f"check {i}", account_number=number, currency="USD")
+            for i, number in enumerate(numbers)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def allocate(count: int, threads: int) -> list:
+    allocators = [account_numbers.AccountNumberAllocator() for _ in range(WORKERS)]
+    with ThreadPoolExecutor(threads) as pool:
+        return list(pool.map(lambda i: allocators[i % WORKERS].next(), range(count)))
+
+
+def report(name: str, numbers: list) -> bool:
+    duplicates = len(numbers) - len(set(numbers))
+    invalid = sum(not account_numbers.is_valid_account_number(number) for number in numbers)
+    ok = not duplicates and not invalid
+    print(f"[{'ok' if ok else 'FAIL'}] {name}: {len(numbers)} numbers, {duplicates} duplicates, {invalid} invalid")
+    return ok
+
+
+def main_check() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--numbers", type=int, default=20_000, help="numbers to allocate concurrently")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=200, help="create_account calls through the app")
+    args = parser.parse_args()
+
+    seed()
+    r.delete(account_numbers.REDIS_COUNTER_KEY)
+    results = []
+
+    issued = allocate(args.numbers, args.threads)
+    results.append(report("concurrent allocation", issued))
+    store(issued)
+
+    r.delete(account_numbers.REDIS_COUNTER_KEY)
+    after_reset = allocate(args.numbers // 4, args.threads)
+    results.append(report("after counter reset", issued + after_reset))
+
+    token = services.issue_jwt_token(USER_ID, verified=True)["jwt_token"]
+    headers = {"Authorization": f"Bearer {token}", "x-api-key": API_KEY}
+    r.delete(account_numbers.REDIS_COUNTER_KEY)
+    with TestClient(main.app) as client:
+        def create(i):
+            return client.post("/api/v1/create_account", headers=headers,
+                               json={"name": f"api {i}", "currency": "USD"}).status_code
+
+        with ThreadPoolExecutor(16) as pool:
+            codes = list(pool.map(create, range(args.requests)))
+    created = codes.count(201)
+    print(f"[{'ok' if created == args.requests else 'FAIL'}] create_account: {created}/{args.requests} created")
+    results.append(created == args.requests)
+
+    db = database.SessionLocal()
+    try:
+        stored = [number for (number,) in db.query(models.Account.account_number)]
+    finally:
+        db.close()
+    results.append(report("stored accounts", stored))
+
+    r.delete(account_numbers.REDIS_COUNTER_KEY)
+    failures = results.count(False)
+    print(f"{failures} of {len(results)} checks failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_check())
@@ -0,0 +1,261 @@
+"""
+Check that concurrent payment decisions never approve a payment twice or
+post its ledger entry twice.
+
+Seeds pending payments, then races, through the app on one event loop:
+two admins each approving or rejecting the whole set in batches
+(POST /api/v1/admin/payments/approve), plus single approvals for every
+payment (POST /api/v1/payments/{id}/approve) from both. Afterwards:
+
+  - every payment is decided exactly once: one request reports it
+    approved or rejected, and admin_approved_by is that request's admin
+  - an approved payment has one transaction and one ledger entry, a
+    rejected one neither
+  - account_balances agrees with the postings (ledger.verify_balances)
+
+Then approves, in one batch, payments whose client_reference is already
+used by a transaction or shared within the batch: each must come back
+"reference_conflict" and stay pending (the single-payment endpoint
+answers 409) while the rest of the batch is approved.
+
+    python check_payment_approvals.py
+    python check_payment_approvals.py --database-url postgresql://localhost/scratch
+
+Uses a throwaway SQLite file unless --database-url is given; row locks
+(FOR UPDATE / SKIP LOCKED) are only exercised on Postgres, so point it at
+a scratch Postgres database to check those too. Fails (exit code 1) on
+any violation. Run it from the app environment (the usual settings must
+be set).
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+from collections import defaultdict
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--database-url", help="scratch database (default: a temporary SQLite file)")
+parser.add_argument("--payments", type=int, default=40)
+parser.add_argument("--rounds", type=int, default=3, help="batches per admin")
+parser.add_argument("--seed", type=int, default=0, help="shuffles the order the requests start in")
+ARGS = parser.parse_args()
+
+os.environ["SQLALCHEMY_DATABASE_URL"] = ARGS.database_url or (
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'payment_approvals.db')}"
+)
+for name in (
+    "SQLALCHEMY_ASYNC_DATABASE_URL",
+    "SQLALCHEMY_REPLICA_DATABASE_URL",
+    "SQLALCHEMY_ASYNC_REPLICA_DATABASE_URL",
+):
+    os.environ.pop(name, None)
+
+import httpx  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+
+import database  # noqa: E402
+import ledger  # noqa: E402
+import main  # noqa: E402
+import models  # noqa: E402
+import redis_client  # noqa: E402
+import services  # noqa: E402
+
+PREFIX = "approvals_check"
+ADMINS = [f"{PREFIX}_admin_a", f"{PREFIX}_admin_b"]
+USER_ID = f"{PREFIX}_user"
+CONFLICT_USER_ID = f"{PREFIX}_conflict_user"
+API_KEY = f"{PREFIX}_key"
+TAKEN_REFERENCE = f"{PREFIX}_taken"
+# payment id -> client_reference; the first two collide with an existing
+# transaction and with each other, the last two are free
+CONFLICT_PAYMENTS = {
+    f"{PREFIX}_ref_taken": TAKEN_REFERENCE,
+    f"{PREFIX}_ref_shared_a": f"{PREFIX}_shared",
+    f"{PREFIX}_ref_shared_b": f"{PREFIX}_shared",
+    f"{PREFIX}_ref_free": f"{PREFIX}_free",
+}
+
+
+def _payment(payment_id: str, user_id: str, account: models.Account, client_reference=None) -> models.Payment:
+    return models.Payment(id=payment_id, user_id=user_id, source_account_id=str(account.id), amount="1.25",
+                          currency="USDC", destination_rail="stablecoin", destination_network="solana",
+                          destination_address="x", status="pending", client_reference=client_reference,
+                          fees_data=[{"type": "network", "amount": "0.10", "currency": "USDC"}])
+
+
+def _headers(admin: str) -> dict:
+    return {
+        "Authorization": f"Bearer {services.issue_jwt_token(admin, role='admin', verified=True)['jwt_token']}",
+        "x-api-key": API_KEY,
+    }
+
+
+def seed(count: int) -> list:
+    db = database.SessionLocal()
+    try:
+        for user_id in ADMINS + [USER_ID, CONFLICT_USER_ID]:
+            db.add(models.User(id=user_id, first_name="P", last_name="A", email=f"{user_id}@example.com",
+                               role="admin" if user_id in ADMINS else None, verified=True))
+        db.flush()
+        db.add(models.ApiKey(key=API_KEY, user_id=ADMINS[0], is_active=True))
+        account = models.Account(user_id=USER_ID, account_name="check", account_number=f"{PREFIX}_acct",
+                                 currency="USDC")
+        conflict_account = models.Account(user_id=CONFLICT_USER_ID, account_name="check",
+                                          account_number=f"{PREFIX}_conflict_acct", currency="USDC")
+        db.add_all([account, conflict_account])
+        db.add(models.Transaction(amount=1, currency="USDC", user_id=CONFLICT_USER_ID, transaction_type="deposit",
+                                  provider="internal", status="completed", reference=TAKEN_REFERENCE))
+        db.flush()
+        payment_ids = [f"{PREFIX}_pay_{i}" for i in range(count)]
+        db.add_all(_payment(payment_id, USER_ID, account) for payment_id in payment_ids)
+        db.add_all(
+            _payment(payment_id, CONFLICT_USER_ID, conflict_account, reference)
+            for payment_id, reference in CONFLICT_PAYMENTS.items()
+        )
+        db.commit()
+        return payment_ids
+    finally:
+        db.close()
+
+
+async def race(payment_ids: list, rounds: int) -> dict:
+    """Fire every request at once; returns {payment_id: [admins that decided it]}."""
+    headers = {admin: _headers(admin) for admin in ADMINS}
+    decided_by = defaultdict(list)
+
+    async def batch(client, admin, approve_all):
+        decisions = [
+            {"payment_id": payment_id, "approved": approve_all or i % 2 == 0}
+            for i, payment_id in enumerate(payment_ids)
+        ]
+        response = await client.post("/api/v1/admin/payments/approve", headers=headers[admin],
+                                     json={"decisions": decisions})
+        response.raise_for_status()
+        for result in response.json()["results"]:
+            if result["outcome"] in ("approved", "rejected"):
+                decided_by[result["payment_id"]].append(admin)
+
+    async def single(client, admin, payment_id):
+        response = await client.post(f"/api/v1/payments/{payment_id}/approve", headers=headers[admin],
+                                     json={"approved": True})
+        if response.status_code == 200:
+            decided_by[payment_id].append(admin)
+        elif response.status_code != 400:
+            response.raise_for_status()
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://check") as client:
+        requests = [batch(client, admin, approve_all=admin == ADMINS[0]) for admin in ADMINS for _ in range(rounds)]
+        requests += [single(client, admin, payment_id) for admin in ADMINS for payment_id in payment_ids]
+        # mixed start order, so singles and batches each win some
+        random.Random(ARGS.seed).shuffle(requests)
+        await asyncio.gather(*requests)
+    return decided_by
+
+
+async def verify(payment_ids: list, decided_by: dict) -> list:
+    problems = []
+    async with database.AsyncSessionLocal() as db:
+        payments = (await db.execute(select(models.Payment).where(models.Payment.id.in_(payment_ids)))).scalars()
+        entries = dict((await db.execute(
+            select(models.LedgerPosting.payment_id, func.count(func.distinct(models.LedgerPosting.entry_id)))
+            .where(models.LedgerPosting.payment_id.in_(payment_ids))
+            .group_by(models.LedgerPosting.payment_id)
+        )).all())
+        for payment in payments:
+            admins = decided_by.get(payment.id, [])
+            if len(admins) != 1:
+                problems.append(f"{payment.id}: decided by {len(admins)} requests ({payment.status})")
+            elif payment.admin_approved_by != admins[0]:
+                problems.append(f"{payment.id}: recorded {payment.admin_approved_by}, decided by {admins[0]}")
+            approved = payment.status == "approved"
+            if entries.get(payment.id, 0) != int(approved):
+                problems.append(f"{payment.id}: {payment.status} with {entries.get(payment.id, 0)} ledger entries")
+            if approved != (payment.transaction_id is not None):
+                problems.append(f"{payment.id}: {payment.status} with transaction_id={payment.transaction_id}")
+        transactions = (await db.execute(
+            select(func.count()).select_from(models.Transaction).where(models.Transaction.user_id == USER_ID)
+        )).scalar_one()
+        approved_count = (await db.execute(
+            select(func.count()).select_from(models.Payment)
+            .where(models.Payment.id.in_(payment_ids), models.Payment.status == "approved")
+        )).scalar_one()
+        if transactions != approved_count:
+            problems.append(f"{transactions} transactions for {approved_count} approved payments")
+        problems.extend(f"balance mismatch: {row}" for row in await ledger.verify_balances(db))
+    return problems
+
+
+async def reference_conflicts() -> list:
+    """Approve CONFLICT_PAYMENTS in one batch; returns the problems found."""
+    problems = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://check") as client:
+        response = await client.post("/api/v1/admin/payments/approve", headers=_headers(ADMINS[0]), json={
+            "decisions": [{"payment_id": payment_id, "approved": True} for payment_id in CONFLICT_PAYMENTS],
+        })
+        if response.status_code != 200:
+            return [f"batch with reference conflicts: HTTP {response.status_code} {response.text[:200]}"]
+        outcomes = {result["payment_id"]: result["outcome"] for result in response.json()["results"]}
+        expected = {
+            f"{PREFIX}_ref_taken": "reference_conflict",
+            f"{PREFIX}_ref_shared_a": "approved",  # claimed in id order, so _a wins
+            f"{PREFIX}_ref_shared_b": "reference_conflict",
+            f"{PREFIX}_ref_free": "approved",
+        }
+        problems.extend(
+            f"{payment_id}: outcome {outcomes.get(payment_id)}, expected {outcome}"
+            for payment_id, outcome in expected.items() if outcomes.get(payment_id) != outcome
+        )
+        response = await client.post(f"/api/v1/payments/{PREFIX}_ref_taken/approve", headers=_headers(ADMINS[1]),
+                                     json={"approved": True})
+        if response.status_code != 409:
+            problems.append(f"single approval with a taken reference: HTTP {response.status_code}, expected 409")
+
+    async with database.AsyncSessionLocal() as db:
+        payments = (await db.execute(
+            select(models.Payment).where(models.Payment.id.in_(list(CONFLICT_PAYMENTS)))
+        )).scalars()
+        for payment in payments:
+            conflicted = expected[payment.id] == "reference_conflict"
+            if conflicted and (payment.status != "pending" or payment.transaction_id is not None):
+                problems.append(f"{payment.id}: {payment.status} with transaction_id={payment.transaction_id} "
+                                f"after a reference conflict")
+        transactions = (await db.execute(
+            select(func.count()).select_from(models.Transaction)
+            .where(models.Transaction.user_id == CONFLICT_USER_ID)
+        )).scalar_one()
+        if transactions != 3:  # the seeded one and the two approvals
+            problems.append(f"{transactions} transactions for the reference-conflict user, expected 3")
+    return problems
+
+
+async def run(payment_ids: list) -> tuple:
+    try:
+        decided_by = await race(payment_ids, ARGS.rounds)
+        problems = await reference_conflicts()
+        return decided_by, await verify(payment_ids, decided_by) + problems
+    finally:
+        # no lifespan here: close what the requests opened
+        await redis_client.close_async_redis()
+        await database.async_engine.dispose()
+
+
+def main_check() -> int:
+    payment_ids = seed(ARGS.payments)
+    decided_by, problems = asyncio.run(run(payment_ids))
+    for problem in problems:
+        print(f"[FAIL] {problem}")
+    wins = defaultdict(int)
+    for admins in decided_by.values():
+        for admin in admins:
+            wins[admin] += 1
+    print(f"{len(payment_ids)} payments, decisions per admin: {dict(wins)}")
+    print(f"{len(problems)} problems found")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_check())
@@ -0,0 +1,127 @@
+"""
+Check that the KYC endpoints run a fixed number of SQL statements per
+request, however many rows they return (no N+1 over user_kyc_ubos).
+
+Seeds a throwaway SQLite database with KYC entries, UBOs and document
+reviews, calls the endpoints through the app and counts the statements
+each request executes. Fails (exit code 1) if a list endpoint's count
+grows with the page size, or any request goes over its budget.
+
+    python check_query_counts.py
+    python check_query_counts.py --verbose      # print every statement
+
+The database URLs are pointed at the scratch file before the app is
+imported; Redis (REDIS_URL) must be reachable, as for the app itself.
+Run it from the app environment (the usual settings must be set).
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "query_counts.db")
+os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+for name in (
+    "SQLALCHEMY_ASYNC_DATABASE_URL",
+    "SQLALCHEMY_REPLICA_DATABASE_URL",
+    "SQLALCHEMY_ASYNC_REPLICA_DATABASE_URL",
+):
+    os.environ.pop(name, None)
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+import database  # noqa: E402
+import main  # noqa: E402
+import models  # noqa: E402
+import services  # noqa: E402
+
+KYC_ENTRIES = 150
+ADMIN_ID = "query_counts_admin"
+API_KEY = "query_counts_key"
+
+# statements per request, fixed regardless of rows returned
+BUDGETS = {
+    "admin KYC list": 2,    # page + UBO counts (include_total=false)
+    "user KYC list": 2,     # entries + UBO counts
+    "KYC detail": 3,        # entry + ubos + document reviews (selectinload)
+    "review status": 2,     # entry + document reviews
+}
+
+
+def seed() -> None:
+    db = database.SessionLocal()
+    try:
+        db.add(models.User(id=ADMIN_ID, first_name="Q", last_name="C", email=f"{ADMIN_ID}@example.com",
+                           role="admin", verified=True))
+        db.add(models.ApiKey(key=API_KEY, user_id=ADMIN_ID, is_active=True))
+        for i in range(KYC_ENTRIES):
+            # user_kyc.user_id is unique: the admin owns one entry
+            kyc = models.UserKyc(reference_id=f"qc_{i}", user_id=ADMIN_ID if i == 0 else None,
+                                 email=f"qc_{i}@example.com", hidden=False)
+            db.add(kyc)
+            db.flush()
+            for j in range(i % 4):
+                db.add(models.UserKycUbo(kyc_id=kyc.id, ubo_reference_id=f"qc_{i}_{j}",
+                                         persona_status="approved" if j % 2 else "pending"))
+            if i % 3 == 0:
+                db.add(models.UserKycDocumentReview(kyc_id=kyc.id, document_field="aml_document", status="approved"))
+        db.commit()
+    finally:
+        db.close()
+
+
+class StatementCounter:
+    def __init__(self, verbose: bool):
+        self.statements = []
+        self.verbose = verbose
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def count(self, client: TestClient, url: str, headers: dict) -> int:
+        self.statements = []
+        response = client.get(url, headers=headers)
+        response.raise_for_status()
+        if self.verbose:
+            print(f"  GET {url}")
+            for statement in self.statements:
+                print("    " + " ".join(statement.split())[:160])
+        return len(self.statements)
+
+
+def main_check() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="print the statements of every request")
+    args = parser.parse_args()
+
+    seed()
+    counter = StatementCounter(args.verbose)
+    for engine in (database.engine, database.async_engine.sync_engine):
+        event.listen(engine, "before_cursor_execute", counter)
+
+    token = services.issue_jwt_token(ADMIN_ID, role="admin", verified=True)["jwt_token"]
+    headers = {"Authorization": f"Bearer {token}", "x-api-key": API_KEY}
+    checks = {
+        "admin KYC list": [f"/api/v1/admin/kyc?include_total=false&page_size={size}" for size in (10, 50, 100)],
+        "user KYC list": ["/api/v1/kyc"],
+        "KYC detail": ["/api/v1/kyc/qc_7"],
+        "review status": ["/api/v1/admin/kyc/qc_6/documents/review-status"],
+    }
+
+    failures = 0
+    with TestClient(main.app) as client:
+        # first request fills the user / API key caches
+        client.get(checks["user KYC list"][0], headers=headers).raise_for_status()
+        for name, urls in checks.items():
+            counts = [counter.count(client, url, headers) for url in urls]
+            ok = max(counts) <= BUDGETS[name] and len(set(counts)) == 1
+            failures += not ok
+            print(f"[{'ok' if ok else 'FAIL'}] {name}: {', '.join(map(str, counts))} statements (budget {BUDGETS[name]})")
+
+    print(f"{failures} of {len(checks)} checks failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_check())
@@ -0,0 +1,144 @@
+"""
+Check that the hot queries main.py runs are served by an index.
+
+Seeds a scratch database with a realistic spread of rows, then runs
+EXPLAIN on each query and fails (exit code 1) if any of them falls back to
+a sequential scan of one of its tables.
+
+    python check_query_plans.py                                   # throwaway SQLite file
+    python check_query_plans.py --database-url postgresql://.../vaulta_plans
+
+The target database is created from models.py and filled with test rows,
+so never point it at a real database. Run it from the app environment
+(models.py needs the usual settings to import).
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select, text
+
+import models
+
+USERS = 2_000
+TRANSACTIONS_PER_USER = 20
+PAYMENTS_PER_USER = 5
+KYC_ENTRIES = 2_000
+
+
+def seed(engine) -> None:
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    rnd = random.Random(7)
+    base = datetime(2026, 1, 1)
+
+    users, accounts, transactions, payments, kycs, ubos, api_keys = [], [], [], [], [], [], []
+    for u in range(USERS):
+        user_id = f"user_{u}"
+        users.append(dict(id=user_id, first_name="F", last_name="L", email=f"{user_id}@example.com", role=None, verified=True))
+        api_keys.append(dict(key=f"key_{u}", user_id=user_id, is_active=True))
+        for a in range(2):
+            accounts.append(dict(user_id=user_id, account_name=f"acct {a}", account_number=f"{u:06d}{a}", currency="USD",
+                                 status="ACTIVE" if a == 0 else "DELETED", balance=0, account_type="current"))
+        for t in range(TRANSACTIONS_PER_USER):
+            transactions.append(dict(user_id=user_id, amount=rnd.randint(1, 10_000), currency="USD", transaction_type="deposit",
+                                     provider="internal", status="completed", created_at=base + timedelta(minutes=rnd.randint(0, 500_000))))
+        for p in range(PAYMENTS_PER_USER):
+            payments.append(dict(id=f"pay_{u}_{p}", user_id=user_id, amount="10", currency="USDC",
+                                 status="pending" if rnd.random() < 0.02 else "approved",
+                                 created_at=base + timedelta(minutes=rnd.randint(0, 500_000))))
+    for k in range(KYC_ENTRIES):
+        kycs.append(dict(id=k + 1, user_id=f"user_{k}", reference_id=f"ref_{k}", email=f"user_{k}@example.com",
+                         hidden=rnd.random() < 0.05, created_at=base + timedelta(minutes=k)))
+        for b in range(3):
+            ubos.append(dict(kyc_id=k + 1, ubo_reference_id=f"ubo_{k}_{b}", email=f"ubo_{k}_{b}@example.com", persona_status="approved"))
+
+    with engine.begin() as conn:
+        for model, rows in (
+            (models.User, users), (models.ApiKey, api_keys), (models.Account, accounts),
+            (models.Transaction, transactions), (models.Payment, payments),
+            (models.UserKyc, kycs), (models.UserKycUbo, ubos),
+        ):
+            conn.execute(model.__table__.insert(), rows)
+        conn.execute(text("ANALYZE"))
+
+
+def hot_queries():
+    tx, pay, acct, kyc, ubo = models.Transaction, models.Payment, models.Account, models.UserKyc, models.UserKycUbo
+    return {
+        "transactions for user (newest first)": select(tx).where(tx.user_id == "user_7")
+            .order_by(tx.created_at.desc(), tx.id.desc()).limit(51),
+        "pending intents for user": select(pay).where(pay.user_id == "user_7", pay.status == "pending")
+            .order_by(pay.created_at.desc(), pay.id.desc()).limit(51),
+        "admin pending queue": select(pay).where(pay.status == "pending")
+            .order_by(pay.created_at, pay.id).limit(51),
+        "active accounts for user": select(acct).where(acct.user_id == "user_7", acct.status == "ACTIVE"),
+        "admin KYC list": select(kyc).where(kyc.hidden == False).order_by(kyc.created_at.desc()).limit(20),
+        "KYC for user": select(kyc).where(kyc.user_id == "user_7", kyc.hidden == False),
+        "KYC by reference": select(kyc).where(kyc.reference_id == "ref_7"),
+        "UBO by KYC and email": select(ubo).where(ubo.kyc_id == 8, ubo.email == "ubo_7_1@example.com"),
+        "UBO counts for a page": select(ubo.kyc_id, func.count(ubo.id)).where(ubo.kyc_id.in_(list(range(1, 21))))
+            .group_by(ubo.kyc_id),
+        "user by email": select(models.User).where(models.User.email == "user_7@example.com"),
+        "API key lookup": select(models.ApiKey).where(models.ApiKey.key == "key_7"),
+    }
+
+
+def _pg_seq_scans(plan: dict) -> list:
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found.extend(_pg_seq_scans(child))
+    return found
+
+
+def seq_scans(conn, stmt) -> tuple:
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "postgresql":
+        raw = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+        return _pg_seq_scans(plan), json.dumps(plan, indent=1)
+    rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    details = [row[-1] for row in rows]
+    # "SCAN t" is a full table scan; "SCAN t USING [COVERING] INDEX" and
+    # "SEARCH t USING ..." are not.
+    scans = [d.split()[1] for d in details if d.startswith("SCAN ") and " USING " not in d]
+    return scans, "\n".join(details)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="scratch database to seed (default: a temporary SQLite file)")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'query_plans.db')}"
+    engine = create_engine(url)
+    print(f"Seeding {url} ...")
+    seed(engine)
+
+    failures = 0
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            # the planner may legitimately prefer a seq scan on tiny tables;
+            # this makes any remaining seq scan mean "no usable index"
+            conn.execute(text("SET enable_seqscan = off"))
+        for name, stmt in hot_queries().items():
+            scans, plan = seq_scans(conn, stmt)
+            ok = not scans
+            failures += not ok
+            print(f"[{'ok' if ok else 'SEQ SCAN'}] {name}" + ("" if ok else f" -> {', '.join(scans)}"))
+            if args.verbose or not ok:
+                print("    " + plan.replace("\n", "\n    "))
+
+    print(f"{failures} of {len(hot_queries())} hot queries fall back to a sequential scan")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
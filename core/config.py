@@ -27,6 +27,23 @@ class Settings(BaseSettings):
     ETHERSCAN_API_KEY: Optional[str] = None
     ENV: str = "DEV"
 
+    # Database connection pool (per engine, per worker process)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Set when connecting through PgBouncer in transaction mode
+    DB_PGBOUNCER: bool = False
+    # After a user's request commits a write, their reads stay on the primary
+    # for this many seconds (read-your-writes over replica lag)
+    DB_READ_YOUR_WRITES_SECONDS: int = 5
+    # Transaction history: recent-history reads only touch the last
+    # TRANSACTIONS_HOT_MONTHS monthly partitions; months older than
+    # TRANSACTIONS_ARCHIVE_AFTER_MONTHS move to transactions_archive
+    TRANSACTIONS_HOT_MONTHS: int = 3
+    TRANSACTIONS_ARCHIVE_AFTER_MONTHS: int = 12
+
     # Firebase
     FIREBASE_STORAGE_BUCKET: Optional[str] = None
     FIREBASE_CREDENTIALS_PATH: Optional[str] = None
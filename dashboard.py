@@ -0,0 +1,330 @@
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+import redis
+from sqlalchemy import String, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import ledger
+import models
+from database import AsyncSessionLocal
+import transaction_partitions
+from redis_client import get_async_redis
+
+logger = logging.getLogger("vaulta.dashboard")
+
+# Per-user dashboard numbers for GET /account, kept in Redis and adjusted
+# as payments and transactions are written, so reading them is one round
+# trip instead of several aggregate queries:
+#
+#   dashboard:{user_id}         hash: balance:{currency}, pending_payments,
+#                               transactions (all counts / minor units)
+#   dashboard:{user_id}:recent  list of the latest transactions, newest
+#                               first (sort key + JSON)
+#
+# Updates only apply to a summary that already exists; a missing one is
+# rebuilt from the primary on the next read. Every update and invalidation
+# also bumps a per-user generation (dashboard:{user_id}:gen), and a rebuild
+# only stores what it read if the generation it saw before reading is still
+# current, as in user_cache: a write that lands while the rebuild runs would
+# otherwise be missing from the snapshot it stores.
+DASHBOARD_TTL = 600
+RECENT_TRANSACTIONS = 5
+
+# KEYS: summary, generation. ARGV: TTL, then field / increment pairs.
+_APPLY_LUA = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+for i = 2, #ARGV - 1, 2 do
+    redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+return 1
+"""
+
+_INVALIDATE_LUA = """
+redis.call('DEL', KEYS[1], KEYS[2])
+redis.call('INCR', KEYS[3])
+redis.call('EXPIRE', KEYS[3], ARGV[1])
+return 1
+"""
+
+# KEYS: summary, recent, generation. ARGV: generation seen before reading,
+# TTL, number of summary arguments, field / value pairs, recent items.
+_POPULATE_LUA = """
+if (redis.call('GET', KEYS[3]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1], KEYS[2])
+local fields = tonumber(ARGV[3])
+for i = 4, 3 + fields, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+for i = 4 + fields, #ARGV do
+    redis.call('RPUSH', KEYS[2], ARGV[i])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+return 1
+"""
+
+# ARGV: sort key, item, list length, TTL. List entries start with their
+# sort key, newest first. A row older than the whole (full) list is
+# skipped; one that belongs mid-list (a backdated import) returns -1 so the
+# caller rebuilds the summary instead.
+_PUSH_RECENT_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+local sort_key = ARGV[1]
+local length = redis.call('LLEN', KEYS[2])
+if length > 0 and sort_key < string.sub(redis.call('LINDEX', KEYS[2], 0), 1, #sort_key) then
+    if sort_key > string.sub(redis.call('LINDEX', KEYS[2], -1), 1, #sort_key) then
+        return -1
+    end
+    if length >= tonumber(ARGV[3]) then
+        return 0
+    end
+    redis.call('RPUSH', KEYS[2], ARGV[2])
+else
+    redis.call('LPUSH', KEYS[2], ARGV[2])
+    redis.call('LTRIM', KEYS[2], 0, tonumber(ARGV[3]) - 1)
+end
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return 1
+"""
+
+_scripts = {}
+
+
+def summary_key(user_id: str) -> str:
+    return f"dashboard:{user_id}"
+
+
+def recent_key(user_id: str) -> str:
+    return f"dashboard:{user_id}:recent"
+
+
+def generation_key(user_id: str) -> str:
+    return f"dashboard:{user_id}:gen"
+
+
+def _script(name: str, source: str):
+    client = get_async_redis()
+    script, registered_client = _scripts.get(name, (None, None))
+    if registered_client is not client:
+        script = client.register_script(source)
+        _scripts[name] = (script, client)
+    return script
+
+
+def _sort_key(tx: models.Transaction) -> str:
+    # fixed width digits, so it compares as a string (in Lua too)
+    created_at = transaction_partitions.naive_utc(tx.created_at) if tx.created_at else datetime.min
+    return f"{created_at:%Y%m%d%H%M%S%f}{tx.id or 0:012d}"
+
+
+def _recent_item(tx: models.Transaction) -> str:
+    return _sort_key(tx) + json.dumps({
+        "id": str(tx.id),
+        "name": f"{(tx.transaction_type or 'transaction').title()} {tx.currency}",
+        "date": tx.created_at.isoformat() if tx.created_at else None,
+        "amount": tx.amount,
+        "currency": tx.currency,
+        "status": (tx.status or "").title(),
+    })
+
+
+async def _apply(user_id: str, increments: Dict[str, int]) -> None:
+    args = []
+    for field, delta in increments.items():
+        if delta:
+            args.extend([field, int(delta)])
+    if not args:
+        return
+    try:
+        await _script("apply", _APPLY_LUA)(
+            keys=[summary_key(user_id), generation_key(user_id)], args=[DASHBOARD_TTL, *args]
+        )
+    except redis.RedisError as e:
+        # drop the cached summary rather than leave it wrong
+        logger.warning(f"[dashboard] Update failed for {user_id}, invalidating: {e}")
+        await invalidate(user_id)
+
+
+async def _push_recent(user_id: str, transactions: Iterable[models.Transaction]) -> None:
+    """Add transactions to the recent list, oldest first."""
+    try:
+        script = _script("push_recent", _PUSH_RECENT_LUA)
+        for tx in transactions:
+            pushed = await script(
+                keys=[summary_key(user_id), recent_key(user_id)],
+                args=[_sort_key(tx), _recent_item(tx), RECENT_TRANSACTIONS, DASHBOARD_TTL],
+            )
+            if pushed == -1:
+                await invalidate(user_id)
+                return
+    except redis.RedisError as e:
+        logger.warning(f"[dashboard] Recent list update failed for {user_id}, invalidating: {e}")
+        await invalidate(user_id)
+
+
+async def invalidate(user_id: str) -> None:
+    try:
+        await _script("invalidate", _INVALIDATE_LUA)(
+            keys=[summary_key(user_id), recent_key(user_id), generation_key(user_id)], args=[DASHBOARD_TTL]
+        )
+    except redis.RedisError as e:
+        logger.error(f"[dashboard] Could not invalidate summary for {user_id}: {e}")
+
+
+# --- write hooks, called after the corresponding DB commit ---
+
+async def payment_created(user_id: str) -> None:
+    await _apply(user_id, {"pending_payments": 1})
+
+
+async def payment_decided(payment: models.Payment, transaction: Optional[models.Transaction] = None) -> None:
+    """A pending payment was approved (with its transaction) or rejected."""
+    increments: Dict[str, int] = defaultdict(int)
+    increments["pending_payments"] -= 1
+    if transaction is not None:
+        increments["transactions"] += 1
+        increments[f"balance:{payment.currency}"] -= ledger.to_minor_units(payment.amount)
+        for fee in payment.fees_data or []:
+            increments[f"balance:{fee['currency']}"] -= ledger.to_minor_units(fee["amount"])
+    await _apply(payment.user_id, increments)
+    if transaction is not None:
+        await _push_recent(payment.user_id, [transaction])
+
+
+async def transactions_inserted(transactions: List[models.Transaction]) -> None:
+    by_user: Dict[str, List[models.Transaction]] = defaultdict(list)
+    for tx in transactions:
+        by_user[tx.user_id].append(tx)
+    for user_id, user_transactions in by_user.items():
+        await _apply(user_id, {"transactions": len(user_transactions)})
+        newest = sorted(user_transactions, key=_sort_key)[-RECENT_TRANSACTIONS:]
+        await _push_recent(user_id, newest)
+
+
+async def transaction_changed(user_id: str) -> None:
+    """A transaction was edited or deleted; rebuilt on the next read."""
+    await invalidate(user_id)
+
+
+# --- read path ---
+
+async def _rebuild(db: AsyncSession, user_id: str) -> dict:
+    try:
+        generation = await get_async_redis().get(generation_key(user_id)) or "0"
+    except redis.RedisError as e:
+        logger.warning(f"[dashboard] Could not read the generation for {user_id}, not caching: {e}")
+        generation = None
+    balances = (await db.execute(
+        select(models.AccountBalance.currency, func.sum(models.AccountBalance.balance))
+        .join(models.Account, models.AccountBalance.account_id == cast(models.Account.id, String))
+        .where(models.Account.user_id == user_id)
+        .group_by(models.AccountBalance.currency)
+    )).all()
+    pending = (await db.execute(
+        select(func.count()).select_from(models.Payment)
+        .where(models.Payment.user_id == user_id, models.Payment.status == "pending")
+    )).scalar_one()
+    transactions = (await db.execute(
+        select(func.count()).select_from(models.Transaction).where(models.Transaction.user_id == user_id)
+    )).scalar_one() + await transaction_partitions.archived_count(db, user_id)
+    recent = (await db.execute(
+        select(models.Transaction)
+        .where(
+            models.Transaction.user_id == user_id,
+            models.Transaction.created_at >= transaction_partitions.hot_window_start(),
+        )
+        .order_by(models.Transaction.created_at.desc(), models.Transaction.id.desc())
+        .limit(RECENT_TRANSACTIONS)
+    )).scalars().all()
+
+    summary = {"pending_payments": pending, "transactions": transactions}
+    summary.update({f"balance:{currency}": int(total or 0) for currency, total in balances})
+    recent_items = [_recent_item(tx) for tx in recent]
+
+    if generation is not None:
+        fields = [value for item in summary.items() for value in item]
+        try:
+            stored = await _script("populate", _POPULATE_LUA)(
+                keys=[summary_key(user_id), recent_key(user_id), generation_key(user_id)],
+                args=[generation, DASHBOARD_TTL, len(fields), *fields, *recent_items],
+            )
+            if not stored:
+                logger.info(f"[dashboard] Summary for {user_id} changed while rebuilding, not caching")
+        except redis.RedisError as e:
+            logger.warning(f"[dashboard] Could not cache summary for {user_id}: {e}")
+    return {"summary": summary, "recent": recent_items}
+
+
+async def _read(user_id: str) -> Optional[dict]:
+    async with get_async_redis().pipeline(transaction=False) as pipe:
+        pipe.hgetall(summary_key(user_id))
+        pipe.lrange(recent_key(user_id), 0, RECENT_TRANSACTIONS - 1)
+        summary, recent = await pipe.execute()
+    if not summary:
+        return None
+    return {"summary": {k: int(v) for k, v in summary.items()}, "recent": recent}
+
+
+def _major(minor_units: int) -> str:
+    return f"{Decimal(minor_units) / ledger.MINOR_UNITS:.2f}"
+
+
+async def get_dashboard(user_id: str) -> dict:
+    """The `dashboard` block of GET /account."""
+    try:
+        cached = await _read(user_id)
+    except redis.RedisError as e:
+        logger.warning(f"[dashboard] Redis read failed for {user_id}, using the database: {e}")
+        cached = None
+    if cached:
+        data = cached
+    else:
+        # from the primary: a lagging replica would be cached for the full TTL
+        async with AsyncSessionLocal() as db:
+            data = await _rebuild(db, user_id)
+
+    summary = data["summary"]
+    balances = {
+        field.split(":", 1)[1]: value for field, value in summary.items() if field.startswith("balance:")
+    }
+    recent = []
+    for raw in data["recent"]:
+        item = json.loads(raw[raw.index("{"):])  # after the sort key
+        item["amount"] = f"{item.pop('currency')} {_major(item['amount'])}"
+        recent.append(item)
+
+    return {
+        # stablecoin-denominated, so the currencies are summed at par
+        "wallet_balance": _major(sum(balances.values())),
+        "balances": {currency: _major(value) for currency, value in sorted(balances.items())},
+        "currency_pair_1": {
+            "label": "Assets",
+            "value": str(len([v for v in balances.values() if v])),
+            "subvalue": str(len(balances)),
+        },
+        "currency_pair_2": {
+            "label": "Transactions",
+            "value": str(summary.get("transactions", 0)),
+            "subvalue": str(summary.get("pending_payments", 0)),
+        },
+        "summary": [
+            {"Pending Approval": str(summary.get("pending_payments", 0))},
+            # no risk scoring source yet
+            {"Risk Alert": "0"},
+            {"Flagged Transactions": "0"},
+        ],
+        "recent_transactions": recent,
+    }
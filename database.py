@@ -1,16 +1,89 @@
 import os
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from db_pool import engine_options, register_pool
+
 load_dotenv()
 SQLALCHEMY_DATABASE_URL = os.getenv("SQLALCHEMY_DATABASE_URL")
 
+# Sync engine, kept for Alembic, scripts and the handlers not yet on AsyncSession.
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL
+    SQLALCHEMY_DATABASE_URL,
+    **engine_options(SQLALCHEMY_DATABASE_URL),
 )
+register_pool("sync", engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+
+def _to_async_url(url: str) -> str:
+    """Map the sync URL onto its async driver (asyncpg / aiosqlite)."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "postgresql":
+        parsed = parsed.set(drivername="postgresql+asyncpg")
+        # asyncpg takes `ssl`, not libpq's `sslmode`
+        if "sslmode" in parsed.query:
+            query = dict(parsed.query)
+            query["ssl"] = query.pop("sslmode")
+            parsed = parsed.set(query=query)
+    elif backend == "sqlite":
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    return parsed.render_as_string(hide_password=False)
+
+
+# Async engine for request handlers. Override the derived URL with
+# SQLALCHEMY_ASYNC_DATABASE_URL if the async driver needs different options.
+SQLALCHEMY_ASYNC_DATABASE_URL = os.getenv("SQLALCHEMY_ASYNC_DATABASE_URL") or _to_async_url(SQLALCHEMY_DATABASE_URL)
+
+async_engine = create_async_engine(
+    SQLALCHEMY_ASYNC_DATABASE_URL,
+    **engine_options(SQLALCHEMY_ASYNC_DATABASE_URL, is_async=True),
+)
+register_pool("async", async_engine)
+
+# expire_on_commit=False: handlers read attributes after commit, and an
+# AsyncSession can't lazily refresh them.
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Optional read replica. When SQLALCHEMY_REPLICA_DATABASE_URL is unset the
+# read session factories are the primary ones. db_routing decides per
+# request which of the two a read-only dependency gets.
+SQLALCHEMY_REPLICA_DATABASE_URL = os.getenv("SQLALCHEMY_REPLICA_DATABASE_URL")
+
+if SQLALCHEMY_REPLICA_DATABASE_URL:
+    replica_engine = create_engine(
+        SQLALCHEMY_REPLICA_DATABASE_URL,
+        **engine_options(SQLALCHEMY_REPLICA_DATABASE_URL),
+    )
+    register_pool("sync_replica", replica_engine)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+
+    SQLALCHEMY_ASYNC_REPLICA_DATABASE_URL = (
+        os.getenv("SQLALCHEMY_ASYNC_REPLICA_DATABASE_URL") or _to_async_url(SQLALCHEMY_REPLICA_DATABASE_URL)
+    )
+    async_replica_engine = create_async_engine(
+        SQLALCHEMY_ASYNC_REPLICA_DATABASE_URL,
+        **engine_options(SQLALCHEMY_ASYNC_REPLICA_DATABASE_URL, is_async=True),
+    )
+    register_pool("async_replica", async_replica_engine)
+    AsyncReadSessionLocal = async_sessionmaker(
+        async_replica_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+else:
+    replica_engine = None
+    async_replica_engine = None
+    ReadSessionLocal = SessionLocal
+    AsyncReadSessionLocal = AsyncSessionLocal
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
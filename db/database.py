@@ -2,12 +2,13 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from core.config import settings
+from db_pool import engine_options
 
 # Use the URL from .env
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
 # Create the database engine
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
 
 # DB Session class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -0,0 +1,135 @@
+import bisect
+import threading
+import time
+import uuid
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from core.config import settings
+from json_columns import json_dumps, json_loads
+
+# Upper bounds (seconds) of the checkout wait histogram buckets.
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float("inf"))
+
+
+class WaitHistogram:
+    def __init__(self, buckets=WAIT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.total += seconds
+            self.count += 1
+
+    def timed_out(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative, running = {}, 0
+            for bound, n in zip(self.buckets, self.counts):
+                running += n
+                cumulative["+Inf" if bound == float("inf") else f"{bound * 1000:g}ms"] = running
+            return {
+                "buckets": cumulative,
+                "count": self.count,
+                "sum_seconds": round(self.total, 6),
+                "timeouts": self.timeouts,
+            }
+
+
+class _TimedCheckoutMixin:
+    """Records how long each checkout waited for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_histogram = WaitHistogram()
+
+    def recreate(self):
+        new_pool = super().recreate()
+        new_pool.wait_histogram = self.wait_histogram
+        return new_pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.wait_histogram.timed_out()
+            raise
+        self.wait_histogram.observe(time.perf_counter() - start)
+        return conn
+
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+_pools: dict = {}
+
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """create_engine / create_async_engine kwargs built from Settings."""
+    parsed = make_url(url)
+    # JSON / JSONDocument columns are (de)serialized with orjson
+    options = {"json_serializer": json_dumps, "json_deserializer": json_loads}
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # in-memory sqlite is tied to a single connection; keep the default pool
+        return options
+
+    options.update({
+        "poolclass": TimedAsyncQueuePool if is_async else TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    })
+
+    if settings.DB_PGBOUNCER and parsed.get_backend_name() == "postgresql" and is_async:
+        # PgBouncer in transaction mode can hand each statement to a different
+        # server connection, so asyncpg must not cache or name-reuse prepared
+        # statements. (psycopg2 doesn't use server-side prepares.)
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    return options
+
+
+def register_pool(name: str, engine) -> None:
+    _pools[name] = engine
+
+
+def pool_metrics() -> dict:
+    result = {}
+    for name, engine in _pools.items():
+        pool = engine.pool
+        stats = {"status": pool.status()}
+        if isinstance(pool, QueuePool):
+            stats.update(
+                pool_size=pool.size(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+                max_overflow=pool._max_overflow,
+            )
+        histogram = getattr(pool, "wait_histogram", None)
+        if histogram is not None:
+            stats["checkout_wait"] = histogram.snapshot()
+        result[name] = stats
+    return result
@@ -0,0 +1,148 @@
+import logging
+from contextvars import ContextVar
+from typing import Optional
+
+import jwt
+import redis
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from auth import decode_access_token
+from core.config import settings
+from database import (
+    AsyncReadSessionLocal,
+    AsyncSessionLocal,
+    ReadSessionLocal,
+    SessionLocal,
+    replica_engine,
+)
+from redis_client import get_async_redis, r
+
+logger = logging.getLogger("vaulta.db_routing")
+
+# Read-only dependencies (get_read_db / get_read_db_sync) use the replica,
+# except for a user who committed a write in the last
+# DB_READ_YOUR_WRITES_SECONDS: their reads go to the primary so they never
+# see a replica that hasn't caught up with their own change. The marker is a
+# Redis key so it holds across workers.
+
+_FLUSHED_KEY = "vaulta_db_routing_flushed"
+
+# Per-request write tracker, installed by ReadYourWritesMiddleware. It is a
+# dict so that commits made in threadpool handlers (which run in a copy of
+# the context) are still visible to the middleware.
+_request_writes: ContextVar[Optional[dict]] = ContextVar("vaulta_request_writes", default=None)
+
+
+def sticky_key(user_id: str) -> str:
+    return f"db_sticky_primary:{user_id}"
+
+
+@event.listens_for(Session, "after_flush")
+def _note_flush(session, flush_context):
+    session.info[_FLUSHED_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _note_commit(session):
+    if session.info.pop(_FLUSHED_KEY, False):
+        tracker = _request_writes.get()
+        if tracker is not None:
+            tracker["wrote"] = True
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_flush(session, previous_transaction):
+    session.info.pop(_FLUSHED_KEY, None)
+
+
+def request_user_id(scope_state: dict, headers) -> Optional[str]:
+    """Best-effort caller id (token subject, else API key owner), for routing only."""
+    authorization = headers.get("authorization") or ""
+    if authorization.lower().startswith("bearer "):
+        try:
+            user_id = decode_access_token(authorization[7:]).get("sub")
+        except jwt.PyJWTError:
+            user_id = None
+        if user_id:
+            return user_id
+    return scope_state.get("api_user_id")
+
+
+class ReadYourWritesMiddleware:
+    """Marks the caller sticky-to-primary when their request committed a write."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or replica_engine is None:
+            await self.app(scope, receive, send)
+            return
+
+        tracker = {"wrote": False}
+        token = _request_writes.set(tracker)
+        state = scope.setdefault("state", {})
+
+        async def send_wrapper(message: Message) -> None:
+            # Mark before the response goes out, so a follow-up read the
+            # client sends on receiving it is already routed to the primary.
+            if message["type"] == "http.response.start" and tracker["wrote"]:
+                tracker["wrote"] = False
+                user_id = request_user_id(state, Headers(scope=scope))
+                if user_id:
+                    try:
+                        await get_async_redis().set(
+                            sticky_key(user_id), 1, ex=settings.DB_READ_YOUR_WRITES_SECONDS
+                        )
+                    except redis.RedisError as e:
+                        logger.warning(f"[db_routing] Failed to mark {user_id} sticky: {e}")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_writes.reset(token)
+
+
+async def _use_primary_async(request: Request) -> bool:
+    if replica_engine is None:
+        return True
+    user_id = request_user_id(request.scope.get("state", {}), request.headers)
+    if not user_id:
+        return False
+    try:
+        return bool(await get_async_redis().exists(sticky_key(user_id)))
+    except redis.RedisError:
+        return True
+
+
+def _use_primary_sync(request: Request) -> bool:
+    if replica_engine is None:
+        return True
+    user_id = request_user_id(request.scope.get("state", {}), request.headers)
+    if not user_id:
+        return False
+    try:
+        return bool(r.exists(sticky_key(user_id)))
+    except redis.RedisError:
+        return True
+
+
+async def get_read_db(request: Request):
+    """AsyncSession for read-only handlers: replica unless the caller just wrote."""
+    factory = AsyncSessionLocal if await _use_primary_async(request) else AsyncReadSessionLocal
+    async with factory() as db:
+        yield db
+
+
+def get_read_db_sync(request: Request):
+    """Sync Session for read-only handlers: replica unless the caller just wrote."""
+    db = SessionLocal() if _use_primary_sync(request) else ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -1,5 +1,5 @@
 import os
-import httpx
+from http_clients import get_sync_http_client
 from redis_client import r
 
 EMTECH_BASE_URL = "https://api.emtech.com/integration"
@@ -28,7 +28,7 @@ def send_remittance_event():
 		"x-sandbox-app-auth": access_token
 	}
 	try:
-		response = httpx.post(EMTECH_REMITTANCE_EVENT_URL, json=payload, headers=headers, timeout=10)
+		response = get_sync_http_client("emtech").post(EMTECH_REMITTANCE_EVENT_URL, json=payload, headers=headers)
 		response.raise_for_status()
 		return response.json()
 	except Exception as e:
@@ -45,7 +45,7 @@ def get_emtech_access_token(client_id: str=client_id, client_secret: str=client_
 		"clientSecret": client_secret
 	}
 	try:
-		response = httpx.post(EMTECH_TOKEN_URL, json=payload, timeout=10)
+		response = get_sync_http_client("emtech").post(EMTECH_TOKEN_URL, json=payload)
 		response.raise_for_status()
 		data = response.json()
 		access_token = data.get("accessToken")
@@ -4,6 +4,8 @@ from typing import Any, Dict, List
 import httpx
 from fastapi import HTTPException
 
+from http_clients import get_http_client
+
 
 ETHERSCAN_BASE_URL = "https://api.etherscan.io/v2/api"
 NO_TRANSACTIONS_MESSAGE = "No transactions found"
@@ -114,21 +116,21 @@ async def get_etherscan_transactions(
 ) -> Dict[str, Any]:
     validate_evm_address(address)
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        grouped = {}
-        for source_type, action in ETHERSCAN_ACTIONS.items():
-            grouped[source_type] = await _fetch_etherscan_action(
-                client=client,
-                api_key=api_key,
-                action=action,
-                address=address,
-                chainid=chainid,
-                page=page,
-                offset=offset,
-                startblock=startblock,
-                endblock=endblock,
-                sort=sort,
-            )
+    client = get_http_client("etherscan")
+    grouped = {}
+    for source_type, action in ETHERSCAN_ACTIONS.items():
+        grouped[source_type] = await _fetch_etherscan_action(
+            client=client,
+            api_key=api_key,
+            action=action,
+            address=address,
+            chainid=chainid,
+            page=page,
+            offset=offset,
+            startblock=startblock,
+            endblock=endblock,
+            sort=sort,
+        )
 
     transactions = [
         _normalize_etherscan_transaction(source_type, item)
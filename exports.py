@@ -0,0 +1,77 @@
+import csv
+import io
+import json
+import logging
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional
+
+from fastapi.responses import StreamingResponse
+
+from database import ReadSessionLocal
+
+logger = logging.getLogger("vaulta.accounts")
+
+# Rows are pulled from the database YIELD_PER at a time (a server-side cursor
+# on Postgres) and written out one chunk per batch, so memory use depends on
+# the batch size rather than the size of the table.
+YIELD_PER = 1_000
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _to_csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _batches(db, stmt, leading: Optional[Callable]) -> Iterator[list]:
+    if leading is not None:
+        yield from leading(db)
+    # opened only once `leading` is done with the session
+    yield from db.execute(stmt.execution_options(yield_per=YIELD_PER)).scalars().partitions()
+
+
+def _iter_export(stmt, serialize: Callable, fields: List[str], fmt: str, leading: Optional[Callable] = None) -> Iterator[str]:
+    # Runs in Starlette's threadpool (sync iterator), with its own session
+    # that lives exactly as long as the response body. Exports read from the
+    # replica when one is configured. `leading(db)`, if given, yields batches
+    # of objects written out before the rows of `stmt` (e.g. archived rows).
+    db = ReadSessionLocal()
+    exported = 0
+    try:
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            yield buffer.getvalue()
+
+        for partition in _batches(db, stmt, leading):
+            rows = [serialize(obj) for obj in partition]
+            exported += len(rows)
+            if fmt == "csv":
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+                writer.writerows({k: _to_csv_value(v) for k, v in row.items()} for row in rows)
+                yield buffer.getvalue()
+            else:
+                yield "".join(json.dumps(row, default=str) + "\n" for row in rows)
+    finally:
+        db.close()
+        logger.info(f"[export] Streamed {exported} rows as {fmt}")
+
+
+def streaming_export(
+    stmt, serialize: Callable, fields: List[str], fmt: str, name: str, leading: Optional[Callable] = None
+) -> StreamingResponse:
+    filename = f"{name}-{datetime.now().strftime('%Y%m%d%H%M%S')}.{fmt}"
+    return StreamingResponse(
+        _iter_export(stmt, serialize, fields, fmt, leading),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
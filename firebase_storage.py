@@ -1,14 +1,14 @@
 import os
 import uuid
 from datetime import datetime
-from urllib.parse import urlparse
+from urllib.parse import unquote, urlparse
 
 import firebase_admin
-import httpx
 from firebase_admin import credentials, storage
 from fastapi import UploadFile
 
 from core.config import settings
+from http_clients import get_http_client
 import logging
 
 logger = logging.getLogger(__name__)
@@ -135,8 +135,7 @@ async def auth_download_file_from_url(file_url: str, timeout_seconds: float = 20
                 firebase_exc,
             )
 
-    async with httpx.AsyncClient(timeout=timeout_seconds) as client:
-        response = await client.get(file_url)
+    response = await get_http_client("firebase").get(file_url, timeout=timeout_seconds)
 
     if response.status_code != 200:
         raise ValueError(f"Failed to download file: status={response.status_code}")
@@ -153,8 +152,7 @@ async def download_file_from_url(file_url: str, timeout_seconds: float = 20.0) -
     parsed = urlparse(file_url)
     filename = os.path.basename(parsed.path) or f"document_{uuid.uuid4().hex[:8]}"
 
-    async with httpx.AsyncClient(timeout=timeout_seconds) as client:
-        response = await client.get(file_url)
+    response = await get_http_client("firebase").get(file_url, timeout=timeout_seconds)
 
     if response.status_code != 200:
         raise ValueError(f"Failed to download file: status={response.status_code}")
@@ -0,0 +1,244 @@
+import importlib.util
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+import httpx
+
+from db_pool import WaitHistogram
+
+logger = logging.getLogger("vaulta.http_clients")
+
+# One pooled client per upstream, so calls reuse keep-alive connections (and
+# their TLS sessions) instead of handshaking on every request. The async
+# clients are created in the app lifespan via init_http_clients();
+# get_http_client() falls back to creating them lazily so scripts and tests
+# don't need the lifespan to run. Sync modules (scripts, the Bridge and
+# EMTECH helpers) use get_sync_http_client(), with the same settings.
+#
+# HTTP/2 needs the h2 package; without it every client speaks HTTP/1.1.
+# Where it is on, ALPN still falls back to HTTP/1.1 for hosts that don't
+# offer h2.
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+PROVIDERS: Dict[str, dict] = {
+    # inquiry lookups during onboarding
+    "persona": {
+        "timeout": httpx.Timeout(15.0, connect=5.0),
+        "limits": httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0),
+        "http2": True,
+    },
+    # a wallet history request makes five sequential calls
+    "etherscan": {
+        "timeout": httpx.Timeout(30.0, connect=5.0),
+        "limits": httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0),
+        "http2": True,
+    },
+    # document downloads (storage.googleapis.com and signed URLs); large
+    # bodies, so callers may pass a longer per-request timeout
+    "firebase": {
+        "timeout": httpx.Timeout(20.0, connect=5.0),
+        "limits": httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=30.0),
+        "http2": True,
+    },
+    # quotes and trade history; not checked against HTTP/2, so HTTP/1.1
+    "ovex": {
+        "timeout": httpx.Timeout(15.0, connect=5.0),
+        "limits": httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0),
+        "http2": False,
+    },
+    "bridge": {
+        "timeout": httpx.Timeout(30.0, connect=5.0),
+        "limits": httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=30.0),
+        "http2": True,
+    },
+    # not checked against HTTP/2, so HTTP/1.1
+    "emtech": {
+        "timeout": httpx.Timeout(10.0, connect=5.0),
+        "limits": httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=30.0),
+        "http2": False,
+    },
+}
+
+
+class HostMetrics:
+    """Per-host request, connection and latency counters for one provider."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.responses: Dict[str, int] = defaultdict(int)
+        self.http_versions: Dict[str, int] = defaultdict(int)
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        # time to response headers; timeouts counted separately
+        self.response_time = WaitHistogram()
+        self._lock = threading.Lock()
+
+    def trace(self, event: str, info: dict) -> None:
+        # httpcore's trace hook; called for the connection set-up steps of a
+        # request, so these only move when the pool had nothing to reuse
+        if event == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections_opened += 1
+        elif event == "connection.start_tls.complete":
+            with self._lock:
+                self.tls_handshakes += 1
+
+    async def atrace(self, event: str, info: dict) -> None:
+        # the async connection pool insists on a coroutine
+        self.trace(event, info)
+
+    def started(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def finished(self, response: httpx.Response, seconds: float) -> None:
+        self.response_time.observe(seconds)
+        version = response.extensions.get("http_version", b"").decode("ascii", "replace") or "unknown"
+        with self._lock:
+            self.responses[f"{response.status_code // 100}xx"] += 1
+            self.http_versions[version] += 1
+
+    def failed(self, exc: Exception) -> None:
+        if isinstance(exc, httpx.TimeoutException):
+            self.response_time.timed_out()
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = {
+                "requests": self.requests,
+                "errors": self.errors,
+                "responses": dict(self.responses),
+                "http_versions": dict(self.http_versions),
+                "connections_opened": self.connections_opened,
+                "tls_handshakes": self.tls_handshakes,
+            }
+        stats["response_time"] = self.response_time.snapshot()
+        return stats
+
+
+# provider -> host -> HostMetrics; survives client re-creation
+_metrics: Dict[str, Dict[str, HostMetrics]] = defaultdict(lambda: defaultdict(HostMetrics))
+
+
+def _host_metrics(provider: str, request: httpx.Request, is_async: bool) -> HostMetrics:
+    metrics = _metrics[provider][request.url.host]
+    request.extensions["trace"] = metrics.atrace if is_async else metrics.trace
+    metrics.started()
+    return metrics
+
+
+class _MeteredAsyncTransport(httpx.AsyncBaseTransport):
+    def __init__(self, provider: str, transport: httpx.AsyncBaseTransport):
+        self.provider = provider
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        metrics = _host_metrics(self.provider, request, is_async=True)
+        start = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except Exception as exc:
+            metrics.failed(exc)
+            raise
+        metrics.finished(response, time.perf_counter() - start)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class _MeteredTransport(httpx.BaseTransport):
+    def __init__(self, provider: str, transport: httpx.BaseTransport):
+        self.provider = provider
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        metrics = _host_metrics(self.provider, request, is_async=False)
+        start = time.perf_counter()
+        try:
+            response = self._transport.handle_request(request)
+        except Exception as exc:
+            metrics.failed(exc)
+            raise
+        metrics.finished(response, time.perf_counter() - start)
+        return response
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+def _client_options(provider: str) -> dict:
+    try:
+        config = PROVIDERS[provider]
+    except KeyError:
+        raise ValueError(f"Unknown HTTP provider: {provider}") from None
+    return {
+        "limits": config["limits"],
+        "http2": config["http2"] and HTTP2_AVAILABLE,
+    }
+
+
+_async_clients: Dict[str, httpx.AsyncClient] = {}
+_sync_clients: Dict[str, httpx.Client] = {}
+_sync_lock = threading.Lock()
+
+
+def _new_async_client(provider: str) -> httpx.AsyncClient:
+    transport = _MeteredAsyncTransport(provider, httpx.AsyncHTTPTransport(**_client_options(provider)))
+    return httpx.AsyncClient(transport=transport, timeout=PROVIDERS[provider]["timeout"])
+
+
+def init_http_clients() -> Dict[str, httpx.AsyncClient]:
+    for provider in PROVIDERS:
+        if provider not in _async_clients:
+            _async_clients[provider] = _new_async_client(provider)
+    if not HTTP2_AVAILABLE:
+        logger.warning("[http_clients] h2 is not installed; upstream clients use HTTP/1.1 only")
+    return _async_clients
+
+
+def get_http_client(provider: str) -> httpx.AsyncClient:
+    client = _async_clients.get(provider)
+    if client is None:
+        client = _async_clients[provider] = _new_async_client(provider)
+    return client
+
+
+def get_sync_http_client(provider: str) -> httpx.Client:
+    client = _sync_clients.get(provider)
+    if client is None:
+        with _sync_lock:
+            client = _sync_clients.get(provider)
+            if client is None:
+                transport = _MeteredTransport(provider, httpx.HTTPTransport(**_client_options(provider)))
+                client = _sync_clients[provider] = httpx.Client(
+                    transport=transport, timeout=PROVIDERS[provider]["timeout"]
+                )
+    return client
+
+
+async def close_http_clients() -> None:
+    clients = list(_async_clients.values())
+    _async_clients.clear()
+    for client in clients:
+        await client.aclose()
+    with _sync_lock:
+        sync_clients = list(_sync_clients.values())
+        _sync_clients.clear()
+    for client in sync_clients:
+        client.close()
+
+
+def http_metrics(provider: Optional[str] = None) -> dict:
+    """Per provider, per host counters since this worker started."""
+    return {
+        name: {host: metrics.snapshot() for host, metrics in list(hosts.items())}
+        for name, hosts in list(_metrics.items())
+        if provider is None or name == provider
+    }
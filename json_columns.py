@@ -0,0 +1,56 @@
+import logging
+
+import orjson
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.types import JSON, TypeDecorator
+
+logger = logging.getLogger("vaulta.json_columns")
+
+
+def json_dumps(value) -> str:
+    # default=str covers Decimal and other values json.dumps(default=str) used to
+    return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def json_loads(value):
+    return orjson.loads(value)
+
+
+class JSONDocument(TypeDecorator):
+    """
+    A JSON document column: JSONB on Postgres, JSON (text) elsewhere.
+
+    Values come back already parsed (dict / list), so handlers no longer
+    json.loads them per row. Encoding and decoding go through the engine's
+    json_serializer / json_deserializer, which db_pool.engine_options points
+    at json_dumps / json_loads (orjson). Python None is stored as SQL NULL.
+
+    Outside Postgres the column is unvalidated text, and rows written before
+    the conversion can hold '' or plain text: '' reads as None and other
+    non-JSON text as the string itself (what migration f6a3c0d8b4e2 turns
+    such values into), instead of failing the whole query.
+    """
+
+    impl = JSON
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(JSONB(none_as_null=True))
+        return dialect.type_descriptor(JSON(none_as_null=True))
+
+    def result_processor(self, dialect, coltype):
+        process = super().result_processor(dialect, coltype)
+        if process is None or dialect.name == "postgresql":
+            return process
+
+        def lenient(value):
+            try:
+                return process(value)
+            except ValueError:
+                if isinstance(value, str) and not value.strip():
+                    return None
+                logger.warning(f"[json_columns] Non-JSON value in a JSON column, returned as text: {value[:80]!r}")
+                return value
+
+        return lenient
@@ -0,0 +1,125 @@
+import logging
+from typing import List
+
+from sqlalchemy import or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+
+logger = logging.getLogger("vaulta.kyc_search")
+
+# Trigram matching needs at least three characters to narrow anything down.
+MIN_QUERY_LENGTH = 3
+
+# Searchable fields: user_kyc.{reference_id, email, full_name, company_name}
+# plus the full_name / email of each UBO.
+#
+# Postgres: plain ILIKE '%q%' over those columns, served by the pg_trgm GIN
+# indexes created in migration 0a7d3e91c5b8.
+#
+# SQLite: an FTS5 table with the trigram tokenizer, one row per KYC entry
+# (rowid = user_kyc.id) with the UBO names folded into `ubo_text`, kept in
+# sync by triggers. install() creates it.
+FTS_TABLE = "kyc_search_fts"
+
+_UBO_TEXT = (
+    "(SELECT group_concat(coalesce(full_name, '') || ' ' || coalesce(email, ''), ' ') "
+    "FROM user_kyc_ubos WHERE kyc_id = {kyc_id})"
+)
+
+_SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}
+        USING fts5(reference_id, email, full_name, company_name, ubo_text, tokenize='trigram')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_kyc_ai AFTER INSERT ON user_kyc BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, reference_id, email, full_name, company_name, ubo_text)
+        VALUES (new.id, new.reference_id, new.email, new.full_name, new.company_name, {_UBO_TEXT.format(kyc_id="new.id")});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_kyc_au
+        AFTER UPDATE OF reference_id, email, full_name, company_name ON user_kyc BEGIN
+        UPDATE {FTS_TABLE} SET reference_id = new.reference_id, email = new.email,
+            full_name = new.full_name, company_name = new.company_name
+        WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_kyc_ad AFTER DELETE ON user_kyc BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ubo_ai AFTER INSERT ON user_kyc_ubos BEGIN
+        UPDATE {FTS_TABLE} SET ubo_text = {_UBO_TEXT.format(kyc_id="new.kyc_id")} WHERE rowid = new.kyc_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ubo_au
+        AFTER UPDATE OF kyc_id, full_name, email ON user_kyc_ubos BEGIN
+        UPDATE {FTS_TABLE} SET ubo_text = {_UBO_TEXT.format(kyc_id="old.kyc_id")} WHERE rowid = old.kyc_id;
+        UPDATE {FTS_TABLE} SET ubo_text = {_UBO_TEXT.format(kyc_id="new.kyc_id")} WHERE rowid = new.kyc_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ubo_ad AFTER DELETE ON user_kyc_ubos BEGIN
+        UPDATE {FTS_TABLE} SET ubo_text = {_UBO_TEXT.format(kyc_id="old.kyc_id")} WHERE rowid = old.kyc_id;
+    END""",
+]
+
+
+def install(conn) -> None:
+    """Create the SQLite search table and triggers (idempotent); no-op elsewhere."""
+    if conn.dialect.name != "sqlite":
+        return
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+    ).first()
+    for statement in _SQLITE_DDL:
+        conn.execute(text(statement))
+    if not exists:
+        conn.execute(text(
+            f"INSERT INTO {FTS_TABLE}(rowid, reference_id, email, full_name, company_name, ubo_text) "
+            f"SELECT id, reference_id, email, full_name, company_name, {_UBO_TEXT.format(kyc_id='user_kyc.id')} "
+            f"FROM user_kyc"
+        ))
+        logger.info(f"[kyc_search] Built {FTS_TABLE}")
+
+
+def uninstall(conn) -> None:
+    if conn.dialect.name != "sqlite":
+        return
+    for suffix in ("kyc_ai", "kyc_au", "kyc_ad", "ubo_ai", "ubo_au", "ubo_ad"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}"))
+    conn.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+
+
+def _like_pattern(query: str) -> str:
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+async def search_kyc_ids(db: AsyncSession, query: str, limit: int) -> List[int]:
+    """Ids of visible KYC entries matching `query`, best/newest first."""
+    if db.bind.dialect.name == "sqlite":
+        # a quoted FTS5 string is matched as a literal substring
+        phrase = '"' + query.replace('"', '""') + '"'
+        rows = await db.execute(
+            text(
+                f"SELECT f.rowid FROM {FTS_TABLE} f JOIN user_kyc k ON k.id = f.rowid "
+                f"WHERE {FTS_TABLE} MATCH :phrase AND NOT k.hidden "
+                f"ORDER BY f.rank LIMIT :limit"
+            ),
+            {"phrase": phrase, "limit": limit},
+        )
+        return [row[0] for row in rows]
+
+    pattern = _like_pattern(query)
+    kyc, ubo = models.UserKyc, models.UserKycUbo
+    ubo_match = select(ubo.kyc_id).where(or_(
+        ubo.full_name.ilike(pattern, escape="\\"),
+        ubo.email.ilike(pattern, escape="\\"),
+    ))
+    rows = await db.execute(
+        select(kyc.id)
+        .where(kyc.hidden == False)
+        .where(or_(
+            kyc.reference_id.ilike(pattern, escape="\\"),
+            kyc.email.ilike(pattern, escape="\\"),
+            kyc.full_name.ilike(pattern, escape="\\"),
+            kyc.company_name.ilike(pattern, escape="\\"),
+            kyc.id.in_(ubo_match),
+        ))
+        .order_by(kyc.created_at.desc(), kyc.id.desc())
+        .limit(limit)
+    )
+    return list(rows.scalars())
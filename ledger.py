@@ -0,0 +1,179 @@
+import logging
+import uuid
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, insert, literal, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+
+logger = logging.getLogger("vaulta.ledger")
+
+# Every movement of money is a journal entry: two or more postings whose
+# amounts sum to zero per currency. Postings are append-only; the
+# account_balances row for each (account, currency) is adjusted by the same
+# statement batch, inside the caller's transaction, so a committed entry
+# and its balance changes are never seen apart.
+
+# Amounts are stored in minor units (cents), like Transaction.amount.
+MINOR_UNITS = Decimal(100)
+
+
+class UnbalancedEntryError(ValueError):
+    pass
+
+
+def to_minor_units(amount) -> int:
+    """Decimal amount (e.g. the Payment.amount string) to integer minor units."""
+    return int((Decimal(str(amount)) * MINOR_UNITS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def external_account(rail: Optional[str], network: Optional[str]) -> str:
+    return f"external:{rail or 'unknown'}:{network or 'unknown'}"
+
+
+FEES_ACCOUNT_PREFIX = "fees:"
+
+
+def _balance_upsert(dialect_name: str):
+    table = models.AccountBalance.__table__
+    if dialect_name == "postgresql":
+        stmt = postgresql.insert(table)
+    elif dialect_name == "sqlite":
+        stmt = sqlite.insert(table)
+    else:
+        raise NotImplementedError(f"ledger balance upsert not supported on {dialect_name}")
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.account_id, table.c.currency],
+        set_={"balance": table.c.balance + stmt.excluded.balance, "updated_at": func.now()},
+    )
+
+
+def _check_balanced(postings: List[Tuple[str, str, int]]) -> None:
+    totals: Dict[str, int] = defaultdict(int)
+    for _, currency, amount in postings:
+        totals[currency] += amount
+    if len(postings) < 2 or any(totals.values()):
+        raise UnbalancedEntryError(f"Journal entry does not balance: {dict(totals)}")
+
+
+async def post_entries(
+    db: AsyncSession,
+    entries: Iterable[Tuple[Iterable[Tuple[str, str, int]], Optional[int], Optional[str]]],
+) -> List[str]:
+    """
+    Append several journal entries, each given as (postings, transaction_id,
+    payment_id), with one postings insert and one balance upsert for the
+    lot. Does not commit; returns the entry ids in order.
+    """
+    entry_ids, rows = [], []
+    deltas: Dict[Tuple[str, str], int] = defaultdict(int)
+    for postings, transaction_id, payment_id in entries:
+        postings = [(str(account_id), currency, int(amount)) for account_id, currency, amount in postings]
+        _check_balanced(postings)
+        entry_id = uuid.uuid4().hex
+        entry_ids.append(entry_id)
+        for account_id, currency, amount in postings:
+            rows.append({
+                "entry_id": entry_id,
+                "account_id": account_id,
+                "currency": currency,
+                "amount": amount,
+                "transaction_id": transaction_id,
+                "payment_id": payment_id,
+            })
+            deltas[(account_id, currency)] += amount
+    if not rows:
+        return entry_ids
+
+    await db.execute(insert(models.LedgerPosting), rows)
+    # fixed key order, so concurrent entries lock balance rows in the same order
+    await db.execute(_balance_upsert(db.bind.dialect.name), [
+        {"account_id": account_id, "currency": currency, "balance": delta}
+        for (account_id, currency), delta in sorted(deltas.items())
+    ])
+    logger.info(f"[ledger] Posted {len(entry_ids)} entries ({len(rows)} postings)")
+    return entry_ids
+
+
+async def post_entry(
+    db: AsyncSession,
+    postings: Iterable[Tuple[str, str, int]],
+    *,
+    transaction_id: Optional[int] = None,
+    payment_id: Optional[str] = None,
+) -> str:
+    """
+    Append a journal entry of (account_id, currency, amount) postings and
+    apply it to account_balances. Does not commit; returns the entry id.
+    """
+    (entry_id,) = await post_entries(db, [(postings, transaction_id, payment_id)])
+    return entry_id
+
+
+def payment_postings(payment: models.Payment) -> List[Tuple[str, str, int]]:
+    """Debit the source account for a payment and its fees."""
+    amount = to_minor_units(payment.amount)
+    postings = [
+        (payment.source_account_id, payment.currency, -amount),
+        (external_account(payment.destination_rail, payment.destination_network), payment.currency, amount),
+    ]
+    for fee in payment.fees_data or []:
+        fee_amount = to_minor_units(fee["amount"])
+        postings.append((payment.source_account_id, fee["currency"], -fee_amount))
+        postings.append((FEES_ACCOUNT_PREFIX + fee["type"], fee["currency"], fee_amount))
+    return postings
+
+
+async def post_payment(db: AsyncSession, payment: models.Payment, transaction_id: Optional[int] = None) -> str:
+    """Post the entry for an approved payment."""
+    return await post_entry(db, payment_postings(payment), transaction_id=transaction_id, payment_id=payment.id)
+
+
+async def get_balances(db: AsyncSession, account_ids: List[str]) -> Dict[str, Dict[str, int]]:
+    """{account_id: {currency: balance}} from account_balances, one query."""
+    if not account_ids:
+        return {}
+    rows = await db.execute(
+        select(models.AccountBalance.account_id, models.AccountBalance.currency, models.AccountBalance.balance)
+        .where(models.AccountBalance.account_id.in_([str(a) for a in account_ids]))
+    )
+    balances: Dict[str, Dict[str, int]] = defaultdict(dict)
+    for account_id, currency, balance in rows:
+        balances[account_id][currency] = balance
+    return dict(balances)
+
+
+async def verify_balances(db: AsyncSession) -> List[dict]:
+    """
+    Recompute every balance from the postings and return the rows where
+    account_balances disagrees. A single statement, so on Postgres it sees
+    one consistent snapshot even while entries are being posted.
+    """
+    postings, balances = models.LedgerPosting, models.AccountBalance
+    combined = union_all(
+        select(
+            postings.account_id.label("account_id"),
+            postings.currency.label("currency"),
+            postings.amount.label("posted"),
+            literal(0).label("stored"),
+        ),
+        select(balances.account_id, balances.currency, literal(0), balances.balance),
+    ).subquery()
+    posted = func.sum(combined.c.posted)
+    stored = func.sum(combined.c.stored)
+    rows = await db.execute(
+        select(combined.c.account_id, combined.c.currency, posted, stored)
+        .group_by(combined.c.account_id, combined.c.currency)
+        .having(posted != stored)
+    )
+    mismatches = [
+        {"account_id": account_id, "currency": currency, "posted": int(p), "stored": int(s)}
+        for account_id, currency, p, s in rows
+    ]
+    if mismatches:
+        logger.error(f"[ledger] {len(mismatches)} balance mismatches, e.g. {mismatches[0]}")
+    return mismatches
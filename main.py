@@ -1,48 +1,82 @@
 import os
 import base64
-from fastapi import FastAPI, HTTPException, Depends, Header, status
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Depends, Header, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, Response
 from httpcore import request
-from pydantic import BaseModel, EmailStr, Field
-from typing import Dict, List, Annotated, Optional
+from pydantic import BaseModel, EmailStr, Field, ValidationError, field_validator
+from typing import Dict, List, Annotated, Optional, Tuple
 import secrets
 import random
 import uuid
 import json
 from datetime import datetime, timedelta
 
-from authstore import save_access_token, save_user_otp
 
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
 
 import resend
 import authstore
-from database import engine, SessionLocal
+from database import engine, SessionLocal, get_async_db
+from db_routing import ReadYourWritesMiddleware, get_read_db, get_read_db_sync
+from db_pool import pool_metrics
+from pagination import cached_count, decode_cursor, encode_cursor
+from exports import streaming_export
 import services
 from vaulta_idempotency import IdempotencyMiddleware
+from api_key_auth import ApiKeyMiddleware, invalidate_api_key
 import models
-from sqlalchemy.orm import Session
+from sqlalchemy import Integer, String, and_, case, cast, func, insert, literal, null, or_, select, union_all, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 
-from services import get_customer_by_email, issue_jwt_token, send_otp_to_email_for_login
+from services import get_customer_by_email, get_customer_by_email_async, issue_jwt_token, send_otp_to_email_for_login
 from utils import generate_otp, send_email, send_slack, send_private_slack, send_slack_message, send_slack_file
 from fastapi import Body
 import hashlib
-import jwt
-from fastapi.security import OAuth2PasswordBearer
+from auth import (
+    get_authenticated_user_id,
+    get_current_claims,
+    get_token_version_async,
+    oauth2_scheme,
+    require_admin,
+    revoke_access_token,
+)
+import revocation
+import kyc_search
+import ledger
+import dashboard
+import transaction_partitions
+import account_numbers
 
 from ovex_apis import create_quote, get_trade_history
 from ovex_apis import get_markets
 from etherscan_apis import get_etherscan_transactions
-from redis_client import r
+from redis_client import close_async_redis, get_async_redis, init_async_redis
+from http_clients import close_http_clients, get_http_client, http_metrics, init_http_clients
 from fastapi import Query, File, UploadFile, Form
 from fastapi import Request
 import inspect
 from firebase_storage import upload_documents, download_file_from_url
 import httpx
+from contextlib import asynccontextmanager
 from core.config import settings
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_async_redis()
+    init_http_clients()
+    await revocation.start()
+    yield
+    await revocation.stop()
+    await close_http_clients()
+    await close_async_redis()
+
+
+app = FastAPI(lifespan=lifespan)
 
 import logging
 import traceback
@@ -99,58 +133,10 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 #     require_header=True,    # force Idempotency-Key
 # )
 
-# def _api_key_is_enabled(key_obj) -> bool:
-#     """Return True if the key is enabled, handling either `.active` or `.is_active` fields."""
-#     return bool(getattr(key_obj, "active", getattr(key_obj, "is_active", True)))
-
-# UNPROTECTED_PATHS = {
-#     "/",                # health/root
-#     "/login",
-#     "/register",
-#     "/verify-otp",
-#     "/account",
-#     # API key management endpoints should not require an API key themselves
-#     "/api/v1/create_api_key",
-#     "/api/v1/api_keys",
-#     "/api/v1/toggle_api_key",
-#     "/api/v1/delete_api_key",  # wildcard path excluded via startswith check below
-# }
-
-# @app.middleware("http")
-# async def require_x_api_key(request: Request, call_next):
-#     path = request.url.path
-
-#     # Enforce API key for all /api/v1/* routes EXCEPT the explicitly unprotected ones.
-#     needs_key = path.startswith("/api/v1/") and not any(
-#         path == p or path.startswith(p + "/") for p in UNPROTECTED_PATHS
-#     )
-
-#     if needs_key:
-#         x_api_key = request.headers.get("x-api-key")
-#         if not x_api_key:
-#             return JSONResponse(status_code=401, content={"detail": "Missing x-api-key header"})
-
-#         db = SessionLocal()
-#         try:
-#             key_obj = db.query(models.ApiKey).filter(models.ApiKey.key == x_api_key).first()
-#             if not key_obj:
-#                 return JSONResponse(status_code=403, content={"detail": "Invalid API key"})
-
-#             # Expiry check (if present)
-#             # if getattr(key_obj, "expires_at", None) and key_obj.expires_at < datetime.now():
-#             #     return JSONResponse(status_code=403, content={"detail": "API key expired"})
-
-#             # Active/enabled check
-#             if not _api_key_is_enabled(key_obj):
-#                 return JSONResponse(status_code=403, content={"detail": "API key disabled"})
-
-#             # Optionally expose to downstream handlers
-#             request.state.api_key = x_api_key
-#             request.state.api_user_id = getattr(key_obj, "user_id", None)
-#         finally:
-#             db.close()
-
-#     return await call_next(request)
+# Inside ApiKeyMiddleware, so it sees the api_user_id it sets.
+app.add_middleware(ReadYourWritesMiddleware)
+# Runs inside CORS so preflight requests are answered without a key.
+app.add_middleware(ApiKeyMiddleware)
 
 
 # Add CORS middleware
@@ -160,9 +146,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-Cursor"],
 )
 
 models.Base.metadata.create_all(bind=engine)
+with engine.begin() as _conn:
+    kyc_search.install(_conn)
+    transaction_partitions.install(_conn)
 
 # Mock user database - in a real app, use a proper database
 users_db = {}
@@ -448,20 +438,17 @@ def _submission_email_html(kyc: models.UserKyc, ubos: list[models.UserKycUbo], d
                 ubo_rows_html = "<tr><td colspan='7'>No UBO records found</td></tr>"
 
         basic_payload_html = "<li>None</li>"
-        if kyc.basic_info_payload:
-                try:
-                        parsed_payload = json.loads(kyc.basic_info_payload)
-                        if isinstance(parsed_payload, dict):
-                                basic_payload_html = "".join(
-                                        [
-                                                f"<li><strong>{k.replace('_', ' ').title()}:</strong> {v if v is not None else 'N/A'}</li>"
-                                                for k, v in parsed_payload.items()
-                                        ]
-                                )
-                        else:
-                                basic_payload_html = f"<li><pre>{json.dumps(parsed_payload, indent=2)}</pre></li>"
-                except Exception:
-                        basic_payload_html = f"<li><pre>{kyc.basic_info_payload}</pre></li>"
+        parsed_payload = kyc.basic_info_payload
+        if parsed_payload:
+                if isinstance(parsed_payload, dict):
+                        basic_payload_html = "".join(
+                                [
+                                        f"<li><strong>{k.replace('_', ' ').title()}:</strong> {v if v is not None else 'N/A'}</li>"
+                                        for k, v in parsed_payload.items()
+                                ]
+                        )
+                else:
+                        basic_payload_html = f"<li><pre>{json.dumps(parsed_payload, indent=2, default=str)}</pre></li>"
 
         return f"""
 <p>A new onboarding submission has been received.</p>
@@ -530,11 +517,7 @@ def _submission_slack_text(
 
     basic_payload_text = "None"
     if kyc.basic_info_payload:
-        try:
-            parsed_payload = json.loads(kyc.basic_info_payload)
-            basic_payload_text = json.dumps(parsed_payload, indent=2, default=str)
-        except Exception:
-            basic_payload_text = str(kyc.basic_info_payload)
+        basic_payload_text = json.dumps(kyc.basic_info_payload, indent=2, default=str)
 
     ubo_lines = "\n".join(
         [
@@ -634,15 +617,14 @@ def get_db():
 
 async def _fetch_persona_inquiry_attributes(inquiry_id: str, context_email: str = "", context_phone: str = "") -> dict:
     logger.info(f"[persona] Verifying inquiry_id={inquiry_id}")
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            f"https://withpersona.com/api/v1/inquiries/{inquiry_id}",
-            headers={
-                "Authorization": f"Bearer {settings.PERSONA_API_KEY}",
-                "Persona-Version": "2023-01-05",
-                "Key-Inflection": "camel",
-            },
-        )
+    resp = await get_http_client("persona").get(
+        f"https://withpersona.com/api/v1/inquiries/{inquiry_id}",
+        headers={
+            "Authorization": f"Bearer {settings.PERSONA_API_KEY}",
+            "Persona-Version": "2023-01-05",
+            "Key-Inflection": "camel",
+        },
+    )
 
     if resp.status_code != 200:
         logger.error(f"[persona] API error: status={resp.status_code}, body={resp.text}")
@@ -660,11 +642,11 @@ async def _fetch_persona_inquiry_attributes(inquiry_id: str, context_email: str
     return attrs
 
 @app.post("/login", response_model=ApiResponse, status_code=status.HTTP_200_OK)
-async def login(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
     logger_auth.info(f"[login] Request received for email: {user_data.email}")
     
     email = user_data.email
-    user = get_customer_by_email(email, db)
+    user = await get_customer_by_email_async(email, db)
     logger_auth.info(f"[login] User lookup: {'found' if user else 'not found'} for {email}")
     
     if not user:
@@ -686,9 +668,8 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
     otp = generate_otp()
     to = [user.email]
     
-    user.password = otp
-    db.commit()
-    db.refresh(user)
+    token = secrets.token_hex(32)
+    await authstore.start_login_async(token, str(user.id), otp)
     logger_auth.info(f"[login] OTP generated and stored for user: {email}")
     
     try:
@@ -700,10 +681,6 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
     
     send_private_slack(f"✅ Login OTP generated for: {email}")
     
-    token = secrets.token_hex(32)
-    save_access_token(token, str(user.id))
-    save_user_otp(str(user.id), otp)
-    
     logger_auth.info(f"[login] Login successful - token issued for: {email}")
     return JSONResponse(
         status_code=200,
@@ -730,7 +707,7 @@ class VerifyOtpBody(BaseModel):
     token: str
 
 @app.post("/verify-otp")
-async def verify_otp(body: VerifyOtpBody, db: Session = Depends(get_db)):
+async def verify_otp(body: VerifyOtpBody):
     logger_auth.info(f"[verify-otp] OTP verification request received")
     
     token = body.token
@@ -738,57 +715,46 @@ async def verify_otp(body: VerifyOtpBody, db: Session = Depends(get_db)):
         logger_auth.warning(f"[verify-otp] Missing access token")
         raise HTTPException(status_code=401, detail="Missing or invalid Authorization header")
 
-    user_id = authstore.get_user_id_from_token(token)
-    logger_auth.info(f"[verify-otp] Token resolved to user: {user_id}")
-    
-    user = authstore.get_user_by_id(user_id)
-    
-    if not user_id:
+    result, user_id = await authstore.verify_login_otp_async(token, body.otp)
+    logger_auth.info(f"[verify-otp] Login state resolved to user: {user_id} ({result})")
+
+    if result == "missing":
         logger_auth.warning(f"[verify-otp] Invalid or expired token")
         raise HTTPException(status_code=401, detail="Invalid or expired access token")
 
-    expected_otp = authstore.get_user_otp(user_id)
-    logger_auth.info(f"[verify-otp] OTP lookup for user {user_id}")
+    if result == "locked":
+        logger_auth.warning(f"[verify-otp] Too many invalid OTP attempts for user {user_id}")
+        raise HTTPException(status_code=429, detail="Too many invalid OTP attempts. Please log in again.")
 
-    if not expected_otp or body.otp != expected_otp:
+    if result != "ok":
         logger_auth.warning(f"[verify-otp] Invalid OTP provided for user {user_id}")
         raise HTTPException(status_code=400, detail="Invalid OTP")
 
-    authstore.clear_user_otp(user_id)
-    jwt_response = issue_jwt_token(user_id)
+    user = await authstore.get_user_by_id_async(user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    jwt_response = issue_jwt_token(
+        user_id,
+        role=user.role,
+        verified=user.verified,
+        token_version=await get_token_version_async(user_id),
+    )
     jwt_response['user'] = user
 
     logger_auth.info(f"[verify-otp] OTP verified successfully for user {user_id}")
     return jwt_response
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
-
-def get_authenticated_user_id(token: str = Depends(oauth2_scheme)) -> str:
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    return user_id
+@app.post("/logout")
+async def logout(token: str = Depends(oauth2_scheme), claims: dict = Depends(get_current_claims)):
+    await revoke_access_token(token, claims)
+    logger_auth.info(f"[logout] Token revoked for user {claims['sub']}")
+    return {"message": "Logged out"}
 
 @app.get("/account", response_model=UserResponse)
-async def get_account(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    logger_auth.info("[account] Token decode attempt")
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        logger_auth.info(f"[account] User ID extracted: {user_id}")
-        if not user_id:
-            logger_auth.warning("[account] Invalid token: no user_id")
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError as e:
-        logger_auth.error(f"[account] JWT error: {e}")
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+async def get_account(user_id: str = Depends(get_authenticated_user_id)):
+    logger_auth.info(f"[account] User ID extracted: {user_id}")
+
+    user = await authstore.get_user_by_id_async(user_id)
     
     if not user:
         logger_auth.warning(f"[account] User not found: {user_id}")
@@ -802,45 +768,7 @@ async def get_account(token: str = Depends(oauth2_scheme), db: Session = Depends
         "email": user.email,
         "role": user.role,
         "phone": user.phone,
-        "dashboard":{
-            "wallet_balance":"0",
-            "currency_pair_1":{
-                "label":"Assets",
-                "value":"0",
-                "subvalue":"0"
-            },
-            "currency_pair_2":{
-                "label":"Transactions",
-                "value":"0",
-                "subvalue":"0"
-            },
-            "summary":
-            [
-                {
-                "Pending Approval":"1",
-                },
-                {   
-                "Risk Alert":"7",
-                },
-                {   
-                "Flagged Transactions":"1"
-                }
-            ],
-            "recent_transactions":[
-                # {
-                #     "name":"Received USDT",
-                #     "date":"2024-06-01",
-                #     "amount":"$1000",
-                #     "status":"Completed"
-                # },
-                # {
-                #     "name":"Sent GHS",
-                #     "date":"2024-06-02",
-                #     "amount":"GHS 500",
-                #     "status":"Pending"
-                # }
-            ]
-        }
+        "dashboard": await dashboard.get_dashboard(user_id),
     }
 
 @app.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
@@ -1124,17 +1052,12 @@ async def get_v2_onboarding_resume(reference_id: str, db: Session = Depends(get_
     ubos = db.query(models.UserKycUbo).filter(models.UserKycUbo.kyc_id == kyc.id).all()
     urls = _extract_kyc_document_urls(kyc)
     payload_basic_info = {}
-    if kyc.basic_info_payload:
-        try:
-            parsed_payload = json.loads(kyc.basic_info_payload)
-            if isinstance(parsed_payload, dict):
-                payload_basic_info = {
-                    key: value
-                    for key, value in parsed_payload.items()
-                    if key not in {"reference_id", "captured_at"}
-                }
-        except Exception as exc:
-            logger.warning(f"[onboarding/v2/resume] Failed to parse basic_info_payload for reference_id={reference_id}: {exc}")
+    if isinstance(kyc.basic_info_payload, dict):
+        payload_basic_info = {
+            key: value
+            for key, value in kyc.basic_info_payload.items()
+            if key not in {"reference_id", "captured_at"}
+        }
 
     basic_info = {
         "full_name": kyc.full_name,
@@ -1157,7 +1080,7 @@ async def get_v2_onboarding_resume(reference_id: str, db: Session = Depends(get_
         "persona_template_id": settings.PERSONA_TEMPLATE_ID,
         "persona_environment": settings.PERSONA_ENVIRONMENT,
         "basic_info": basic_info,
-        "basic_info_payload": json.loads(kyc.basic_info_payload) if kyc.basic_info_payload else None,
+        "basic_info_payload": kyc.basic_info_payload,
         "ubos": [
             {
                 "ubo_reference_id": u.ubo_reference_id,
@@ -1205,7 +1128,7 @@ async def save_v2_basic_info(payload: dict = Body(...), db: Session = Depends(ge
     payload_to_store = dict(payload)
     payload_to_store["reference_id"] = reference_id
     payload_to_store["captured_at"] = datetime.now().isoformat()
-    kyc.basic_info_payload = json.dumps(payload_to_store)
+    kyc.basic_info_payload = payload_to_store
 
     kyc.full_name = payload.get("full_name")
     email_val = payload.get("email")
@@ -2080,6 +2003,22 @@ async def complete_onboarding(
 async def root():
     return {"message":"Hello!"}
 
+@app.get("/internal/pool-metrics", include_in_schema=False)
+async def get_pool_metrics(admin_user_id: str = Depends(require_admin)):
+    """Per-engine connection pool usage and checkout wait times for this worker."""
+    return {"pid": os.getpid(), "pools": pool_metrics()}
+
+@app.get("/internal/http-metrics", include_in_schema=False)
+async def get_http_metrics(admin_user_id: str = Depends(require_admin)):
+    """Per-provider, per-host upstream HTTP requests, new connections and response times for this worker."""
+    return {"pid": os.getpid(), "providers": http_metrics()}
+
+@app.get("/internal/ledger/verify", include_in_schema=False)
+async def verify_ledger(admin_user_id: str = Depends(require_admin), db: AsyncSession = Depends(get_read_db)):
+    """Recompute balances from ledger postings and list any that disagree."""
+    mismatches = await ledger.verify_balances(db)
+    return {"ok": not mismatches, "mismatches": mismatches}
+
 @app.post("/api/v1/get_quote")
 async def create_quote_route(data: QuoteRequest, db:Session = Depends(get_db)):
     
@@ -2089,7 +2028,7 @@ async def create_quote_route(data: QuoteRequest, db:Session = Depends(get_db)):
     print("==data==")
     print(data)
     
-    response = create_quote(data.model_dump())
+    response = await create_quote(data.model_dump())
     
     print("==response==")
     print(response)
@@ -2117,7 +2056,7 @@ async def get_todays_cron_rates():
     pair = "USDT-GHS" 
     side = "sell"
     
-    quote = create_quote(
+    quote = await create_quote(
         {
             "pair": pair,
             "side": side,
@@ -2135,15 +2074,7 @@ class ApiKeyResponse(BaseModel):
     expires_at: datetime
 
 @app.post("/api/v1/create_api_key", response_model=ApiKeyResponse)
-async def create_api_key(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
+async def create_api_key(user_id: str = Depends(get_authenticated_user_id), db: Session = Depends(get_db)):
     # Generate a new API key
     api_key = secrets.token_urlsafe(32)
     expires_at = datetime.now() + timedelta(days=30)
@@ -2157,19 +2088,12 @@ async def create_api_key(token: str = Depends(oauth2_scheme), db: Session = Depe
     db.add(api_key_obj)
     db.commit()
     db.refresh(api_key_obj)
+    await invalidate_api_key(api_key)
 
     return ApiKeyResponse(api_key=api_key, expires_at=expires_at)
 
 @app.get("/api/v1/api_keys")
-async def get_api_keys(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
+async def get_api_keys(user_id: str = Depends(get_authenticated_user_id), db: Session = Depends(get_db)):
     api_keys = db.query(models.ApiKey).filter(models.ApiKey.user_id == user_id).all()
     result = [
         {
@@ -2183,21 +2107,14 @@ async def get_api_keys(token: str = Depends(oauth2_scheme), db: Session = Depend
 
 
 @app.delete("/api/v1/delete_api_key/{api_key}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_api_key(api_key: str, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
+async def delete_api_key(api_key: str, user_id: str = Depends(get_authenticated_user_id), db: Session = Depends(get_db)):
     api_key_obj = db.query(models.ApiKey).filter(models.ApiKey.key == api_key, models.ApiKey.user_id == user_id).first()
     if not api_key_obj:
         raise HTTPException(status_code=404, detail="API key not found")
 
     db.delete(api_key_obj)
     db.commit()
+    await invalidate_api_key(api_key)
     return
 
 class ToggleApiKeyRequest(BaseModel):
@@ -2205,66 +2122,219 @@ class ToggleApiKeyRequest(BaseModel):
     active: bool
 
 @app.post("/api/v1/toggle_api_key")
-async def toggle_api_key_status(body: ToggleApiKeyRequest, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
+async def toggle_api_key_status(body: ToggleApiKeyRequest, user_id: str = Depends(get_authenticated_user_id), db: Session = Depends(get_db)):
     api_key_obj = db.query(models.ApiKey).filter(models.ApiKey.key == body.api_key, models.ApiKey.user_id == user_id).first()
     if not api_key_obj:
         raise HTTPException(status_code=404, detail="API key not found")
 
-    api_key_obj.active = body.active
+    api_key_obj.is_active = body.active
     db.commit()
     db.refresh(api_key_obj)
-    return {"api_key": api_key_obj.key, "active": api_key_obj.active}
+    await invalidate_api_key(body.api_key)
+    return {"api_key": api_key_obj.key, "active": api_key_obj.is_active}
+
+
+TRANSACTIONS_MAX_LIMIT = 200
+
+# Transactions and pending payment intents are listed as one stream, newest
+# first, ordered by (created_at, kind, id). "transaction" sorts after
+# "intent", so on equal timestamps transactions come first.
+_TX_KIND = "transaction"
+_INTENT_KIND = "intent"
+
+
+def _int_id(value: str, detail: str) -> int:
+    """Ids are strings in the API but integers in the DB; asyncpg won't compare the two."""
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPException(status_code=404, detail=detail)
+
+
+def _violated_constraint(exc: IntegrityError) -> str:
+    """
+    What an IntegrityError violated, as far as the driver says: the
+    constraint or index name on Postgres (psycopg2's diag, asyncpg's
+    constraint_name), else the message ("UNIQUE constraint failed:
+    accounts.account_number" on SQLite).
+    """
+    for source in (exc.orig, getattr(exc.orig, "__cause__", None)):
+        name = getattr(getattr(source, "diag", None), "constraint_name", None) or getattr(source, "constraint_name", None)
+        if name:
+            return name
+    return str(exc.orig)
+
+
+def _serialize_transaction_item(tx: models.Transaction) -> dict:
+    return {
+        "id": str(tx.id),
+        "amount": tx.amount,
+        "currency": tx.currency,
+        "type": tx.transaction_type,
+        "provider": tx.provider,
+        "status": tx.status,
+        "reference": tx.reference,
+        "description": tx.description,
+        "created_at": tx.created_at,
+        "updated_at": tx.updated_at
+    }
+
+
+def _serialize_intent_item(payment: models.Payment) -> dict:
+    return {
+        "id": str(payment.id),
+        "amount": payment.amount,
+        "currency": payment.currency,
+        "type": "intent",
+        "destination_rail": payment.destination_rail,
+        "destination_network": payment.destination_network,
+        "destination_address": payment.destination_address,
+        "description": payment.description,
+        "client_reference": payment.client_reference,
+        "status": payment.status,
+        "created_at": payment.created_at,
+        "updated_at": payment.updated_at
+    }
+
+
+async def _history_keys(
+    db: AsyncSession,
+    user_id: str,
+    after: Optional[list],
+    count: int,
+    since: Optional[datetime] = None,
+) -> List[tuple]:
+    """
+    Up to `count` (created_at, kind, id) keys of the user's live
+    transactions and pending intents, newest first, after the keyset
+    `after`; only rows from `since` on when given.
+    """
+    tx = models.Transaction
+    pay = models.Payment
+    tx_branch = (
+        select(
+            literal(_TX_KIND, String).label("kind"),
+            tx.id.label("tx_id"),
+            cast(null(), String).label("payment_id"),
+            tx.created_at.label("created_at"),
+        )
+        .where(tx.user_id == user_id)
+    )
+    intent_branch = (
+        select(
+            literal(_INTENT_KIND, String).label("kind"),
+            cast(null(), Integer).label("tx_id"),
+            pay.id.label("payment_id"),
+            pay.created_at.label("created_at"),
+        )
+        .where(pay.user_id == user_id, pay.status == "pending")
+    )
+
+    if since is not None:
+        tx_branch = tx_branch.where(tx.created_at >= since)
+        intent_branch = intent_branch.where(pay.created_at >= since)
+
+    # The keyset condition is applied inside each branch so both can walk
+    # their (user_id, ..., created_at, id) index and stop after count rows.
+    if after:
+        after_created_at, after_kind, after_id = after
+        if after_kind == _TX_KIND:
+            tx_branch = tx_branch.where(or_(
+                tx.created_at < after_created_at,
+                and_(tx.created_at == after_created_at, tx.id < after_id),
+            ))
+            intent_branch = intent_branch.where(pay.created_at <= after_created_at)
+        else:
+            tx_branch = tx_branch.where(tx.created_at < after_created_at)
+            intent_branch = intent_branch.where(or_(
+                pay.created_at < after_created_at,
+                and_(pay.created_at == after_created_at, pay.id < after_id),
+            ))
+    tx_branch = tx_branch.order_by(tx.created_at.desc(), tx.id.desc()).limit(count)
+    intent_branch = intent_branch.order_by(pay.created_at.desc(), pay.id.desc()).limit(count)
+
+    merged = union_all(tx_branch.subquery().select(), intent_branch.subquery().select()).subquery()
+    keys = (await db.execute(
+        select(merged)
+        .order_by(merged.c.created_at.desc(), merged.c.kind.desc(), merged.c.tx_id.desc(), merged.c.payment_id.desc())
+        .limit(count)
+    )).all()
+    return [(k.created_at, k.kind, k.tx_id if k.kind == _TX_KIND else k.payment_id) for k in keys]
 
 
 @app.get("/api/v1/transactions")
-async def get_all_transactions(user_id: str = Depends(get_authenticated_user_id), db: Session = Depends(get_db)):
-    # transactions = db.query(models.Transaction).filter(models.Transaction.user_id == user_id).all()
-    transactions = db.query(models.Transaction).all()
-    pending_payments = db.query(models.Payment).filter(models.Payment.status == "pending").all()
+async def get_all_transactions(
+    response: Response,
+    limit: int = Query(50, ge=1, le=TRANSACTIONS_MAX_LIMIT),
+    cursor: Optional[str] = Query(None),
+    user_id: str = Depends(get_authenticated_user_id),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    The caller's transactions and pending payment intents, newest first.
+    When more rows exist the `X-Next-Cursor` response header carries the
+    cursor for the next page.
+
+    Pages start in the hot window (the last TRANSACTIONS_HOT_MONTHS
+    months), which only reads its partitions. A page the hot window can't
+    fill carries on into the older partitions and the archive, so those
+    are only read once the recent rows have all been served.
+    """
+    after = decode_cursor(cursor, 3)
+    if after and not isinstance(after[0], datetime):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    hot_start = transaction_partitions.hot_window_start()
+
+    page = []
+    if after is None or transaction_partitions.naive_utc(after[0]) >= hot_start:
+        page = await _history_keys(db, user_id, after, limit + 1, since=hot_start)
+        if len(page) <= limit:
+            # the hot window is used up; this key sorts after all of it
+            after = [hot_start, _INTENT_KIND, ""]
+
+    archived = {}
+    if len(page) <= limit:
+        wanted = limit + 1 - len(page)
+        after_created_at, after_kind, after_id = after
+        older = await _history_keys(db, user_id, after, wanted)
+        archived = {t.id: t for t in await transaction_partitions.archived_transactions(
+            db, user_id, wanted,
+            before_created_at=after_created_at,
+            before_id=after_id if after_kind == _TX_KIND else None,
+        )}
+        if archived:
+            older += [(t.created_at, _TX_KIND, t.id) for t in archived.values()]
+            older.sort(key=lambda key: (transaction_partitions.naive_utc(key[0]), key[1], key[2]), reverse=True)
+        page += older[:wanted]
+
+    has_next = len(page) > limit
+    page = page[:limit]
+
+    tx = models.Transaction
+    pay = models.Payment
+    live_tx_keys = [key for key in page if key[1] == _TX_KIND and key[2] not in archived]
+    payment_ids = [key[2] for key in page if key[1] == _INTENT_KIND]
+    transactions = dict(archived)
+    payments = {}
+    if live_tx_keys:
+        # created_at bounds let Postgres prune to the partitions the page spans
+        transactions.update({t.id: t for t in (await db.execute(
+            select(tx).where(
+                tx.id.in_([key[2] for key in live_tx_keys]),
+                tx.created_at.between(min(key[0] for key in live_tx_keys), max(key[0] for key in live_tx_keys)),
+            )
+        )).scalars()})
+    if payment_ids:
+        payments = {p.id: p for p in (await db.execute(select(pay).where(pay.id.in_(payment_ids)))).scalars()}
+
     result = [
-        {
-            "id": str(tx.id),
-            "amount": tx.amount,
-            "currency": tx.currency,
-            "type": tx.transaction_type,
-            "provider": tx.provider,
-            "status": tx.status,
-            "reference": tx.reference,
-            "description": tx.description,
-            "created_at": tx.created_at,
-            "updated_at": tx.updated_at
-        }
-        for tx in transactions
+        _serialize_transaction_item(transactions[item_id]) if kind == _TX_KIND
+        else _serialize_intent_item(payments[item_id])
+        for _, kind, item_id in page
     ]
-    
-    payemnts = [
-        {
-            "id": str(payment.id),
-            "amount": payment.amount,
-            "currency": payment.currency,
-            "type": "intent",
-            "destination_rail": payment.destination_rail,
-            "destination_network": payment.destination_network,
-            "destination_address": payment.destination_address,
-            "description": payment.description,
-            "client_reference": payment.client_reference,
-            "status": payment.status,
-            "created_at": payment.created_at,
-            "updated_at": payment.updated_at
-        }
-        for payment in pending_payments
-    ]
-    
-    result.extend(payemnts)
-    
+
+    if has_next:
+        response.headers["X-Next-Cursor"] = encode_cursor(list(page[-1]))
     return result
 
 @app.get("/api/v1/etherscan/transactions")
@@ -2302,31 +2372,31 @@ async def check_wallet(
     from etherscan_apis import validate_evm_address, ETHERSCAN_BASE_URL
     validate_evm_address(address)
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            resp = await client.get(
-                ETHERSCAN_BASE_URL,
-                params={
-                    "apikey": settings.ETHERSCAN_API_KEY,
-                    "chainid": chainid,
-                    "module": "account",
-                    "action": "txlist",
-                    "address": address,
-                    "startblock": 0,
-                    "endblock": 999999999,
-                    "page": 1,
-                    "offset": 10,
-                    "sort": "desc",
-                },
-            )
-        except httpx.HTTPError as exc:
-            raise HTTPException(status_code=502, detail="Etherscan request failed") from exc
+    try:
+        resp = await get_http_client("etherscan").get(
+            ETHERSCAN_BASE_URL,
+            params={
+                "apikey": settings.ETHERSCAN_API_KEY,
+                "chainid": chainid,
+                "module": "account",
+                "action": "txlist",
+                "address": address,
+                "startblock": 0,
+                "endblock": 999999999,
+                "page": 1,
+                "offset": 10,
+                "sort": "desc",
+            },
+        )
+    except httpx.HTTPError as exc:
+        raise HTTPException(status_code=502, detail="Etherscan request failed") from exc
 
     payload = resp.json()
     normal_txs = payload["result"] if str(payload.get("status")) == "1" and isinstance(payload.get("result"), list) else []
     address_lower = address.lower()
     redis_key = f"wallet:last_seen_tx:{address_lower}"
-    last_seen = r.get(redis_key)
+    ar = get_async_redis()
+    last_seen = await ar.get(redis_key)
 
     new_tx = None
     for tx in normal_txs:
@@ -2351,34 +2421,32 @@ async def check_wallet(
             "rates",
             f"🚨 Wallet Credited!\nAddress: {address}\nAmount: {value_eth} ETH\nFrom: {new_tx.get('from')}\nTx: {explorer_base}/tx/{tx_hash}",
         )
-        r.set(redis_key, tx_hash)
+        await ar.set(redis_key, tx_hash)
+        last_seen = tx_hash
 
     return {
         "status": "checked",
         "address": address,
         "new_transaction_found": new_tx is not None,
-        "last_seen_tx": r.get(redis_key),
+        "last_seen_tx": last_seen,
     }
 
 
 @app.get("/api/v1/transactions/{transaction_id}")
 async def get_transaction(
     transaction_id: str,
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    user_id: str = Depends(get_authenticated_user_id),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    transaction = db.query(models.Transaction).filter(
-        models.Transaction.id == transaction_id,
-        models.Transaction.user_id == user_id
-    ).first()
+    tx_id = _int_id(transaction_id, "Transaction not found")
+    transaction = (await db.execute(
+        select(models.Transaction).where(
+            models.Transaction.id == tx_id,
+            models.Transaction.user_id == user_id
+        )
+    )).scalars().first()
+    if not transaction:
+        transaction = await transaction_partitions.get_archived_transaction(db, user_id, tx_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
 
@@ -2404,24 +2472,16 @@ class CreateTransactionRequest(BaseModel):
 @app.post("/api/v1/create_transactions", status_code=status.HTTP_201_CREATED)
 async def create_transaction(
     data: CreateTransactionRequest,
-    token: str = Depends(oauth2_scheme),
+    user_id: str = Depends(get_authenticated_user_id),
     db: Session = Depends(get_db)
 ):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
     transaction = models.Transaction(
         user_id=user_id,
         amount=data.amount,
         currency=data.currency,
         type=data.type,
         status=data.status,
-        created_at=datetime.now()
+        created_at=transaction_partitions.utc_now()
     )
     db.add(transaction)
     db.commit()
@@ -2438,17 +2498,9 @@ async def create_transaction(
 @app.delete("/api/v1/transactions/{transaction_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_transaction(
     transaction_id: str,
-    token: str = Depends(oauth2_scheme),
+    user_id: str = Depends(get_authenticated_user_id),
     db: Session = Depends(get_db)
 ):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
     transaction = db.query(models.Transaction).filter(
         models.Transaction.id == transaction_id,
         models.Transaction.user_id == user_id
@@ -2458,6 +2510,7 @@ async def delete_transaction(
 
     db.delete(transaction)
     db.commit()
+    await dashboard.transaction_changed(user_id)
     return
 
 class CreateAccountRequest(BaseModel):
@@ -2501,6 +2554,19 @@ class PaymentResponse(BaseModel):
     created_at: str
 
 
+def _payment_response(payment: models.Payment) -> PaymentResponse:
+    # fees_data / fx_data are JSON columns, already parsed by the column type
+    return PaymentResponse(
+        id=payment.id,
+        status=payment.status,
+        amount=payment.amount,
+        currency=payment.currency,
+        fx=payment.fx_data or None,
+        fees=payment.fees_data or [],
+        created_at=payment.created_at.isoformat() + "Z"
+    )
+
+
 class KycBasicInfoResponse(BaseModel):
     full_name: Optional[str] = None
     email: Optional[str] = None
@@ -2563,10 +2629,16 @@ class KycDetailResponse(BaseModel):
 
 class AdminKycListResponse(BaseModel):
     items: List[KycEntryResponse]
-    total: int
+    total: Optional[int] = None
     page: int
     page_size: int
     has_next: bool
+    next_cursor: Optional[str] = None
+
+
+class AdminKycSearchResponse(BaseModel):
+    items: List[KycEntryResponse]
+    count: int
 
 
 class KycComplianceSendRequest(BaseModel):
@@ -2607,8 +2679,27 @@ class KycDocumentReviewListResponse(BaseModel):
 DOCUMENT_REVIEW_ALLOWED_STATUSES = {"approved", "declined"}
 
 
-def _serialize_kyc_entry(kyc: models.UserKyc, db: Session) -> KycEntryResponse:
-    ubos = db.query(models.UserKycUbo).filter(models.UserKycUbo.kyc_id == kyc.id).all()
+async def _load_kyc_ubo_counts(db: AsyncSession, kyc_ids: List[int]) -> Dict[int, Tuple[int, int]]:
+    """(ubo_count, ubo_verified_count) per KYC id, in one aggregate query."""
+    if not kyc_ids:
+        return {}
+    rows = await db.execute(
+        select(
+            models.UserKycUbo.kyc_id,
+            func.count(models.UserKycUbo.id),
+            func.coalesce(
+                func.sum(case((models.UserKycUbo.persona_status.in_(ALLOWED_PERSONA_STATUSES), 1), else_=0)),
+                0,
+            ),
+        )
+        .where(models.UserKycUbo.kyc_id.in_(kyc_ids))
+        .group_by(models.UserKycUbo.kyc_id)
+    )
+    return {kyc_id: (int(total), int(verified)) for kyc_id, total, verified in rows}
+
+
+def _serialize_kyc_entry(kyc: models.UserKyc, ubo_counts: Tuple[int, int] = (0, 0)) -> KycEntryResponse:
+    ubo_count, ubo_verified_count = ubo_counts
     urls = _extract_kyc_document_urls(kyc)
 
     return KycEntryResponse(
@@ -2621,8 +2712,8 @@ def _serialize_kyc_entry(kyc: models.UserKyc, db: Session) -> KycEntryResponse:
         persona_inquiry_id=kyc.persona_inquiry_id,
         verified_at=kyc.verified_at.isoformat() if kyc.verified_at else None,
         documents_uploaded=len(urls),
-        ubo_count=len(ubos),
-        ubo_verified_count=len([u for u in ubos if u.persona_status in ALLOWED_PERSONA_STATUSES]),
+        ubo_count=ubo_count,
+        ubo_verified_count=ubo_verified_count,
         hidden=kyc.hidden or False,
     )
 
@@ -2631,13 +2722,8 @@ def _format_document_label(field_name: str) -> str:
     return field_name.replace("_", " ").title()
 
 
-def _build_kyc_document_review_statuses(kyc: models.UserKyc, db: Session) -> Dict[str, KycDocumentReviewStatusResponse]:
-    reviews = (
-        db.query(models.UserKycDocumentReview)
-        .filter(models.UserKycDocumentReview.kyc_id == kyc.id)
-        .all()
-    )
-    review_map = {review.document_field: review for review in reviews}
+def _build_kyc_document_review_statuses(kyc: models.UserKyc) -> Dict[str, KycDocumentReviewStatusResponse]:
+    review_map = {review.document_field: review for review in kyc.document_reviews}
 
     review_statuses: Dict[str, KycDocumentReviewStatusResponse] = {}
     for field_name in V2_ALLOWED_DOCUMENT_FIELDS:
@@ -2690,8 +2776,8 @@ def _send_declined_documents_email(
     )
 
 
-def _serialize_kyc_detail(kyc: models.UserKyc, db: Session) -> KycDetailResponse:
-    ubos = db.query(models.UserKycUbo).filter(models.UserKycUbo.kyc_id == kyc.id).all()
+def _serialize_kyc_detail(kyc: models.UserKyc) -> KycDetailResponse:
+    ubos = kyc.ubos
     urls = _extract_kyc_document_urls(kyc)
 
     return KycDetailResponse(
@@ -2727,37 +2813,55 @@ def _serialize_kyc_detail(kyc: models.UserKyc, db: Session) -> KycDetailResponse
         ubo_verified_count=len([u for u in ubos if u.persona_status in ALLOWED_PERSONA_STATUSES]),
         documents=urls,
         documents_uploaded=len(urls),
-        review_statuses=_build_kyc_document_review_statuses(kyc, db),
+        review_statuses=_build_kyc_document_review_statuses(kyc),
     )
 
+async def _account_responses(db: AsyncSession, accounts: List[models.Account]) -> List[AccountResponse]:
+    # balances are {currency: minor units}, read from the ledger's balance table
+    balances = await ledger.get_balances(db, [str(account.id) for account in accounts])
+    return [
+        AccountResponse(
+            id=str(account.id),
+            name=account.account_name,
+            currency=account.currency,
+            status=account.status,
+            balances=balances.get(str(account.id), {}),
+            metadata=account.account_metadata
+        )
+        for account in accounts
+    ]
+
+ACCOUNT_NUMBER_ATTEMPTS = 3
+
 @app.post("/api/v1/create_account", response_model=AccountResponse, status_code=status.HTTP_201_CREATED)
 async def create_account(
     data: CreateAccountRequest,
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    user_id: str = Depends(get_authenticated_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        print("user_id")
-        print(user_id)
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalidated token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
     account_id = secrets.token_hex(8)
-    account_number = services.generate_account_number()
-    account = models.Account(
-        user_id=user_id,
-        account_name=data.name,
-        account_number=account_number,
-        currency=data.currency,
-        metadata=data.metadata or {}
-    )
-    db.add(account)
-    db.commit()
-    db.refresh(account)
+    for attempt in range(ACCOUNT_NUMBER_ATTEMPTS):
+        account_number = await run_in_threadpool(services.generate_account_number)
+        account = models.Account(
+            user_id=user_id,
+            account_name=data.name,
+            account_number=account_number,
+            currency=data.currency,
+            account_metadata=data.metadata or {}
+        )
+        db.add(account)
+        try:
+            await db.commit()
+            break
+        except IntegrityError as e:
+            await db.rollback()
+            if "account_number" not in _violated_constraint(e) or attempt == ACCOUNT_NUMBER_ATTEMPTS - 1:
+                raise
+            # issued twice (the counter was reset); the rest of that block
+            # is suspect too
+            logger_accounts.warning(f"[accounts/create] Account number {account_number} already taken, retrying")
+            account_numbers.discard_block()
+    await db.refresh(account)
     return AccountResponse(
         id=str(account.id),
         name=account.account_name,
@@ -2768,94 +2872,56 @@ async def create_account(
     )
 
 @app.get("/api/v1/accounts", response_model=List[AccountResponse])
-async def get_all_accounts(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    accounts = db.query(models.Account).filter(
-        models.Account.user_id == user_id,
-        models.Account.status == "ACTIVE"
-    ).all()
-    result = [
-        AccountResponse(
-            id=str(account.id),
-            name=account.account_name,
-            currency=account.currency,
-            status=account.status,
-            balances=account.balances or {},
-            metadata=account.account_metadata
+async def get_all_accounts(user_id: str = Depends(get_authenticated_user_id), db: AsyncSession = Depends(get_read_db)):
+    accounts = (await db.execute(
+        select(models.Account).where(
+            models.Account.user_id == user_id,
+            models.Account.status == "ACTIVE"
         )
-        for account in accounts
-    ]
-    return result
+    )).scalars().all()
+    return await _account_responses(db, accounts)
 
 @app.delete("/api/v1/accounts/{account_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_account(
     account_id: str,
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    user_id: str = Depends(get_authenticated_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    account = db.query(models.Account).filter(
-        models.Account.id == account_id,
-        models.Account.user_id == user_id
-    ).first()
+    account = (await db.execute(
+        select(models.Account).where(
+            models.Account.id == _int_id(account_id, "Account not found"),
+            models.Account.user_id == user_id
+        )
+    )).scalars().first()
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
 
     account.status = "DELETED"
-    db.commit()
+    await db.commit()
     # Return all accounts for the user after deletion
-    accounts = db.query(models.Account).filter(
-        models.Account.user_id == user_id,
-        models.Account.status == "ACTIVE"
-    ).all()
-    result = [
-        AccountResponse(
-            id=str(account.id),
-            name=account.account_name,
-            currency=account.currency,
-            status=account.status,
-            balances=account.balances or {},
-            metadata=account.account_metadata
+    accounts = (await db.execute(
+        select(models.Account).where(
+            models.Account.user_id == user_id,
+            models.Account.status == "ACTIVE"
         )
-        for account in accounts
-    ]
-    return result
+    )).scalars().all()
+    return await _account_responses(db, accounts)
 
 @app.put("/api/v1/accounts/{account_id}", response_model=AccountResponse)
 async def update_account(
     account_id: str,
     data: CreateAccountRequest,
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    user_id: str = Depends(get_authenticated_user_id),
+    db: AsyncSession = Depends(get_async_db)
     ):
     
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    account = db.query(models.Account).filter(
-        models.Account.id == account_id,
-        models.Account.user_id == user_id,
-        models.Account.status == "ACTIVE"
-    ).first()
+    account = (await db.execute(
+        select(models.Account).where(
+            models.Account.id == _int_id(account_id, "Account not found"),
+            models.Account.user_id == user_id,
+            models.Account.status == "ACTIVE"
+        )
+    )).scalars().first()
     
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
@@ -2863,141 +2929,154 @@ async def update_account(
     account.account_name = data.name
     account.currency = data.currency
     # account.account_metadata = data.metadata or {}
-    db.commit()
-    db.refresh(account)
+    await db.commit()
+    await db.refresh(account)
     
-    return AccountResponse(
-        id=str(account.id),
-        name=account.account_name,
-        currency=account.currency,
-        status=account.status,
-        balances=account.balances or {},
-        metadata=account.account_metadata
-    )
+    return (await _account_responses(db, [account]))[0]
 
 
 @app.get("/api/v1/kyc", response_model=List[KycEntryResponse])
-async def get_all_kyc_entries(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
+async def get_all_kyc_entries(user_id: str = Depends(get_authenticated_user_id), db: AsyncSession = Depends(get_read_db)):
     logger_accounts.info(f"[kyc/list] Loading KYC entries for user_id={user_id}")
-    entries = (
-        db.query(models.UserKyc)
-        .filter(models.UserKyc.user_id == user_id, models.UserKyc.hidden == False)
+    entries = (await db.execute(
+        select(models.UserKyc)
+        .where(models.UserKyc.user_id == user_id, models.UserKyc.hidden == False)
         .order_by(models.UserKyc.created_at.desc())
-        .all()
-    )
-    return [_serialize_kyc_entry(kyc, db) for kyc in entries]
+    )).scalars().all()
+    ubo_counts = await _load_kyc_ubo_counts(db, [kyc.id for kyc in entries])
+    return [_serialize_kyc_entry(kyc, ubo_counts.get(kyc.id, (0, 0))) for kyc in entries]
 
 
 @app.get("/api/v1/kyc/{reference_id}", response_model=KycDetailResponse)
 async def get_kyc_entry_by_reference(
     reference_id: str,
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user_id = claims["sub"]
 
-    kyc = db.query(models.UserKyc).filter(models.UserKyc.reference_id == reference_id).first()
+    kyc = (await db.execute(
+        select(models.UserKyc)
+        .where(models.UserKyc.reference_id == reference_id)
+        .options(selectinload(models.UserKyc.ubos), selectinload(models.UserKyc.document_reviews))
+    )).scalars().first()
     if not kyc:
         raise HTTPException(status_code=404, detail="KYC entry not found")
 
-    is_admin = (user.role or "").lower() == "admin"
+    is_admin = (claims.get("role") or "").lower() == "admin"
     if not is_admin and kyc.user_id != user_id:
         raise HTTPException(status_code=403, detail="Forbidden")
 
     logger_accounts.info(f"[kyc/detail] Returning KYC detail reference_id={reference_id} for user_id={user_id}")
-    return _serialize_kyc_detail(kyc, db)
+    return _serialize_kyc_detail(kyc)
 
 
 @app.get("/api/v1/admin/kyc", response_model=AdminKycListResponse)
 async def get_admin_kyc_entries(
+    background_tasks: BackgroundTasks,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    include_total: bool = Query(True),
     persona_status: Optional[str] = Query(None),
     email: Optional[str] = Query(None),
     reference_id: Optional[str] = Query(None),
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
+    user_id: str = Depends(require_admin),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    if (user.role or "").lower() != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-
-    query = db.query(models.UserKyc).filter(models.UserKyc.hidden == False)
+    """
+    Newest first, paged on (created_at, id): pass `next_cursor` back as
+    `cursor`. `page` without a cursor still works (OFFSET) for old clients.
+    `total` is cached for about a minute; `include_total=false` skips it.
+    """
+    query = select(models.UserKyc).where(models.UserKyc.hidden == False)
     if persona_status:
-        query = query.filter(models.UserKyc.persona_status == persona_status)
+        query = query.where(models.UserKyc.persona_status == persona_status)
     if email:
-        query = query.filter(models.UserKyc.email.ilike(f"%{email}%"))
+        query = query.where(models.UserKyc.email.ilike(f"%{email}%"))
     if reference_id:
-        query = query.filter(models.UserKyc.reference_id.ilike(f"%{reference_id}%"))
-
-    total = query.count()
-    entries = (
-        query.order_by(models.UserKyc.created_at.desc())
-        .offset((page - 1) * page_size)
-        .limit(page_size)
-        .all()
-    )
+        query = query.where(models.UserKyc.reference_id.ilike(f"%{reference_id}%"))
+
+    total = None
+    if include_total:
+        filters_key = hashlib.sha256(
+            json.dumps([persona_status, email, reference_id]).encode()
+        ).hexdigest()[:16]
+        total = await cached_count(db, query, f"count_cache:admin_kyc:{filters_key}", background_tasks)
+
+    page_query = query
+    after = decode_cursor(cursor, 2)
+    if after:
+        after_created_at, after_id = after
+        page_query = page_query.where(or_(
+            models.UserKyc.created_at < after_created_at,
+            and_(models.UserKyc.created_at == after_created_at, models.UserKyc.id < after_id),
+        ))
+    elif page > 1:
+        page_query = page_query.offset((page - 1) * page_size)
+    entries = (await db.execute(
+        page_query.order_by(models.UserKyc.created_at.desc(), models.UserKyc.id.desc()).limit(page_size + 1)
+    )).scalars().all()
+
+    has_next = len(entries) > page_size
+    entries = entries[:page_size]
+    next_cursor = encode_cursor([entries[-1].created_at, entries[-1].id]) if has_next else None
 
     logger_accounts.info(
-        f"[kyc/admin-list] user_id={user_id}, total={total}, page={page}, page_size={page_size}, returned={len(entries)}"
+        f"[kyc/admin-list] user_id={user_id}, total={total}, page={page}, page_size={page_size}, "
+        f"cursor={'yes' if cursor else 'no'}, returned={len(entries)}"
     )
+    ubo_counts = await _load_kyc_ubo_counts(db, [kyc.id for kyc in entries])
     return AdminKycListResponse(
-        items=[_serialize_kyc_entry(kyc, db) for kyc in entries],
+        items=[_serialize_kyc_entry(kyc, ubo_counts.get(kyc.id, (0, 0))) for kyc in entries],
         total=total,
         page=page,
         page_size=page_size,
-        has_next=(page * page_size) < total,
+        has_next=has_next,
+        next_cursor=next_cursor,
     )
 
 
+@app.get("/api/v1/admin/search", response_model=AdminKycSearchResponse)
+async def search_admin_kyc(
+    q: str = Query(..., min_length=kyc_search.MIN_QUERY_LENGTH, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    user_id: str = Depends(require_admin),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Substring search over KYC reference, email, name, company and UBO names/emails."""
+    q = q.strip()
+    if len(q) < kyc_search.MIN_QUERY_LENGTH:
+        raise HTTPException(
+            status_code=400, detail=f"Search query must be at least {kyc_search.MIN_QUERY_LENGTH} characters"
+        )
+
+    kyc_ids = await kyc_search.search_kyc_ids(db, q, limit)
+    entries = {}
+    if kyc_ids:
+        entries = {
+            kyc.id: kyc
+            for kyc in (await db.execute(
+                select(models.UserKyc).where(models.UserKyc.id.in_(kyc_ids))
+            )).scalars()
+        }
+    ubo_counts = await _load_kyc_ubo_counts(db, kyc_ids)
+    items = [
+        _serialize_kyc_entry(entries[kyc_id], ubo_counts.get(kyc_id, (0, 0)))
+        for kyc_id in kyc_ids
+        if kyc_id in entries
+    ]
+
+    logger_accounts.info(f"[kyc/admin-search] user_id={user_id}, q_len={len(q)}, returned={len(items)}")
+    return AdminKycSearchResponse(items=items, count=len(items))
+
+
 @app.post("/api/v1/admin/kyc/send-to-compliance", response_model=KycComplianceSendResponse)
 async def send_admin_kyc_to_compliance(
     data: KycComplianceSendRequest,
-    token: str = Depends(oauth2_scheme),
+    user_id: str = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    if (user.role or "").lower() != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-
     logger_accounts.info(
         f"[kyc/admin-send-compliance] Triggered by user_id={user_id} for reference_id={data.reference_id}"
     )
@@ -3021,23 +3100,9 @@ async def send_admin_kyc_to_compliance(
 async def review_kyc_document(
     reference_id: str,
     data: KycDocumentReviewRequest,
-    token: str = Depends(oauth2_scheme),
+    user_id: str = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    if (user.role or "").lower() != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-
     kyc = db.query(models.UserKyc).filter(models.UserKyc.reference_id == reference_id).first()
     if not kyc:
         raise HTTPException(status_code=404, detail="KYC entry not found")
@@ -3130,67 +3195,47 @@ async def review_kyc_document(
 @app.get("/api/v1/admin/kyc/{reference_id}/documents/review-status", response_model=KycDocumentReviewListResponse)
 async def get_kyc_document_review_status(
     reference_id: str,
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
+    user_id: str = Depends(require_admin),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    if (user.role or "").lower() != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-
-    kyc = db.query(models.UserKyc).filter(models.UserKyc.reference_id == reference_id).first()
+    kyc = (await db.execute(
+        select(models.UserKyc)
+        .where(models.UserKyc.reference_id == reference_id)
+        .options(selectinload(models.UserKyc.document_reviews))
+    )).scalars().first()
     if not kyc:
         raise HTTPException(status_code=404, detail="KYC entry not found")
 
     return KycDocumentReviewListResponse(
         reference_id=reference_id,
-        review_statuses=_build_kyc_document_review_statuses(kyc, db),
+        review_statuses=_build_kyc_document_review_statuses(kyc),
     )
 
 
 @app.post("/api/v1/payments", response_model=PaymentResponse, status_code=status.HTTP_201_CREATED)
 async def create_payment(
     data: CreatePaymentRequest,
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    user_id: str = Depends(get_authenticated_user_id),
+    db: AsyncSession = Depends(get_async_db)
     ):
     
     BASE_URL="https://dashboard.vaulta.digital"
     logger_payments.info(f"[create_payment] Payment request received: {data.amount} {data.currency}")
-    
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        logger_payments.info(f"[create_payment] User authenticated: {user_id}")
-        
-        if not user_id:
-            logger_payments.warning(f"[create_payment] Invalid token: user_id missing")
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-    except jwt.PyJWTError as e:
-        logger_payments.error(f"[create_payment] JWT decode error: {e}")
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    source_account = db.query(models.Account).filter(
-        models.Account.id == data.source_account_id,
-        models.Account.user_id == user_id,
-        models.Account.status == "ACTIVE"
-    ).first()
+    logger_payments.info(f"[create_payment] User authenticated: {user_id}")
+
+    source_account = (await db.execute(
+        select(models.Account).where(
+            models.Account.id == _int_id(data.source_account_id, "Source account not found"),
+            models.Account.user_id == user_id,
+            models.Account.status == "ACTIVE"
+        )
+    )).scalars().first()
     
     if not source_account:
         logger_payments.warning(f"[create_payment] Source account not found: {data.source_account_id}")
         raise HTTPException(status_code=404, detail="Source account not found")
 
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await authstore.get_user_by_id_async(user_id)
     if not user:
         logger_payments.error(f"[create_payment] User not found: {user_id}")
         raise HTTPException(status_code=404, detail="User not found")
@@ -3218,12 +3263,13 @@ async def create_payment(
         client_reference=data.client_reference,
         status="pending",
         fx_data=None,  # No FX for same currency
-        fees_data=json.dumps([network_fee.model_dump()])
+        fees_data=[network_fee.model_dump()]
     )
     
     db.add(payment)
-    db.commit()
-    db.refresh(payment)
+    await db.commit()
+    await db.refresh(payment)
+    await dashboard.payment_created(user_id)
     
     logger_payments.info(f"[create_payment] Payment record created and saved")
     
@@ -3293,42 +3339,19 @@ async def create_payment(
 @app.get("/api/v1/payments/{payment_id}", response_model=PaymentResponse)
 async def get_payment(
     payment_id: str,
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    user_id: str = Depends(get_authenticated_user_id),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    payment = db.query(models.Payment).filter(
-        models.Payment.id == payment_id,
-        models.Payment.user_id == user_id
-    ).first()
+    payment = (await db.execute(
+        select(models.Payment).where(
+            models.Payment.id == payment_id,
+            models.Payment.user_id == user_id
+        )
+    )).scalars().first()
     if not payment:
         raise HTTPException(status_code=404, detail="Payment not found")
 
-    # Parse fees_data from JSON
-    fees = []
-    if payment.fees_data:
-        try:
-            fees_list = json.loads(payment.fees_data)
-            fees = [PaymentFee(**fee) for fee in fees_list]
-        except Exception:
-            fees = []
-
-    return PaymentResponse(
-        id=payment.id,
-        status=payment.status,
-        amount=payment.amount,
-        currency=payment.currency,
-        fx=payment.fx_data if payment.fx_data else None,
-        fees=fees,
-        created_at=payment.created_at.isoformat() + "Z"
-    )
+    return _payment_response(payment)
 
 class UpdateTransactionRequest(BaseModel):
     amount: Optional[float] = None
@@ -3337,132 +3360,261 @@ class UpdateTransactionRequest(BaseModel):
     status: Optional[str] = None
 
 class ApprovePaymentRequest(BaseModel):
-    admin_id: str
+    # Ignored; the approving admin is taken from the token
+    admin_id: Optional[str] = None
     approved: bool
     reason: Optional[str] = None
 
+PAYMENT_DECISIONS_MAX_ITEMS = 100
+
+async def _decide_payments(
+    db: AsyncSession,
+    decisions: Dict[str, bool],
+    admin_id: str,
+    *,
+    skip_locked: bool,
+) -> Tuple[Dict[str, str], List[Tuple[models.Payment, Optional[models.Transaction]]]]:
+    """
+    Approve or reject pending payments ({payment_id: approved}) in the
+    caller's DB transaction; does not commit.
+
+    Payments are claimed with SELECT ... FOR UPDATE, skipping rows another
+    admin holds when skip_locked is set, and the status change is itself
+    conditional on status = 'pending', so a payment is decided at most once
+    even where row locks are not available. Returns an outcome per id
+    (approved, rejected, not_found, not_pending, locked or
+    reference_conflict) and the (payment, transaction) pairs that were
+    decided.
+    """
+    ids = list(decisions)
+    claimed = (await db.execute(
+        select(models.Payment)
+        .where(models.Payment.id.in_(ids), models.Payment.status == "pending")
+        .order_by(models.Payment.id)
+        .with_for_update(skip_locked=skip_locked)
+    )).scalars().all()
+
+    outcomes: Dict[str, str] = {}
+    unclaimed = [payment_id for payment_id in ids if payment_id not in {p.id for p in claimed}]
+    if unclaimed:
+        statuses = dict((await db.execute(
+            select(models.Payment.id, models.Payment.status).where(models.Payment.id.in_(unclaimed))
+        )).all())
+        for payment_id in unclaimed:
+            if payment_id not in statuses:
+                outcomes[payment_id] = "not_found"
+            elif statuses[payment_id] == "pending":
+                # held by another admin's batch right now
+                outcomes[payment_id] = "locked"
+            else:
+                outcomes[payment_id] = "not_pending"
+
+    now = transaction_partitions.utc_now()
+    decided_ids = set()
+    rejected = [p.id for p in claimed if not decisions[p.id]]
+    if rejected:
+        decided_ids.update((await db.execute(
+            update(models.Payment)
+            .where(models.Payment.id.in_(rejected), models.Payment.status == "pending")
+            .values(status="rejected", admin_approved_by=admin_id, admin_approved_at=now)
+            .returning(models.Payment.id)
+        )).scalars())
+        for payment_id in rejected:
+            outcomes[payment_id] = "rejected" if payment_id in decided_ids else "not_pending"
+
+    decided = [p for p in claimed if p.id in decided_ids]
+
+    # An approval writes a transaction under the payment's client_reference,
+    # which may already be taken (transaction_references): each one gets its
+    # own savepoint, so a conflict leaves that payment pending and the rest
+    # of the batch goes through.
+    transactions: Dict[str, models.Transaction] = {}
+    for payment in [p for p in claimed if decisions[p.id]]:
+        payment_id = payment.id  # the payment is expired if its savepoint rolls back
+        transaction = models.Transaction(
+            amount=ledger.to_minor_units(payment.amount),  # Convert to cents
+            currency=payment.currency,
+            user_id=payment.user_id,
+            transaction_type="payment",
+            provider="stablecoin",
+            status="completed",
+            reference=payment.client_reference,
+            description=payment.description,
+            created_at=now,
+        )
+        try:
+            async with db.begin_nested():
+                if (await db.execute(
+                    update(models.Payment)
+                    .where(models.Payment.id == payment_id, models.Payment.status == "pending")
+                    .values(status="approved", admin_approved_by=admin_id, admin_approved_at=now)
+                    .returning(models.Payment.id)
+                )).scalar_one_or_none() is None:
+                    outcomes[payment_id] = "not_pending"
+                    continue
+                db.add(transaction)
+                await db.flush()  # Get the transaction ID
+        except IntegrityError as e:
+            if _violated_constraint(e) not in _REFERENCE_CONSTRAINTS:
+                raise
+            logger_payments.warning(f"[approve_payments] {payment_id} not approved, reference conflict: {e.orig}")
+            outcomes[payment_id] = "reference_conflict"
+            continue
+        payment.transaction_id = transaction.id
+        transactions[payment_id] = transaction
+        decided.append(payment)
+        outcomes[payment_id] = "approved"
+
+    if transactions:
+        # Debit the source accounts in the same DB transaction
+        await ledger.post_entries(db, [
+            (ledger.payment_postings(p), transactions[p.id].id, p.id) for p in decided if p.id in transactions
+        ])
+
+    return outcomes, [(p, transactions.get(p.id)) for p in decided]
+
 @app.post("/api/v1/payments/{payment_id}/approve", response_model=PaymentResponse)
 async def approve_payment(
     payment_id: str,
     data: ApprovePaymentRequest,
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    admin_user_id: str = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Admin endpoint to approve or reject a payment.
     When approved, creates a corresponding transaction.
     """
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        admin_user_id = payload.get("sub")
-        if not admin_user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    # TODO: Add admin role check here
-    # if not is_admin(admin_user_id):
-    #     raise HTTPException(status_code=403, detail="Admin access required")
-
-    payment = db.query(models.Payment).filter(models.Payment.id == payment_id).first()
-    if not payment:
+    # Waits for a concurrent decision on the same payment, then sees it
+    outcomes, decided = await _decide_payments(db, {payment_id: data.approved}, admin_user_id, skip_locked=False)
+    if outcomes[payment_id] == "not_found":
         raise HTTPException(status_code=404, detail="Payment not found")
-
-    if payment.status != "pending":
+    if outcomes[payment_id] == "reference_conflict":
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="The payment's client_reference is already used by a transaction")
+    if not decided:
         raise HTTPException(status_code=400, detail="Payment is not in pending status")
 
-    if data.approved:
-        # Create corresponding transaction when payment is approved
-        transaction = models.Transaction(
-            amount=int(float(payment.amount) * 100),  # Convert to cents
-            currency=payment.currency,
-            user_id=payment.user_id,
-            transaction_type="payment",
-            provider="stablecoin",
-            status="completed",
-            reference=payment.client_reference,
-            description=payment.description
-        )
-        db.add(transaction)
-        db.flush()  # Get the transaction ID
+    await db.commit()
+    payment, transaction = decided[0]
+    await db.refresh(payment)
+    await dashboard.payment_decided(payment, transaction)
+    logger_payments.info(f"[approve_payment] {payment_id} {payment.status} by {admin_user_id}")
 
-        # Update payment with transaction reference and approval info
-        payment.transaction_id = transaction.id
-        payment.status = "approved"
-        payment.admin_approved_by = data.admin_id
-        payment.admin_approved_at = datetime.now()
-    else:
-        # Reject the payment
-        payment.status = "rejected"
-        payment.admin_approved_by = data.admin_id
-        payment.admin_approved_at = datetime.now()
+    return _payment_response(payment)
 
-    db.commit()
-    db.refresh(payment)
+class PaymentDecision(BaseModel):
+    payment_id: str
+    approved: bool
 
-    # Parse fees_data from JSON
-    fees = []
-    if payment.fees_data:
-        try:
-            fees_list = json.loads(payment.fees_data)
-            fees = [PaymentFee(**fee) for fee in fees_list]
-        except Exception:
-            fees = []
+class BatchPaymentDecisionRequest(BaseModel):
+    decisions: List[PaymentDecision] = Field(min_length=1, max_length=PAYMENT_DECISIONS_MAX_ITEMS)
 
-    return PaymentResponse(
-        id=payment.id,
-        status=payment.status,
-        amount=payment.amount,
-        currency=payment.currency,
-        fx=payment.fx_data if payment.fx_data else None,
-        fees=fees,
-        created_at=payment.created_at.isoformat() + "Z"
+@app.post("/api/v1/admin/payments/approve")
+async def approve_payments_batch(
+    data: BatchPaymentDecisionRequest,
+    admin_user_id: str = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Approve or reject up to PAYMENT_DECISIONS_MAX_ITEMS payments in one
+    DB transaction. Payments another admin is deciding at the same moment
+    are skipped (outcome "locked") rather than waited on, and an approval
+    whose client_reference is already taken leaves the payment pending
+    (outcome "reference_conflict"); each decision gets its own outcome, in
+    request order. The decisions are recorded against the admin in the
+    token.
+    """
+    decisions: Dict[str, bool] = {}
+    for decision in data.decisions:
+        decisions.setdefault(decision.payment_id, decision.approved)
+
+    outcomes, decided = await _decide_payments(db, decisions, admin_user_id, skip_locked=True)
+    await db.commit()
+    for payment, transaction in decided:
+        await dashboard.payment_decided(payment, transaction)
+
+    transaction_ids = {payment.id: transaction.id for payment, transaction in decided if transaction is not None}
+    results, reported = [], set()
+    for decision in data.decisions:
+        payment_id = decision.payment_id
+        if payment_id in reported:
+            results.append({"payment_id": payment_id, "outcome": "duplicate"})
+            continue
+        reported.add(payment_id)
+        result = {"payment_id": payment_id, "outcome": outcomes[payment_id]}
+        if payment_id in transaction_ids:
+            result["transaction_id"] = str(transaction_ids[payment_id])
+        results.append(result)
+
+    approved = sum(1 for _, transaction in decided if transaction is not None)
+    rejected = len(decided) - approved
+    logger_payments.info(
+        f"[approve_payments_batch] admin={admin_user_id}, received={len(data.decisions)}, "
+        f"approved={approved}, rejected={rejected}, skipped={len(data.decisions) - len(decided)}"
     )
+    return {
+        "approved": approved,
+        "rejected": rejected,
+        "skipped": len(data.decisions) - len(decided),
+        "results": results,
+    }
+
+PENDING_PAYMENTS_MAX_LIMIT = 200
 
 @app.get("/api/v1/admin/payments/pending")
 async def get_pending_payments(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    limit: int = Query(50, ge=1, le=PENDING_PAYMENTS_MAX_LIMIT),
+    cursor: Optional[str] = Query(None),
+    summary: bool = Query(False),
+    admin_user_id: str = Depends(require_admin),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
-    Admin endpoint to get all pending payments for approval.
+    Admin endpoint to get pending payments for approval, oldest first.
+    Pages are keyed on (created_at, id); pass `next_cursor` back as `cursor`.
+    `count` is the whole queue, `page_count` the payments on this page.
+    With `summary=true` only the queue size per currency is returned.
     """
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        admin_user_id = payload.get("sub")
-        if not admin_user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    # TODO: Add admin role check here
-    # if not is_admin(admin_user_id):
-    #     raise HTTPException(status_code=403, detail="Admin access required")
+    if summary:
+        rows = (await db.execute(
+            select(models.Payment.currency, func.count(), func.min(models.Payment.created_at))
+            .where(models.Payment.status == "pending")
+            .group_by(models.Payment.currency)
+        )).all()
+        oldest = min((row[2] for row in rows if row[2] is not None), default=None)
+        return {
+            "count": sum(row[1] for row in rows),
+            "by_currency": {currency: n for currency, n, _ in rows},
+            "oldest_created_at": oldest.isoformat() + "Z" if oldest else None,
+        }
 
-    pending_payments = db.query(models.Payment).filter(
-        models.Payment.status == "pending"
-    ).all()
+    query = (
+        select(models.Payment, models.User.id, models.User.first_name, models.User.last_name, models.User.email)
+        .outerjoin(models.User, models.User.id == models.Payment.user_id)
+        .where(models.Payment.status == "pending")
+    )
+    after = decode_cursor(cursor, 2)
+    if after:
+        after_created_at, after_id = after
+        query = query.where(or_(
+            models.Payment.created_at > after_created_at,
+            and_(models.Payment.created_at == after_created_at, models.Payment.id > after_id),
+        ))
+    rows = (await db.execute(
+        query.order_by(models.Payment.created_at, models.Payment.id).limit(limit + 1)
+    )).all()
+
+    has_next = len(rows) > limit
+    rows = rows[:limit]
 
     result = []
-    for payment in pending_payments:
-        # Get user info
-        user = db.query(models.User).filter(models.User.id == payment.user_id).first()
-        
-        # Parse fees
-        fees = []
-        if payment.fees_data:
-            try:
-                fees_list = json.loads(payment.fees_data)
-                fees = [PaymentFee(**fee) for fee in fees_list]
-            except Exception:
-                fees = []
-
+    for payment, found_user_id, first_name, last_name, email in rows:
         result.append({
             "id": payment.id,
             "user": {
                 "id": payment.user_id,
-                "name": f"{user.first_name} {user.last_name}" if user else "Unknown",
-                "email": user.email if user else "Unknown"
+                "name": f"{first_name} {last_name}" if found_user_id else "Unknown",
+                "email": email if found_user_id else "Unknown"
             },
             "amount": payment.amount,
             "currency": payment.currency,
@@ -3473,43 +3625,53 @@ async def get_pending_payments(
             },
             "description": payment.description,
             "client_reference": payment.client_reference,
-            "fees": [fee.model_dump() for fee in fees],
+            # stored fees were validated as PaymentFee on creation
+            "fees": payment.fees_data or [],
             "created_at": payment.created_at.isoformat() + "Z"
         })
 
-    return {"pending_payments": result, "count": len(result)}
+    next_cursor = None
+    if has_next:
+        last = rows[-1][0]
+        next_cursor = encode_cursor([last.created_at, last.id])
+
+    # the queue size, as before pagination (ix_payments_status_created_at_id)
+    total = (await db.execute(
+        select(func.count()).select_from(models.Payment).where(models.Payment.status == "pending")
+    )).scalar_one() if after or has_next else len(result)
+
+    return {
+        "pending_payments": result,
+        "count": total,
+        "page_count": len(result),
+        "next_cursor": next_cursor,
+        "has_next": has_next,
+    }
 
 @app.get("/api/v1/payments/{payment_id}/transaction")
 async def get_payment_transaction(
     payment_id: str,
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    user_id: str = Depends(get_authenticated_user_id),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get the transaction associated with a payment.
     """
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    payment = db.query(models.Payment).filter(
-        models.Payment.id == payment_id,
-        models.Payment.user_id == user_id
-    ).first()
+    payment = (await db.execute(
+        select(models.Payment).where(
+            models.Payment.id == payment_id,
+            models.Payment.user_id == user_id
+        )
+    )).scalars().first()
     if not payment:
         raise HTTPException(status_code=404, detail="Payment not found")
 
     if not payment.transaction_id:
         return {"message": "No transaction associated with this payment yet"}
 
-    transaction = db.query(models.Transaction).filter(
-        models.Transaction.id == payment.transaction_id
-    ).first()
-    
+    transaction = await db.get(models.Transaction, payment.transaction_id)
+    if not transaction:
+        transaction = await transaction_partitions.get_archived_transaction(db, user_id, payment.transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Associated transaction not found")
 
@@ -3530,17 +3692,9 @@ async def get_payment_transaction(
 async def update_transaction(
     transaction_id: str,
     data: UpdateTransactionRequest,
-    token: str = Depends(oauth2_scheme),
+    user_id: str = Depends(get_authenticated_user_id),
     db: Session = Depends(get_db)
 ):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
     transaction = db.query(models.Transaction).filter(
         models.Transaction.id == transaction_id,
         models.Transaction.user_id == user_id
@@ -3559,6 +3713,7 @@ async def update_transaction(
 
     db.commit()
     db.refresh(transaction)
+    await dashboard.transaction_changed(user_id)
     return {
         "id": str(transaction.id),
         "amount": transaction.amount,
@@ -3572,24 +3727,16 @@ async def update_transaction(
 @app.post("/api/v1/transaction", status_code=status.HTTP_201_CREATED)
 async def create_single_transaction(
     data: CreateTransactionRequest,
-    token: str = Depends(oauth2_scheme),
+    user_id: str = Depends(get_authenticated_user_id),
     db: Session = Depends(get_db)
 ):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
     transaction = models.Transaction(
         user_id=user_id,
         amount=data.amount,
         currency=data.currency,
         type=data.type,
         status=data.status,
-        created_at=datetime.now()
+        created_at=transaction_partitions.utc_now()
     )
     db.add(transaction)
     db.commit()
@@ -3605,10 +3752,145 @@ async def create_single_transaction(
 
 
 
+BULK_TRANSACTIONS_MAX_ROWS = 5000
+BULK_TRANSACTIONS_CHUNK = 1000
+
+# What a duplicate reference violates: its claim in transaction_references
+# (SQLite reports the message), or the unique index on transactions that
+# databases from before the claims still have
+_REFERENCE_CONSTRAINTS = {
+    "transaction_references_pkey",
+    "UNIQUE constraint failed: transaction_references.reference",
+    "ix_transactions_reference",
+    "UNIQUE constraint failed: transactions.reference",
+}
+
+class BulkTransactionItem(BaseModel):
+    amount: int  # minor units, as stored
+    currency: str = Field(min_length=1)
+    type: str = Field(min_length=1)  # e.g. "deposit", "withdrawal"
+    provider: str = "internal"
+    status: str = "pending"
+    reference: Optional[str] = None
+    description: Optional[str] = None
+    created_at: Optional[datetime] = None
+    # Only admins may import rows for someone else
+    user_id: Optional[str] = None
+
+    @field_validator("created_at")
+    @classmethod
+    def _created_at_naive_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        # stored naive, as UTC; an offset would otherwise be dropped (SQLite)
+        # or land the row in the wrong month's partition
+        return transaction_partitions.naive_utc(value) if value is not None else None
+
+class BulkTransactionRequest(BaseModel):
+    # Rows are validated individually so one bad row doesn't reject the batch
+    transactions: List[dict] = Field(min_length=1, max_length=BULK_TRANSACTIONS_MAX_ROWS)
+
+@app.post("/api/v1/transactions/bulk")
+async def create_transactions_bulk(
+    data: BulkTransactionRequest,
+    claims: dict = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Insert up to BULK_TRANSACTIONS_MAX_ROWS transactions in one call.
+    Valid rows are inserted together in a single commit; each row gets a
+    result with its index and either the new id or its validation errors.
+    """
+    user_id = claims["sub"]
+    is_admin = (claims.get("role") or "").lower() == "admin"
+
+    results: List[Optional[dict]] = [None] * len(data.transactions)
+    rows, row_indexes = [], []
+    seen_references = {}
+    for index, raw in enumerate(data.transactions):
+        try:
+            item = BulkTransactionItem.model_validate(raw)
+        except ValidationError as e:
+            errors = [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()]
+            results[index] = {"index": index, "status": "rejected", "errors": errors}
+            continue
+        owner = item.user_id or user_id
+        if owner != user_id and not is_admin:
+            results[index] = {"index": index, "status": "rejected", "errors": ["user_id: admin access required"]}
+            continue
+        if item.reference is not None:
+            if item.reference in seen_references:
+                results[index] = {
+                    "index": index, "status": "rejected",
+                    "errors": [f"reference: duplicate of row {seen_references[item.reference]}"],
+                }
+                continue
+            seen_references[item.reference] = index
+        rows.append({
+            "user_id": owner,
+            "amount": item.amount,
+            "currency": item.currency,
+            "transaction_type": item.type,
+            "provider": item.provider,
+            "status": item.status,
+            "reference": item.reference,
+            "description": item.description,
+            "created_at": item.created_at or transaction_partitions.utc_now(),
+        })
+        row_indexes.append(index)
+
+    # One lookup per chunk for references already claimed, by live or
+    # archived transactions
+    references = list(seen_references)
+    claimed = models.TransactionReference.reference
+    existing = set()
+    for start in range(0, len(references), BULK_TRANSACTIONS_CHUNK):
+        existing.update((await db.execute(
+            select(claimed).where(claimed.in_(references[start:start + BULK_TRANSACTIONS_CHUNK]))
+        )).scalars())
+    if existing:
+        kept_rows, kept_indexes = [], []
+        for row, index in zip(rows, row_indexes):
+            if row["reference"] in existing:
+                results[index] = {"index": index, "status": "rejected", "errors": ["reference: already exists"]}
+            else:
+                kept_rows.append(row)
+                kept_indexes.append(index)
+        rows, row_indexes = kept_rows, kept_indexes
+
+    # executemany with RETURNING (batched into multi-row INSERTs by the
+    # dialect); sort_by_parameter_order keeps ids aligned with the rows
+    stmt = insert(models.Transaction).returning(models.Transaction.id, sort_by_parameter_order=True)
+    inserted = []
+    try:
+        for start in range(0, len(rows), BULK_TRANSACTIONS_CHUNK):
+            chunk = rows[start:start + BULK_TRANSACTIONS_CHUNK]
+            ids = (await db.execute(stmt, chunk)).scalars().all()
+            for index, row, tx_id in zip(row_indexes[start:start + BULK_TRANSACTIONS_CHUNK], chunk, ids):
+                results[index] = {"index": index, "status": "created", "id": str(tx_id)}
+                inserted.append(models.Transaction(id=tx_id, **row))
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        if _violated_constraint(e) not in _REFERENCE_CONSTRAINTS:
+            logger_transactions.error(f"[transactions/bulk] user_id={user_id} insert failed, nothing written: {e.orig}")
+            raise
+        # claimed by another request between the check above and the insert
+        logger_transactions.warning(f"[transactions/bulk] user_id={user_id} reference conflict, nothing written: {e.orig}")
+        raise HTTPException(status_code=409, detail="A reference in the batch was just taken; nothing was written")
+
+    await dashboard.transactions_inserted(inserted)
+
+    created = len(rows)
+    logger_transactions.info(
+        f"[transactions/bulk] user_id={user_id}, received={len(results)}, created={created}, rejected={len(results) - created}"
+    )
+    return {"created": created, "rejected": len(results) - created, "results": results}
+
+
 @app.get("/api/v1/admin/transactions")
-async def get_all_admin_transactions(user_id: str = Depends(get_authenticated_user_id), db: Session = Depends(get_db)):
+async def get_all_admin_transactions(user_id: str = Depends(get_authenticated_user_id), db: Session = Depends(get_read_db_sync)):
     # transactions = db.query(models.Transaction).filter(models.Transaction.user_id == user_id).all()
-    transactions = db.query(models.Transaction).all()
+    transactions = [tx for chunk in transaction_partitions.iter_archived(db) for tx in chunk]
+    transactions += db.query(models.Transaction).all()
     result = [
         {
             "id": str(tx.id),
@@ -3628,15 +3910,7 @@ async def get_all_admin_transactions(user_id: str = Depends(get_authenticated_us
 
 
 @app.get("/api/v1/admin/users")
-async def get_all_users(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
+async def get_all_users(user_id: str = Depends(get_authenticated_user_id), db: Session = Depends(get_read_db_sync)):
     users = db.query(models.User).all()
     result = [
         {
@@ -3651,16 +3925,92 @@ async def get_all_users(token: str = Depends(oauth2_scheme), db: Session = Depen
     return {"data": result, "count": len(result)}
 
 
-@app.get("/api/v1/fx_rates")
-async def get_all_fx_rates(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+EXPORT_TRANSACTION_FIELDS = ["id", "user_id", "amount", "currency", "type", "provider", "status", "reference", "description", "created_at", "updated_at"]
+EXPORT_USER_FIELDS = ["id", "first_name", "last_name", "email", "phone", "role", "verified", "created_at"]
+
+
+def _export_transaction_row(tx: models.Transaction) -> dict:
+    return {
+        "id": str(tx.id),
+        "user_id": tx.user_id,
+        "amount": tx.amount,
+        "currency": tx.currency,
+        "type": tx.transaction_type,
+        "provider": tx.provider,
+        "status": tx.status,
+        "reference": tx.reference,
+        "description": tx.description,
+        "created_at": tx.created_at,
+        "updated_at": tx.updated_at,
+    }
 
+
+def _export_user_row(user: models.User) -> dict:
+    return {
+        "id": str(user.id),
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "email": user.email,
+        "phone": user.phone,
+        "role": user.role,
+        "verified": bool(user.verified),
+        "created_at": user.created_at,
+    }
+
+
+@app.get("/api/v1/admin/transactions/export")
+async def export_admin_transactions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    created_from: Optional[datetime] = Query(None),
+    created_to: Optional[datetime] = Query(None),
+    status: Optional[str] = Query(None),
+    admin_user_id: str = Depends(require_admin),
+):
+    """
+    Stream all transactions matching the filters as NDJSON or CSV. Archived
+    months (transaction_partitions) come first, then the live table.
+    """
+    stmt = select(models.Transaction)
+    if created_from:
+        stmt = stmt.where(models.Transaction.created_at >= created_from)
+    if created_to:
+        stmt = stmt.where(models.Transaction.created_at < created_to)
+    if status:
+        stmt = stmt.where(models.Transaction.status == status)
+    stmt = stmt.order_by(models.Transaction.created_at, models.Transaction.id)
+
+    archived = None
+    if created_from is None or transaction_partitions.naive_utc(created_from) < transaction_partitions.archive_cutoff():
+        archived = lambda db: transaction_partitions.iter_archived(db, created_from, created_to, status)  # noqa: E731
+
+    logger_transactions.info(f"[admin/export] Transactions export ({format}) requested by {admin_user_id}")
+    return streaming_export(stmt, _export_transaction_row, EXPORT_TRANSACTION_FIELDS, format, "transactions", archived)
+
+
+@app.get("/api/v1/admin/users/export")
+async def export_admin_users(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    created_from: Optional[datetime] = Query(None),
+    created_to: Optional[datetime] = Query(None),
+    verified: Optional[bool] = Query(None),
+    admin_user_id: str = Depends(require_admin),
+):
+    """Stream all users matching the filters as NDJSON or CSV."""
+    stmt = select(models.User)
+    if created_from:
+        stmt = stmt.where(models.User.created_at >= created_from)
+    if created_to:
+        stmt = stmt.where(models.User.created_at < created_to)
+    if verified is not None:
+        stmt = stmt.where(models.User.verified == verified)
+    stmt = stmt.order_by(models.User.created_at, models.User.id)
+
+    logger_accounts.info(f"[admin/export] Users export ({format}) requested by {admin_user_id}")
+    return streaming_export(stmt, _export_user_row, EXPORT_USER_FIELDS, format, "users")
+
+
+@app.get("/api/v1/fx_rates")
+async def get_all_fx_rates(user_id: str = Depends(get_authenticated_user_id), db: Session = Depends(get_read_db_sync)):
     fx_rates = db.query(models.FxRates).all()
     result = [
         {
@@ -3694,15 +4044,7 @@ class FxRatesUpdateResponse(BaseModel):
     sell: str
 
 @app.post("/api/v1/fx_rates")
-async def get_all_fx_rates(data:FxRatesUpdateRequest, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
+async def get_all_fx_rates(data:FxRatesUpdateRequest, user_id: str = Depends(get_authenticated_user_id), db: Session = Depends(get_db)):
     fxrates_id = f"pay_{uuid.uuid4().hex[:8].upper()}"
     print("Generated payment ID:", fxrates_id)
     
@@ -3725,18 +4067,10 @@ async def get_all_fx_rates(data:FxRatesUpdateRequest, token: str = Depends(oauth
 async def get_trade_history_route(
     start_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
-    token: str = Depends(oauth2_scheme), 
+    user_id: str = Depends(get_authenticated_user_id), 
     db: Session = Depends(get_db)
     ):
     print("===")
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
     # Assuming you have a TradeHistory model/table
     # Parse start_date and end_date from query parameters
     request: Request = db  # db is actually the Depends(get_db), so get from context
@@ -3762,7 +4096,7 @@ async def get_trade_history_route(
         end_date = None
 
     # Call get_trade_history with date filters if provided
-    trades = get_trade_history(start_date=start_date, end_date=end_date)['trades']
+    trades = (await get_trade_history(start_date=start_date, end_date=end_date))['trades']
     
     print(trades[0])
     result = [
@@ -3788,16 +4122,8 @@ async def get_trade_history_route(
             "total_to_amount": total_to_amount,}
 
 @app.get("/api/v1/ovex/total")
-async def get_trade_total_route(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET", "your_jwt_secret"), algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    trades = get_trade_history()['trades']
+async def get_trade_total_route(user_id: str = Depends(get_authenticated_user_id), db: Session = Depends(get_db)):
+    trades = (await get_trade_history())['trades']
      
     total_from_amount = sum(float(trade['from_amount']) for trade in trades)
     total_to_amount = sum(float(trade['to_amount']) for trade in trades)
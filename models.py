@@ -1,6 +1,9 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Float, Text, UniqueConstraint
+from sqlalchemy import BigInteger, Boolean, Column, FetchedValue, ForeignKey, Index, Integer, LargeBinary, PrimaryKeyConstraint, Sequence, String, DateTime, Float, Text, UniqueConstraint
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
+from json_columns import JSONDocument
     
 class User(Base):
     __tablename__ = "users"
@@ -58,18 +61,83 @@ class Customer(Base):
 class Transaction(Base):
     __tablename__ = "transactions"
 
-    id = Column(Integer, primary_key=True, index=True)
+    # The table's key is (id, created_at), as the partitioning needs (see
+    # migration 3d0a6b28f4c1); ids are unique on their own, so the ORM keys
+    # on id alone. On SQLite the table is keyed on id, the rowid, which
+    # numbers new rows where the sequence does on Postgres.
+    id = Column(Integer, Sequence("transactions_id_seq"), primary_key=True, index=True, server_default=FetchedValue())
     amount = Column(Integer, nullable=False)
     currency = Column(String, nullable=False)
     user_id = Column(String, nullable=False)
     transaction_type = Column(String, nullable=False)  # e.g., 'deposit', 'withdrawal', 'payment'
     provider = Column(String, nullable=False)  # e.g., 'internal', 'external', 'stablecoin'
     status = Column(String, nullable=False)  # e.g., 'pending', 'completed', 'failed'
-    reference = Column(String, unique=True, index=True, nullable=True)
+    # Unique through transaction_references, which also covers archived rows
+    reference = Column(String, index=True, nullable=True)
     description = Column(String, nullable=True)  # Added description field
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())  # partition key
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        # per-user history, newest first (keyset on created_at, id)
+        Index("ix_transactions_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+    __mapper_args__ = {"primary_key": [id]}
+
+
+@compiles(PrimaryKeyConstraint, "sqlite")
+def _sqlite_primary_key(constraint, compiler, **kw):
+    # SQLite only numbers an INTEGER PRIMARY KEY of its own (the rowid);
+    # AUTOINCREMENT so ids of archived (deleted) rows are not handed out again
+    if constraint.table.name == Transaction.__tablename__:
+        return "PRIMARY KEY (id AUTOINCREMENT)"
+    return compiler.visit_primary_key_constraint(constraint, **kw)
+
+
+class TransactionReference(Base):
+    """
+    Every transaction reference in use, live or archived. Rows are written
+    by triggers on transactions (migration 3d0a6b28f4c1 on Postgres,
+    transaction_partitions.install() on SQLite) and kept when their
+    transaction is archived, so a reference is never issued twice.
+    """
+    __tablename__ = "transaction_references"
+
+    reference = Column(String, primary_key=True)
+    transaction_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class TransactionArchive(Base):
+    """
+    Transactions older than the live partitions, moved here by
+    transaction_partitions.py: one row per chunk of a user's month, with the
+    rows themselves as zlib-compressed JSON.
+    """
+    __tablename__ = "transactions_archive"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    user_id = Column(String, nullable=False)
+    month = Column(DateTime(timezone=True), nullable=False)
+    first_id = Column(Integer, nullable=False)
+    last_id = Column(Integer, nullable=False)
+    first_created_at = Column(DateTime(timezone=True), nullable=False)
+    last_created_at = Column(DateTime(timezone=True), nullable=False)
+    row_count = Column(Integer, nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_transactions_archive_user_id_last_created_at", "user_id", "last_created_at"),
+    )
+
+# Postgres source of account number blocks for account_numbers.py: each
+# nextval() reserves the next ACCOUNT_NUMBER_BLOCK_SIZE serials.
+ACCOUNT_NUMBER_BLOCK_SIZE = 100
+account_number_block_seq = Sequence(
+    "account_number_block_seq", start=1, increment=ACCOUNT_NUMBER_BLOCK_SIZE, metadata=Base.metadata
+)
+
 class Account(Base):
     __tablename__ = "accounts"
 
@@ -79,20 +147,25 @@ class Account(Base):
     account_number = Column(String, unique=True, index=True, nullable=False)
     account_type = Column(String, nullable=False, default="current")  # e.g., 'savings', 'checking'
     balance = Column(Integer, default=0, nullable=False) #into cents!  
-    balances = Column(String, nullable=True)  # Store as JSON string representing a dictionary
-    account_metadata = Column(String, nullable=True)
+    balances = Column(JSONDocument, nullable=True)  # dict of currency -> balance
+    account_metadata = Column(JSONDocument, nullable=True)
     currency = Column(String, nullable=False)
     status = Column(String, nullable=False, default="ACTIVE")  # e.g., 'active', 'inactive', 'closed'
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     user = Column(String, ForeignKey("users.id"))
 
+    __table_args__ = (
+        Index("ix_accounts_user_id_status", "user_id", "status"),
+    )
+
 
 class Payment(Base):
     __tablename__ = "payments"
 
     id = Column(String, primary_key=True, index=True)  # pay_01JAZG...
-    transaction_id = Column(Integer, ForeignKey("transactions.id"), nullable=True)  # Link to transaction
+    # Link to transaction; not a foreign key, as the row may be archived
+    transaction_id = Column(Integer, nullable=True)
     user_id = Column(String)
     source_account_id = Column(String)
     amount = Column(String)  # Store as string to maintain precision
@@ -103,14 +176,21 @@ class Payment(Base):
     description = Column(String, nullable=True)
     client_reference = Column(String, nullable=True)
     status = Column(String, default="pending")  # pending, approved, completed, failed
-    fx_data = Column(String, nullable=True)  # Store as JSON string for fx information
-    fees_data = Column(String, nullable=True)  # Store as JSON string for fees
+    fx_data = Column(JSONDocument, nullable=True)  # fx information (dict)
+    fees_data = Column(JSONDocument, nullable=True)  # list of PaymentFee dicts
     admin_approved_by = Column(String, nullable=True)  # Admin who approved the payment
     admin_approved_at = Column(DateTime(timezone=True), nullable=True)  # When approved
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     success_callback_url = Column(String, nullable=True)
     failed_callback_url = Column(String, nullable=True)
+
+    __table_args__ = (
+        # a user's open payment intents, listed alongside their transactions
+        Index("ix_payments_user_id_status_created_at_id", "user_id", "status", "created_at", "id"),
+        # the admin approval queue (status = 'pending', oldest first)
+        Index("ix_payments_status_created_at_id", "status", "created_at", "id"),
+    )
     
 class FxRates(Base):
     __tablename__ = "fx_rates"
@@ -150,10 +230,17 @@ class UserKyc(Base):
     hidden = Column(Boolean, nullable=False, server_default="false", default=False)
     pep_is_pep = Column(Boolean, nullable=True, default=False)
     pep_affiliation = Column(String, nullable=True)
-    basic_info_payload = Column(Text, nullable=True)
+    basic_info_payload = Column(JSONDocument, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    ubos = relationship("UserKycUbo", back_populates="kyc", order_by="UserKycUbo.id")
+    document_reviews = relationship("UserKycDocumentReview", back_populates="kyc")
+
+    __table_args__ = (
+        Index("ix_user_kyc_hidden_created_at", "hidden", "created_at"),
+    )
+
 
 class UserKycUbo(Base):
     __tablename__ = "user_kyc_ubos"
@@ -171,6 +258,12 @@ class UserKycUbo(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    kyc = relationship("UserKyc", back_populates="ubos")
+
+    __table_args__ = (
+        Index("ix_user_kyc_ubos_kyc_id_email", "kyc_id", "email"),
+    )
+
 
 class UserKycDocumentReview(Base):
     __tablename__ = "user_kyc_document_reviews"
@@ -185,7 +278,39 @@ class UserKycDocumentReview(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    kyc = relationship("UserKyc", back_populates="document_reviews")
+
     __table_args__ = (
         UniqueConstraint("kyc_id", "document_field", name="uq_kyc_document_review_kyc_field"),
     )
 
+
+
+class LedgerPosting(Base):
+    """One leg of a double-entry journal entry; rows are never updated or deleted."""
+    __tablename__ = "ledger_postings"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    entry_id = Column(String, nullable=False, index=True)  # groups the legs of one entry
+    # str(Account.id) for customer accounts, or a system account such as
+    # "external:stablecoin:solana" / "fees:network"
+    account_id = Column(String, nullable=False)
+    currency = Column(String, nullable=False)
+    amount = Column(BigInteger, nullable=False)  # minor units; + credit, - debit
+    transaction_id = Column(Integer, nullable=True)  # no FK: the row may be archived
+    payment_id = Column(String, ForeignKey("payments.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_ledger_postings_account_id_currency_id", "account_id", "currency", "id"),
+    )
+
+
+class AccountBalance(Base):
+    """Running sum of LedgerPosting.amount per (account_id, currency), kept by ledger.py."""
+    __tablename__ = "account_balances"
+
+    account_id = Column(String, primary_key=True)
+    currency = Column(String, primary_key=True)
+    balance = Column(BigInteger, nullable=False, default=0)  # minor units
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
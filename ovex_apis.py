@@ -4,7 +4,7 @@ import hmac
 import json
 import os
 from dotenv import load_dotenv
-import requests
+from http_clients import get_http_client
 from variables import OVEX_BASE_URL
 import time
 
@@ -27,7 +27,7 @@ def auth_headers(method: str, path: str, body: str = ""):
         headers["X-SIGNATURE"] = signature
     return headers
 
-def place_order(data):
+async def place_order(data):
     # data = request.get_json(force=True)
     quote_id = data.get('quote_id')
     if not quote_id:
@@ -35,8 +35,9 @@ def place_order(data):
 
     path = f"/orders"
     url = OVEX_BASE_URL + path
-    payload = {"quote_id": quote_id}
-    res = requests.post(url, json=payload, headers=auth_headers("POST", path, body=requests.utils.json.dumps(payload)))
+    # sent exactly as signed
+    body = json.dumps({"quote_id": quote_id})
+    res = await get_http_client("ovex").post(url, content=body, headers=auth_headers("POST", path, body=body))
 
     if res.status_code >= 300:
         return (res.text, res.status_code)
@@ -47,7 +48,7 @@ def place_order(data):
         "status": r.get("status"),
     }
     
-def create_quote(data):
+async def create_quote(data):
     pair = data.get('pair')           # e.g. "BTC-ZAR"
     side = data.get('side')           # "buy" | "sell"
     amount_crypto = data.get('amount_crypto')
@@ -74,7 +75,7 @@ def create_quote(data):
         "prefunded": str(prefunded)
     }
 
-    res = requests.get(url, params=params, headers=auth_headers("GET", path))
+    res = await get_http_client("ovex").get(url, params=params, headers=auth_headers("GET", path))
 
     if res.status_code >= 300:
         return (res.text, res.status_code)
@@ -91,10 +92,10 @@ def create_quote(data):
         "expires_at": r.get("expires_at") or r.get("expiry")
     }
     
-def get_markets():
+async def get_markets():
     path = "/markets"
     url = f"{OVEX_BASE_URL}{path}"
-    res = requests.get(url, headers=auth_headers("GET", path))
+    res = await get_http_client("ovex").get(url, headers=auth_headers("GET", path))
     if res.status_code >= 300:
         return (res.text, res.status_code)
     return res.json()
@@ -102,7 +103,7 @@ def get_markets():
 def get_order_status(order_id):
     pass
 
-def get_trade_history(start_date, end_date):
+async def get_trade_history(start_date=None, end_date=None):
     path = "/trades/history"
     print(path)
     
@@ -124,7 +125,7 @@ def get_trade_history(start_date, end_date):
     print(f"Using params: {params}")
     
     print(f"Using headers: {headers}")
-    res = requests.get(url, headers=headers, params=params)
+    res = await get_http_client("ovex").get(url, headers=headers, params=params)
     
     print(f"Response status code: {res.status_code}")
     if res.status_code >= 300:
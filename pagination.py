@@ -0,0 +1,104 @@
+import base64
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, List, Optional
+
+from fastapi import BackgroundTasks, HTTPException
+from redis.exceptions import RedisError
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncReadSessionLocal
+from redis_client import get_async_redis
+
+logger = logging.getLogger("vaulta.pagination")
+
+# Cached totals are served for up to COUNT_CACHE_TTL seconds. Once a value
+# is older than COUNT_REFRESH_AFTER, the next request schedules a recount in
+# the background and still gets the cached number.
+COUNT_CACHE_TTL = 3600
+COUNT_REFRESH_AFTER = 60
+COUNT_REFRESH_LOCK_TTL = 30
+
+
+# Keyset cursors are the sort-key values of the last row on a page, as a
+# JSON list in URL-safe base64. They are opaque to clients; datetimes are
+# tagged so they round-trip.
+def encode_cursor(values: List[Any]) -> str:
+    payload = [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[List[Any]]:
+    """Return the cursor's values, or None for the first page; 400 if malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != size:
+            raise ValueError("unexpected cursor shape")
+        return [datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v for v in payload]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def _count(db: AsyncSession, stmt) -> int:
+    return (await db.execute(
+        select(func.count()).select_from(stmt.order_by(None).subquery())
+    )).scalar_one()
+
+
+async def _store_count(cache_key: str, total: int) -> None:
+    await get_async_redis().set(
+        cache_key, json.dumps({"total": total, "at": time.time()}), ex=COUNT_CACHE_TTL
+    )
+
+
+async def _refresh_count(stmt, cache_key: str) -> None:
+    try:
+        async with AsyncReadSessionLocal() as db:
+            total = await _count(db, stmt)
+        await _store_count(cache_key, total)
+    except Exception as e:
+        logger.warning(f"[pagination] Background count refresh failed for {cache_key}: {e}")
+    finally:
+        try:
+            await get_async_redis().delete(f"{cache_key}:refreshing")
+        except RedisError:
+            pass
+
+
+async def cached_count(db: AsyncSession, stmt, cache_key: str, background_tasks: BackgroundTasks) -> int:
+    """
+    Row count for `stmt`, served from Redis and refreshed in the background.
+
+    Only a cold cache (or Redis being down) counts inline; otherwise the
+    total may lag writes by about COUNT_REFRESH_AFTER seconds.
+    """
+    try:
+        cached = await get_async_redis().get(cache_key)
+    except RedisError as e:
+        logger.warning(f"[pagination] Count cache unavailable, counting inline: {e}")
+        return await _count(db, stmt)
+
+    if cached is None:
+        total = await _count(db, stmt)
+        try:
+            await _store_count(cache_key, total)
+        except RedisError:
+            pass
+        return total
+
+    entry = json.loads(cached)
+    if time.time() - entry["at"] > COUNT_REFRESH_AFTER:
+        try:
+            # one refresher per key at a time
+            if await get_async_redis().set(f"{cache_key}:refreshing", 1, nx=True, ex=COUNT_REFRESH_LOCK_TTL):
+                background_tasks.add_task(_refresh_count, stmt, cache_key)
+        except RedisError:
+            pass
+    return entry["total"]
@@ -1,12 +1,71 @@
+import asyncio
 import os
 from dotenv import load_dotenv
 import redis
+from redis import asyncio as aioredis
 
-load_dotenv() 
+load_dotenv()
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "100"))
 
+# Synchronous client, kept for scripts and sync code paths.
 r = redis.Redis.from_url(
     REDIS_URL,
     decode_responses=True,   # get strings, not bytes
-)
\ No newline at end of file
+)
+
+# Asyncio client for request handlers. The pool is created in the app
+# lifespan via init_async_redis(); get_async_redis() falls back to creating
+# it lazily so scripts and tests don't need the lifespan to run.
+_async_pool: aioredis.ConnectionPool | None = None
+_async_client: aioredis.Redis | None = None
+
+
+def init_async_redis() -> aioredis.Redis:
+    global _async_pool, _async_client
+    if _async_client is None:
+        _async_pool = aioredis.ConnectionPool.from_url(
+            REDIS_URL,
+            decode_responses=True,
+            max_connections=REDIS_MAX_CONNECTIONS,
+        )
+        _async_client = aioredis.Redis(connection_pool=_async_pool)
+    return _async_client
+
+
+def get_async_redis() -> aioredis.Redis:
+    return _async_client or init_async_redis()
+
+
+# Redis work started from sync code that runs on the event loop (SQLAlchemy
+# commit hooks fired by an AsyncSession or a sync Session used inside an
+# async handler) is spawned as a task instead of blocking the loop. Tasks are
+# referenced here until done and awaited on shutdown.
+_background_tasks: set = set()
+
+
+def running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def spawn(coro) -> asyncio.Task:
+    task = asyncio.get_running_loop().create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def close_async_redis() -> None:
+    global _async_pool, _async_client
+    if _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+    if _async_client is not None:
+        await _async_client.aclose()
+    if _async_pool is not None:
+        await _async_pool.disconnect()
+    _async_pool = None
+    _async_client = None
@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from typing import Optional
+
+import redis
+
+from redis_client import get_async_redis
+
+logger = logging.getLogger("vaulta.auth")
+
+# Revoked token ids (the JWT `jti`) are kept in a sorted set scored by the
+# token's `exp`, so entries can be pruned once the token would have expired
+# anyway, and appended to a stream that every worker tails. Each worker folds
+# the stream into a local Bloom filter: a token whose jti is not in the
+# filter is definitely not revoked and is accepted without a network call;
+# only possible matches are confirmed against the sorted set.
+REVOKED_SET_KEY = "revoked_jtis"
+REVOKED_STREAM_KEY = "revoked_jtis:stream"
+STREAM_MAXLEN = 100_000
+
+BLOOM_CAPACITY = 100_000
+BLOOM_ERROR_RATE = 0.001
+# Bloom filters can't forget, so the local copy is rebuilt from the (pruned)
+# sorted set periodically.
+REBUILD_INTERVAL = 60 * 60
+STREAM_BLOCK_MS = 5_000
+
+
+class BloomFilter:
+    def __init__(self, capacity: int = BLOOM_CAPACITY, error_rate: float = BLOOM_ERROR_RATE):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+_bloom = BloomFilter()
+# Only trust a negative answer from the filter while the stream is being
+# followed; otherwise (no lifespan, Redis hiccup) every check goes to Redis.
+_synced = False
+_last_id = "0-0"
+_task: Optional[asyncio.Task] = None
+
+
+async def _rebuild() -> None:
+    global _bloom, _last_id, _synced
+    ar = get_async_redis()
+    now = time.time()
+
+    # Read the stream position first: anything revoked while the set is
+    # being loaded is then replayed from the stream (adding twice is harmless).
+    latest = await ar.xrevrange(REVOKED_STREAM_KEY, count=1)
+    last_id = latest[0][0] if latest else "0-0"
+
+    await ar.zremrangebyscore(REVOKED_SET_KEY, "-inf", now)
+    bloom = BloomFilter()
+    for jti in await ar.zrangebyscore(REVOKED_SET_KEY, now, "+inf"):
+        bloom.add(jti)
+
+    _bloom, _last_id, _synced = bloom, last_id, True
+    logger.info(f"[revocation] Bloom filter rebuilt at stream id {last_id}")
+
+
+async def _follow_stream() -> None:
+    global _last_id, _synced
+    ar = get_async_redis()
+    next_rebuild = 0.0
+    while True:
+        try:
+            if not _synced or time.time() >= next_rebuild:
+                await _rebuild()
+                next_rebuild = time.time() + REBUILD_INTERVAL
+
+            entries = await ar.xread({REVOKED_STREAM_KEY: _last_id}, block=STREAM_BLOCK_MS, count=1_000)
+            for _stream, messages in entries or ():
+                for message_id, fields in messages:
+                    _bloom.add(fields["jti"])
+                    _last_id = message_id
+        except asyncio.CancelledError:
+            raise
+        except redis.RedisError as e:
+            _synced = False
+            logger.warning(f"[revocation] Stream sync failed, checking Redis directly until resynced: {e}")
+            await asyncio.sleep(1)
+
+
+async def start() -> None:
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_follow_stream())
+
+
+async def stop() -> None:
+    global _task, _synced
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+    _task = None
+    _synced = False
+
+
+async def revoke_jti(jti: str, expires_at: float) -> None:
+    """Revoke a token id until `expires_at` (the token's own exp)."""
+    _bloom.add(jti)
+    async with get_async_redis().pipeline(transaction=True) as pipe:
+        await (
+            pipe.zadd(REVOKED_SET_KEY, {jti: expires_at})
+            .xadd(REVOKED_STREAM_KEY, {"jti": jti}, maxlen=STREAM_MAXLEN, approximate=True)
+            .execute()
+        )
+    logger.info(f"[revocation] Revoked jti {jti}")
+
+
+async def is_revoked(jti: str) -> bool:
+    if _synced and jti not in _bloom:
+        return False
+    return await get_async_redis().zscore(REVOKED_SET_KEY, jti) is not None
@@ -1,7 +1,9 @@
 from datetime import datetime, timedelta
 import os
+import secrets
 
 import jwt
+from sqlalchemy import select
 from models import Customer
 from models import User
 from utils import generate_otp, send_email
@@ -25,6 +27,12 @@ def get_customer_by_email(email: str, db) -> Customer:
     return customer
 
 
+async def get_customer_by_email_async(email: str, db) -> User:
+    """Same lookup as get_customer_by_email, on an AsyncSession."""
+    result = await db.execute(select(User).where(User.email == email).limit(1))
+    return result.scalars().first()
+
+
 def send_otp_to_email_for_login(user, db):
     print("Generating OTP for user login...")
     otp = generate_otp()
@@ -49,15 +57,22 @@ def send_otp_to_email_for_login(user, db):
     # For now, let's just return a mock response
     return {"status": "success", "message": "OTP sent to email"}
 
-def issue_jwt_token(user_id):
-    SECRET_KEY = os.getenv('JWT_SECRET')
-    ALGORITHM = "HS256"
+def issue_jwt_token(user_id, role=None, verified=False, token_version=None):
+    from auth import JWT_SECRET as SECRET_KEY, JWT_ALGORITHM as ALGORITHM, get_token_version
     ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-    # Create JWT token
+    if token_version is None:
+        token_version = get_token_version(user_id)
+
+    # Create JWT token. role/verified let routes authorize from the claims
+    # alone; ver ties the token to the user's current token version.
     expire = datetime.now() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     jwt_payload = {
         "sub": user_id,
+        "role": role,
+        "verified": bool(verified),
+        "ver": token_version,
+        "jti": secrets.token_hex(16),
         "exp": expire
     }
     
@@ -68,21 +83,13 @@ def issue_jwt_token(user_id):
 def generate_account_number():
     """
     Generates a unique 10-digit account number.
-    
+
+    Numbers come from the block allocator in account_numbers.py, so no
+    database lookup is needed to rule out collisions.
+
     Returns:
         str: A unique 10-digit account number.
     """
-    from database import SessionLocal
-    from models import Account
-    import random
-
-    db = SessionLocal()
-    
-    while True:
-        account_number = str(random.randint(10**9, 10**10 - 1))  # Generate a random 10-digit number
-        existing_account = db.query(Account).filter(Account.account_number == account_number).first()
-        if not existing_account:
-            break  # Ensure the account number is unique
+    from account_numbers import next_account_number
 
-    db.close()
-    return account_number
+    return next_account_number()
@@ -0,0 +1,462 @@
+"""
+Monthly partitions of the transactions table and the archive behind them.
+
+On Postgres `transactions` is range-partitioned on created_at, one
+partition per month (transactions_pYYYYMM) plus transactions_default for
+anything outside them. Rows move through three tiers:
+
+    hot      the last TRANSACTIONS_HOT_MONTHS months; what recent-history
+             reads (GET /api/v1/transactions, the dashboard) touch
+    warm     older partitions still in the table, read only when a client
+             pages past the hot window
+    archive  months older than TRANSACTIONS_ARCHIVE_AFTER_MONTHS, moved to
+             transactions_archive as zlib-compressed JSON chunks (one user,
+             one month, up to ARCHIVE_CHUNK_ROWS rows each) and the
+             partition dropped
+
+Run monthly (cron) to create upcoming partitions and archive old months:
+
+    python transaction_partitions.py             # ensure partitions, archive
+    python transaction_partitions.py --dry-run   # list what would be archived
+
+Elsewhere (SQLite) the table is not partitioned; archiving still works,
+deleting the archived rows instead of dropping a partition.
+
+References stay unique across all three tiers: each one is claimed in
+transaction_references by a trigger on insert (and released when a row is
+deleted, other than by archiving). On Postgres the trigger comes with
+migration 3d0a6b28f4c1; install() creates it on databases create_all
+built, and the SQLite triggers.
+
+Times are naive UTC throughout, as the app stores them.
+"""
+import argparse
+import itertools
+import logging
+import sys
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import models
+from core.config import settings
+from json_columns import json_dumps, json_loads
+
+logger = logging.getLogger("vaulta.transaction_partitions")
+
+DEFAULT_PARTITION = "transactions_default"
+# Partitions are created this many months ahead of the current one
+PARTITIONS_AHEAD = 2
+ARCHIVE_CHUNK_ROWS = 500
+_DELETE_BATCH = 1000
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def utc_now() -> datetime:
+    """Now, as transactions store it (naive UTC)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def hot_window_start(now: Optional[datetime] = None) -> datetime:
+    """First instant of the oldest hot month (the current month counts as one)."""
+    return add_months(month_start(now or utc_now()), 1 - settings.TRANSACTIONS_HOT_MONTHS)
+
+
+def archive_cutoff(now: Optional[datetime] = None) -> datetime:
+    """Months starting before this are archived."""
+    return add_months(month_start(now or utc_now()), 1 - settings.TRANSACTIONS_ARCHIVE_AFTER_MONTHS)
+
+
+def naive_utc(value: datetime) -> datetime:
+    # Postgres returns timestamptz values aware, SQLite naive; compare them
+    # the way the app writes them (naive UTC).
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def partition_name(month: datetime) -> str:
+    return f"transactions_p{month:%Y%m}"
+
+
+# --- reference claims (migration 3d0a6b28f4c1 on Postgres, install() otherwise) ---
+
+_SQLITE_TRIGGERS = {
+    "transactions_claim_reference_ai": """
+        CREATE TRIGGER IF NOT EXISTS transactions_claim_reference_ai
+        AFTER INSERT ON transactions WHEN new.reference IS NOT NULL BEGIN
+            INSERT INTO transaction_references (reference, transaction_id, created_at)
+            VALUES (new.reference, new.id, new.created_at);
+        END""",
+    "transactions_claim_reference_au": """
+        CREATE TRIGGER IF NOT EXISTS transactions_claim_reference_au
+        AFTER UPDATE OF reference ON transactions WHEN new.reference IS NOT old.reference BEGIN
+            DELETE FROM transaction_references WHERE reference = old.reference AND transaction_id = old.id;
+            INSERT INTO transaction_references (reference, transaction_id, created_at)
+            SELECT new.reference, new.id, new.created_at WHERE new.reference IS NOT NULL;
+        END""",
+    "transactions_claim_reference_ad": """
+        CREATE TRIGGER IF NOT EXISTS transactions_claim_reference_ad
+        AFTER DELETE ON transactions WHEN old.reference IS NOT NULL BEGIN
+            DELETE FROM transaction_references WHERE reference = old.reference AND transaction_id = old.id;
+        END""",
+}
+
+
+# Same as migration 3d0a6b28f4c1, for Postgres databases built by create_all
+_POSTGRES_CLAIM_FUNCTION = """
+CREATE OR REPLACE FUNCTION transactions_claim_reference() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        IF OLD.reference IS NOT NULL THEN
+            DELETE FROM transaction_references
+            WHERE reference = OLD.reference AND transaction_id = OLD.id;
+        END IF;
+        RETURN OLD;
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        IF NEW.reference IS NOT DISTINCT FROM OLD.reference THEN
+            RETURN NEW;
+        END IF;
+        DELETE FROM transaction_references
+        WHERE reference = OLD.reference AND transaction_id = OLD.id;
+    END IF;
+    IF NEW.reference IS NOT NULL THEN
+        INSERT INTO transaction_references (reference, transaction_id, created_at)
+        VALUES (NEW.reference, NEW.id, NEW.created_at);
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def _install_postgres(conn) -> None:
+    if conn.execute(text(
+        "SELECT 1 FROM pg_trigger WHERE tgname = 'transactions_claim_reference' "
+        "AND tgrelid = 'transactions'::regclass"
+    )).first():
+        return
+    conn.execute(text(
+        "INSERT INTO transaction_references (reference, transaction_id, created_at) "
+        "SELECT reference, id, created_at FROM transactions WHERE reference IS NOT NULL "
+        "ON CONFLICT (reference) DO NOTHING"
+    ))
+    conn.execute(text(_POSTGRES_CLAIM_FUNCTION))
+    conn.execute(text(
+        "CREATE TRIGGER transactions_claim_reference BEFORE INSERT OR UPDATE OF reference OR DELETE ON transactions "
+        "FOR EACH ROW EXECUTE FUNCTION transactions_claim_reference()"
+    ))
+    logger.info("[transaction_partitions] Installed the Postgres reference trigger")
+
+
+def install(conn) -> None:
+    """
+    Create the reference triggers where they are missing (idempotent):
+    always on SQLite, and on a Postgres database that create_all built
+    rather than the migrations.
+    """
+    if conn.dialect.name == "postgresql":
+        _install_postgres(conn)
+        return
+    if conn.dialect.name != "sqlite":
+        return
+    installed = set(conn.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'transactions'"
+    )).scalars())
+    if set(_SQLITE_TRIGGERS) <= installed:
+        return
+    # claim the references already stored before the triggers take over
+    conn.execute(text(
+        "INSERT OR IGNORE INTO transaction_references (reference, transaction_id, created_at) "
+        "SELECT reference, id, created_at FROM transactions WHERE reference IS NOT NULL"
+    ))
+    for statement in _SQLITE_TRIGGERS.values():
+        conn.execute(text(statement))
+    logger.info("[transaction_partitions] Installed the SQLite reference triggers")
+
+
+# --- partition maintenance (sync, run from the CLI) ---
+
+def is_partitioned(conn) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'transactions'::regclass)"
+    )).scalar())
+
+
+def monthly_partitions(conn) -> Dict[datetime, str]:
+    """Attached monthly partitions, by month."""
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'transactions'::regclass"
+    )).scalars()
+    partitions = {}
+    for name in names:
+        if name.startswith("transactions_p") and name[len("transactions_p"):].isdigit():
+            partitions[datetime.strptime(name[len("transactions_p"):], "%Y%m")] = name
+    return partitions
+
+
+def _create_partition(conn, month: datetime) -> None:
+    name = partition_name(month)
+    lower, upper = f"{month:%Y-%m-%d}", f"{add_months(month, 1):%Y-%m-%d}"
+    # A range can't be attached while the default partition holds rows in
+    # it, so those rows move into the new table first.
+    conn.execute(text(f"CREATE TABLE {name} (LIKE transactions INCLUDING DEFAULTS)"))
+    moved = conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+        f"WHERE created_at >= '{lower}' AND created_at < '{upper}' RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    )).rowcount
+    conn.execute(text(f"ALTER TABLE transactions ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')"))
+    logger.info(f"[transaction_partitions] Created {name} ({moved} rows from {DEFAULT_PARTITION})")
+
+
+def ensure_partitions(conn, now: Optional[datetime] = None, first_month: Optional[datetime] = None) -> List[str]:
+    """
+    Create the missing monthly partitions from first_month (default: the
+    archive cutoff) through PARTITIONS_AHEAD months from now. Returns the
+    names created; no-op when the table is not partitioned.
+    """
+    if not is_partitioned(conn):
+        return []
+    existing = monthly_partitions(conn)
+    month = month_start(first_month) if first_month else archive_cutoff(now)
+    last = add_months(month_start(now or utc_now()), PARTITIONS_AHEAD)
+    created = []
+    while month <= last:
+        if month not in existing:
+            _create_partition(conn, month)
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+def _archive_chunk(user_id: str, month: datetime, rows: List[dict]) -> dict:
+    return {
+        "user_id": user_id,
+        "month": month,
+        "first_id": min(row["id"] for row in rows),
+        "last_id": max(row["id"] for row in rows),
+        "first_created_at": rows[0]["created_at"],
+        "last_created_at": rows[-1]["created_at"],
+        "row_count": len(rows),
+        "payload": zlib.compress(json_dumps(rows).encode()),
+    }
+
+
+def archive_month(conn, month: datetime) -> int:
+    """
+    Move one month of transactions into transactions_archive, in the
+    caller's transaction. Returns the number of rows archived.
+    """
+    month = month_start(month)
+    table = models.Transaction.__table__
+    in_month = (table.c.created_at >= month, table.c.created_at < add_months(month, 1))
+    partition = monthly_partitions(conn).get(month) if is_partitioned(conn) else None
+    if partition:
+        # no writes to the month between reading it and dropping it
+        conn.execute(text(f"LOCK TABLE {partition} IN SHARE MODE"))
+
+    rows = conn.execute(
+        select(table).where(*in_month).order_by(table.c.user_id, table.c.created_at, table.c.id),
+        execution_options={"stream_results": True, "yield_per": ARCHIVE_CHUNK_ROWS},
+    ).mappings()
+    archived_ids, chunks, claims = [], [], []
+    for user_id, user_rows in itertools.groupby(rows, key=lambda row: row["user_id"]):
+        user_rows = [dict(row) for row in user_rows]
+        for start in range(0, len(user_rows), ARCHIVE_CHUNK_ROWS):
+            chunks.append(_archive_chunk(user_id, month, user_rows[start:start + ARCHIVE_CHUNK_ROWS]))
+        archived_ids.extend(row["id"] for row in user_rows)
+        claims.extend(
+            {"reference": row["reference"], "transaction_id": row["id"], "created_at": row["created_at"]}
+            for row in user_rows if row["reference"] is not None
+        )
+        if len(chunks) >= 100:
+            conn.execute(insert(models.TransactionArchive), chunks)
+            chunks = []
+    if chunks:
+        conn.execute(insert(models.TransactionArchive), chunks)
+
+    if partition:
+        conn.execute(text(f"ALTER TABLE transactions DETACH PARTITION {partition}"))
+        conn.execute(text(f"DROP TABLE {partition}"))
+    else:
+        # by id, so rows written since the read above stay put
+        for start in range(0, len(archived_ids), _DELETE_BATCH):
+            conn.execute(delete(table).where(
+                *in_month, table.c.id.in_(archived_ids[start:start + _DELETE_BATCH])
+            ))
+        # the delete trigger released their references; archived rows keep them
+        for start in range(0, len(claims), _DELETE_BATCH):
+            conn.execute(insert(models.TransactionReference), claims[start:start + _DELETE_BATCH])
+    logger.info(f"[transaction_partitions] Archived {month:%Y-%m}: {len(archived_ids)} rows")
+    return len(archived_ids)
+
+
+def archivable_months(conn, now: Optional[datetime] = None) -> List[datetime]:
+    """Months before the archive cutoff that still have live rows (or a partition)."""
+    cutoff = archive_cutoff(now)
+    table = models.Transaction.__table__
+    months = set()
+    if is_partitioned(conn):
+        months.update(month for month in monthly_partitions(conn) if month < cutoff)
+        source = text(f"SELECT min(created_at) FROM {DEFAULT_PARTITION} WHERE created_at < :cutoff")
+        oldest = conn.execute(source, {"cutoff": cutoff}).scalar()
+    else:
+        oldest = conn.execute(select(func.min(table.c.created_at)).where(table.c.created_at < cutoff)).scalar()
+    if oldest is not None:
+        month = month_start(naive_utc(oldest))
+        while month < cutoff:
+            months.add(month)
+            month = add_months(month, 1)
+    return sorted(months)
+
+
+# --- archive-aware reads ---
+
+def _from_archive(row: dict) -> models.Transaction:
+    for field in ("created_at", "updated_at"):
+        if row.get(field):
+            row[field] = datetime.fromisoformat(row[field])
+    return models.Transaction(**row)
+
+
+async def archived_transactions(
+    db: AsyncSession,
+    user_id: str,
+    limit: int,
+    before_created_at: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+) -> List[models.Transaction]:
+    """
+    Up to `limit` of the user's archived transactions, newest first, that
+    sort after the keyset (before_created_at, before_id): created_at
+    earlier, or equal with a smaller id. Only the chunks that can hold
+    such rows are decompressed.
+    """
+    archive = models.TransactionArchive
+    stmt = select(archive.id, archive.last_created_at).where(archive.user_id == user_id)
+    if before_created_at is not None:
+        stmt = stmt.where(archive.first_created_at <= before_created_at)
+    chunk_refs = (await db.execute(stmt.order_by(archive.last_created_at.desc(), archive.id.desc()))).all()
+
+    before = naive_utc(before_created_at) if before_created_at is not None else None
+    found: List[models.Transaction] = []
+    for chunk_id, last_created_at in chunk_refs:
+        # chunks come newest-last-row first, so once `limit` rows are newer
+        # than anything left, stop
+        if len(found) >= limit and naive_utc(last_created_at) < naive_utc(found[limit - 1].created_at):
+            break
+        payload = (await db.execute(select(archive.payload).where(archive.id == chunk_id))).scalar_one()
+        for row in json_loads(zlib.decompress(payload)):
+            tx = _from_archive(row)
+            created_at = naive_utc(tx.created_at)
+            if before is not None and not (
+                created_at < before or (created_at == before and before_id is not None and tx.id < before_id)
+            ):
+                continue
+            found.append(tx)
+        found.sort(key=lambda tx: (naive_utc(tx.created_at), tx.id), reverse=True)
+    return found[:limit]
+
+
+async def get_archived_transaction(db: AsyncSession, user_id: str, transaction_id: int) -> Optional[models.Transaction]:
+    archive = models.TransactionArchive
+    payloads = (await db.execute(
+        select(archive.payload).where(
+            archive.user_id == user_id,
+            archive.first_id <= transaction_id,
+            archive.last_id >= transaction_id,
+        )
+    )).scalars()
+    for payload in payloads:
+        for row in json_loads(zlib.decompress(payload)):
+            if row["id"] == transaction_id:
+                return _from_archive(row)
+    return None
+
+
+def iter_archived(
+    db: Session,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    status: Optional[str] = None,
+) -> Iterator[List[models.Transaction]]:
+    """
+    Every user's archived transactions with created_from <= created_at <
+    created_to (and the given status), one decompressed chunk at a time:
+    oldest month first, by user within a month. For admin reads and
+    exports, which are not scoped to a user; sync, on the caller's session.
+    """
+    archive = models.TransactionArchive
+    stmt = select(archive.id)
+    if created_from is not None:
+        stmt = stmt.where(archive.last_created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(archive.first_created_at < created_to)
+    # ids first (small), then one payload at a time
+    chunk_ids = db.execute(stmt.order_by(archive.month, archive.user_id, archive.first_created_at, archive.id)).scalars().all()
+
+    start = naive_utc(created_from) if created_from is not None else None
+    end = naive_utc(created_to) if created_to is not None else None
+    for chunk_id in chunk_ids:
+        payload = db.execute(select(archive.payload).where(archive.id == chunk_id)).scalar_one()
+        rows = []
+        for row in json_loads(zlib.decompress(payload)):
+            tx = _from_archive(row)
+            created_at = naive_utc(tx.created_at)
+            if (start is not None and created_at < start) or (end is not None and created_at >= end):
+                continue
+            if status is not None and tx.status != status:
+                continue
+            rows.append(tx)
+        if rows:
+            yield rows
+
+
+async def archived_count(db: AsyncSession, user_id: str) -> int:
+    archive = models.TransactionArchive
+    return int((await db.execute(
+        select(func.coalesce(func.sum(archive.row_count), 0)).where(archive.user_id == user_id)
+    )).scalar_one())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="only list the months that would be archived")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    from database import engine
+
+    with engine.begin() as conn:
+        months = archivable_months(conn)
+        if args.dry_run:
+            print(f"would archive: {', '.join(f'{m:%Y-%m}' for m in months) or 'nothing'}")
+            return 0
+        created = ensure_partitions(conn)
+        print(f"created partitions: {', '.join(created) or 'none'}")
+    for month in months:
+        # one transaction per month, so a failure keeps the months already done
+        with engine.begin() as conn:
+            print(f"archived {month:%Y-%m}: {archive_month(conn, month)} rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
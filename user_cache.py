@@ -0,0 +1,273 @@
+import logging
+from typing import Optional
+
+import redis
+from pydantic import BaseModel
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from redis_client import r, get_async_redis, running_loop, spawn
+from ttl_cache import TTLCache
+
+logger = logging.getLogger("vaulta.auth")
+
+# Local entries are short-lived so other workers converge quickly after an
+# invalidation; the Redis tier is shared and dropped explicitly on change.
+LOCAL_TTL = 30
+LOCAL_MAXSIZE = 5_000
+REDIS_TTL = 60 * 15
+
+_DIRTY_USERS_KEY = "vaulta_dirty_user_ids"
+
+_local = TTLCache(maxsize=LOCAL_MAXSIZE, ttl_seconds=LOCAL_TTL)
+
+
+class CachedUser(BaseModel):
+    """Read-only snapshot of the User columns the auth paths need."""
+    id: str
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    role: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    verified: bool = False
+
+
+def user_key(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def snapshot_user(user) -> CachedUser:
+    return CachedUser(
+        id=str(user.id),
+        first_name=user.first_name,
+        last_name=user.last_name,
+        role=user.role,
+        email=user.email,
+        phone=user.phone,
+        verified=bool(user.verified),
+    )
+
+
+def _to_hash(user: CachedUser) -> dict:
+    data = {k: ("" if v is None else v) for k, v in user.model_dump().items()}
+    data["verified"] = "1" if user.verified else "0"
+    return data
+
+
+def _from_hash(data: dict) -> CachedUser:
+    values = {k: (v if v != "" else None) for k, v in data.items()}
+    values["verified"] = data.get("verified") == "1"
+    return CachedUser(**values)
+
+
+def _load_from_db(user_id: str) -> Optional[CachedUser]:
+    from models import User
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        return snapshot_user(user) if user else None
+    finally:
+        db.close()
+
+
+# Invalidating bumps a per-user generation (user:<id>:gen) in the same
+# script that drops the hash. A database read only repopulates Redis if the
+# generation it saw before loading is still current, so a row read before a
+# concurrent invalidation can't be written back over it.
+_INVALIDATE_LUA = """
+redis.call('DEL', KEYS[1])
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return 1
+"""
+
+_POPULATE_LUA = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+for i = 3, #ARGV - 1, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+_scripts = {}
+
+# Same guard for the local tier: bumped on every invalidation in this
+# process; a lookup only stores what it read if no invalidation ran meanwhile.
+_local_generation = 0
+# user id -> invalidations scheduled on the event loop but not yet applied to
+# Redis; lookups for these users go straight to the database meanwhile
+_pending = {}
+
+
+def generation_key(user_id: str) -> str:
+    return f"user:{user_id}:gen"
+
+
+def _script(client, name: str, source: str):
+    script = _scripts.get(name)
+    if script is None or script.registered_client is not client:
+        script = _scripts[name] = client.register_script(source)
+    return script
+
+
+def _populate_args(user: CachedUser, generation) -> list:
+    args = [generation or "0", REDIS_TTL]
+    for field, value in _to_hash(user).items():
+        args.extend([field, value])
+    return args
+
+
+def _store_local(user: CachedUser, local_generation: int) -> None:
+    if local_generation == _local_generation and user.id not in _pending:
+        _local.set(user.id, user)
+
+
+def get_user(user_id: str) -> Optional[CachedUser]:
+    """Read-through lookup: local LRU, then Redis hash, then the database."""
+    if not user_id:
+        return None
+    if user_id in _pending:
+        return _load_from_db(user_id)
+
+    user = _local.get(user_id)
+    if user is not None:
+        return user
+
+    local_generation = _local_generation
+    try:
+        data, generation = r.pipeline(transaction=False).hgetall(user_key(user_id)).get(generation_key(user_id)).execute()
+    except redis.RedisError as e:
+        logger.warning(f"[user-cache] Redis read failed for user {user_id}: {e}")
+        data, generation = None, None
+    if data:
+        user = _from_hash(data)
+        _store_local(user, local_generation)
+        return user
+
+    user = _load_from_db(user_id)
+    if user is None:
+        return None
+    _store_local(user, local_generation)
+    try:
+        _script(r, "populate", _POPULATE_LUA)(
+            keys=[user_key(user_id), generation_key(user_id)], args=_populate_args(user, generation)
+        )
+    except redis.RedisError as e:
+        logger.warning(f"[user-cache] Redis write failed for user {user_id}: {e}")
+    return user
+
+
+async def get_user_async(user_id: str) -> Optional[CachedUser]:
+    """Same lookup as get_user, without blocking the event loop."""
+    if not user_id:
+        return None
+    if user_id in _pending:
+        return await run_in_threadpool(_load_from_db, user_id)
+
+    user = _local.get(user_id)
+    if user is not None:
+        return user
+
+    local_generation = _local_generation
+    ar = get_async_redis()
+    try:
+        async with ar.pipeline(transaction=False) as pipe:
+            data, generation = await pipe.hgetall(user_key(user_id)).get(generation_key(user_id)).execute()
+    except redis.RedisError as e:
+        logger.warning(f"[user-cache] Redis read failed for user {user_id}: {e}")
+        data, generation = None, None
+    if data:
+        user = _from_hash(data)
+        _store_local(user, local_generation)
+        return user
+
+    user = await run_in_threadpool(_load_from_db, user_id)
+    if user is None:
+        return None
+    _store_local(user, local_generation)
+    try:
+        await _script(ar, "populate", _POPULATE_LUA)(
+            keys=[user_key(user_id), generation_key(user_id)], args=_populate_args(user, generation)
+        )
+    except redis.RedisError as e:
+        logger.warning(f"[user-cache] Redis write failed for user {user_id}: {e}")
+    return user
+
+
+def _invalidate_local(user_ids) -> None:
+    global _local_generation
+    _local_generation += 1
+    for user_id in user_ids:
+        _local.pop(user_id)
+
+
+def invalidate_user(user_id: str) -> None:
+    """Drop a user from both tiers, synchronously (scripts, worker threads)."""
+    _invalidate_local([user_id])
+    try:
+        _script(r, "invalidate", _INVALIDATE_LUA)(keys=[user_key(user_id), generation_key(user_id)], args=[REDIS_TTL])
+    except redis.RedisError as e:
+        logger.warning(f"[user-cache] Redis invalidation failed for user {user_id}: {e}")
+
+
+async def _invalidate_redis_async(user_ids) -> None:
+    try:
+        script = _script(get_async_redis(), "invalidate", _INVALIDATE_LUA)
+        for user_id in user_ids:
+            try:
+                await script(keys=[user_key(user_id), generation_key(user_id)], args=[REDIS_TTL])
+            except redis.RedisError as e:
+                logger.warning(f"[user-cache] Redis invalidation failed for user {user_id}: {e}")
+    finally:
+        for user_id in user_ids:
+            _pending[user_id] -= 1
+            if not _pending[user_id]:
+                del _pending[user_id]
+
+
+def invalidate_users(user_ids) -> None:
+    """
+    Drop users from both tiers. On the event loop the Redis half runs as a
+    task; until it lands, lookups for these users read the database.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    if running_loop() is None:
+        for user_id in user_ids:
+            invalidate_user(user_id)
+        return
+    for user_id in user_ids:
+        _pending[user_id] = _pending.get(user_id, 0) + 1
+    _invalidate_local(user_ids)
+    spawn(_invalidate_redis_async(user_ids))
+
+
+# Any committed change to a User row (verified flag, role, names, ...) drops
+# the cached copy. Ids are collected at flush time and only acted on once the
+# transaction commits, so a rollback never evicts a still-valid entry.
+@event.listens_for(Session, "before_flush")
+def _collect_dirty_users(session, flush_context, instances):
+    from models import User
+
+    dirty = session.info.setdefault(_DIRTY_USERS_KEY, set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id:
+            dirty.add(str(obj.id))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    invalidate_users(session.info.pop(_DIRTY_USERS_KEY, ()))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_dirty_users(session, previous_transaction):
+    session.info.pop(_DIRTY_USERS_KEY, None)